@@ -11,16 +11,59 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "change-me-in-production-generate-a-strong-random-key"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    AUTH_CACHE_TTL: float = 60  # seconds a validated token is trusted without a users lookup (0 disables the cache)
+    AUTH_CACHE_MAX_ENTRIES: int = 1024  # cached tokens
+    PASSWORD_HASH_WORKERS: int = 2  # threads verifying bcrypt passwords at login
     
     # Database Settings
     DATABASE_URL: str = "postgresql://postgres:postgres@db:5432/monitoring"
+    DATABASE_ASYNC: bool = False  # run the auth, cgroup and process history queries on an async engine (asyncpg / aiosqlite)
+    DATABASE_ASYNC_URL: Optional[str] = None  # async engine URL; derived from DATABASE_URL if not set
+    DB_POOL_SIZE: int = 5  # pooled connections per engine
+    DB_MAX_OVERFLOW: int = 10  # extra connections opened when the pool is exhausted
+    DB_POOL_TIMEOUT: float = 30  # seconds a checkout waits for a free connection
+    DB_POOL_RECYCLE: int = 1800  # seconds after which a connection is replaced
     
     # CORS Settings
     CORS_ORIGINS: list[str] = ["*"]  # Configure for Tailscale network
     
     # Data Collection Settings
     METRICS_COLLECTION_INTERVAL: int = 2  # seconds
-    HISTORICAL_DATA_RETENTION_DAYS: int = 30
+    GPU_COLLECTION_INTERVAL: float = 2  # seconds between NVML reads, independent of the metrics sampler
+    SYSTEM_INFO_REFRESH_INTERVAL: float = 60  # seconds between background reads of the network interfaces
+    PUBLIC_IP_TTL: float = 3600  # seconds a looked-up public IP is reused
+    HISTORICAL_DATA_RETENTION_DAYS: int = 30  # raw snapshots
+    ROLLUP_RETENTION_DAYS: int = 365  # 1m / 1h / 1d rollups
+    RECENT_HISTORY_HOURS: float = 6  # history kept in memory and served without the database
+    METRICS_WRITE_BATCH_SIZE: int = 30  # snapshots per batched INSERT
+    METRICS_WRITE_FLUSH_INTERVAL: float = 30  # seconds; max delay before pending snapshots are written
+    METRICS_WRITE_MAX_PENDING: int = 3600  # snapshots buffered while the database is slow or down
+    METRICS_PARTITION_PERIOD: str = "day"  # 'day' or 'week'; PostgreSQL range partitions of metric_snapshots
+    METRICS_PARTITIONS_AHEAD: int = 3  # future partitions kept created in advance
+    HISTORY_CLOSED_MAX_AGE: int = 86400  # seconds clients may cache history ranges that ended in the past
+    HISTORY_CACHE_MAX_POINTS: int = 20000  # aggregated history points kept in the result cache (0 disables it)
+    EXPORT_BATCH_SIZE: int = 20000  # rows fetched from the database and encoded at a time by /history/export
+    
+    # Process Settings
+    PROCESS_REFRESH_INTERVAL: float = 3  # seconds between scans of the shared process table
+    PROCESS_DELTA_HISTORY: int = 20  # process table versions kept for ?since= deltas
+    PROCESS_PROCFS_READER: bool = True  # read the process table directly from /proc on Linux
+    PROCESS_TRACKING_INTERVAL: float = 5  # seconds between process start/exit scans
+    PROCESS_SAMPLE_INTERVAL: float = 60  # seconds between CPU/memory updates of long-lived processes
+    
+    # Cgroup Settings
+    CGROUP_METRICS_ENABLED: bool = True  # collect cgroup v2 accounting (containers, systemd slices)
+    CGROUP_ROOT: str = "/sys/fs/cgroup"  # mount point of the unified cgroup hierarchy
+    CGROUP_MAX_DEPTH: int = 2  # levels below the root cgroup that are sampled
+    CGROUP_COLLECTION_INTERVAL: float = 10  # seconds
+    
+    # Compressed Storage Settings
+    COMPRESSED_STORAGE_ENABLED: bool = False  # keep long-term history as compressed column chunks
+    COMPRESSED_CHUNK_MINUTES: int = 60  # width of one chunk
+    COMPRESSED_RETENTION_DAYS: int = 365
+    
+    # Live Stream Settings
+    METRICS_STREAM_QUEUE_SIZE: int = 4  # frames buffered per subscriber before dropping the oldest
     
     class Config:
         env_file = ".env"
@@ -1,12 +1,138 @@
 """Database connection and session management."""
-from sqlalchemy import create_engine
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from app.config import settings
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+T = TypeVar("T")
+
+# Checkouts waiting at least this long are counted as slow
+SLOW_CHECKOUT_SECONDS = 0.1
+
+
+class PoolStats:
+    """How long connection checkouts waited for a free pooled connection."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.slow_checkouts = 0
+        self.timeouts = 0
+
+    def record(self, wait: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+            if wait >= SLOW_CHECKOUT_SECONDS:
+                self.slow_checkouts += 1
+
+    def snapshot(self, pool) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(
+                checkouts=self.checkouts,
+                wait_avg_ms=round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                wait_max_ms=round(self.wait_max * 1000, 3),
+                slow_checkouts=self.slow_checkouts,
+                timeouts=self.timeouts
+            )
+        if isinstance(pool, QueuePool):
+            stats.update(size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow())
+        return stats
+
+
+class _TimedPool:
+    """Mixin timing QueuePool checkouts (the wait for a free connection, or a new one)."""
+    stats: PoolStats
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            # No connection became free within pool_timeout
+            self.stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class TimedQueuePool(_TimedPool, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_TimedPool, AsyncAdaptedQueuePool):
+    pass
+
+
+def _pool_options(url: str, poolclass) -> Dict[str, Any]:
+    """Pool arguments from the settings; in-memory SQLite keeps SQLAlchemy's default pool."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {}
+    return dict(
+        poolclass=poolclass,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE
+    )
+
+
+def async_database_url(url: str) -> str:
+    """DATABASE_URL with its async driver (asyncpg for PostgreSQL, aiosqlite for SQLite)."""
+    parsed = make_url(url)
+    driver = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}[parsed.get_backend_name()]
+    return parsed.set(drivername=f"{parsed.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+
+def _attach_stats(engine):
+    if not hasattr(engine.pool, "stats"):
+        engine.pool.stats = PoolStats()
+    return engine
+
+
+engine = _attach_stats(create_engine(
+    settings.DATABASE_URL, pool_pre_ping=True, **_pool_options(settings.DATABASE_URL, TimedQueuePool)
+))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Optional async engine for the async routes (DATABASE_ASYNC)
+async_engine = None
+AsyncSessionLocal = None
+if settings.DATABASE_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    _async_url = settings.DATABASE_ASYNC_URL or async_database_url(settings.DATABASE_URL)
+    async_engine = create_async_engine(
+        _async_url, pool_pre_ping=True, **_pool_options(_async_url, TimedAsyncAdaptedQueuePool)
+    )
+    _attach_stats(async_engine.sync_engine)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Threads running the database work of async routes when there is no async
+# engine; one per pooled connection, separate from the threadpool that runs
+# sync routes, so slow queries cannot starve the live endpoints
+db_executor = ThreadPoolExecutor(
+    max_workers=settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW, thread_name_prefix="db"
+)
+
 Base = declarative_base()
 
 
@@ -18,3 +144,64 @@ def get_db():
     finally:
         db.close()
 
+
+def _run_with_session(fn: Callable[..., T], *args) -> T:
+    db = SessionLocal()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+
+async def run_db(fn: Callable[..., T], *args, sync_engine: bool = False) -> T:
+    """
+    Run fn(session, *args), written against the regular Session API, from an
+    async route. With the async engine the session runs on an asyncpg or
+    aiosqlite connection and waits for the database without holding a thread;
+    otherwise fn runs on db_executor with a session of the sync engine.
+    An async session runs fn itself on the event loop, so functions that build
+    large results from many rows pass sync_engine to always take the second
+    way (use run_select where the work splits into one query and rendering).
+    fn must commit if it writes.
+    """
+    if AsyncSessionLocal is not None and not sync_engine:
+        async with AsyncSessionLocal() as session:
+            return await session.run_sync(fn, *args)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, _run_with_session, fn, *args)
+
+
+def _select_with_session(statement, render: Callable[[list], T]) -> T:
+    db = SessionLocal()
+    try:
+        return render(db.execute(statement).all())
+    finally:
+        db.close()
+
+
+async def run_select(statement, render: Callable[[list], T]) -> T:
+    """
+    Execute a Core select from an async route and return render(rows). With
+    the async engine the query waits without holding a thread and only render
+    runs on db_executor; otherwise both run there with the sync engine.
+    """
+    loop = asyncio.get_running_loop()
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as session:
+            rows = (await session.execute(statement)).all()
+        return await loop.run_in_executor(db_executor, render, rows)
+    return await loop.run_in_executor(db_executor, _select_with_session, statement, render)
+
+
+def pool_stats() -> Dict[str, Optional[Dict[str, Any]]]:
+    """Checkout wait metrics and current size of each engine's connection pool."""
+    stats = {"sync": engine.pool.stats.snapshot(engine.pool), "async": None}
+    if async_engine is not None:
+        pool = async_engine.sync_engine.pool
+        stats["async"] = pool.stats.snapshot(pool)
+    return stats
+
+
+async def dispose_async_engine():
+    if async_engine is not None:
+        await async_engine.dispose()
@@ -0,0 +1,69 @@
+"""HTTP caching utilities: ETags, conditional GET and Cache-Control."""
+import hashlib
+import uuid
+from typing import Any, Awaitable, Callable, Type
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+# Version counters restart with the process, so ETags built from them include this
+INSTANCE_ID = uuid.uuid4().hex
+
+
+def make_etag(*parts: Any, per_process: bool = True, weak: bool = False) -> str:
+    """
+    Strong ETag for a response identified by parts (request parameters and data
+    versions). per_process=False is for content that is the same in every
+    process, e.g. closed history ranges. weak=True marks bodies that may differ
+    byte for byte under the same parts (e.g. ages counted up on each request).
+    """
+    key = repr((INSTANCE_ID if per_process else None,) + parts)
+    tag = '"' + hashlib.sha256(key.encode()).hexdigest()[:32] + '"'
+    return "W/" + tag if weak else tag
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match lists etag."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison (RFC 9110); nginx marks ETags weak when it gzips a response
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in tags
+
+
+def conditional_response(request: Request, etag: str, cache_control: str,
+                         build: Callable[[], Any], response_class: Type[JSONResponse] = JSONResponse) -> Response:
+    """
+    304 Not Modified if the client already has etag, otherwise the JSON
+    encoding of build(). build only runs when the body is actually sent.
+    With ORJSONResponse, build() must return plain dicts/lists (datetimes are
+    fine); they are serialized by orjson without the jsonable_encoder pass.
+    build() may also return a finished Response (e.g. a StreamingResponse),
+    which only gets the caching headers.
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return _response(build(), headers, response_class)
+
+
+async def conditional_response_async(request: Request, etag: str, cache_control: str,
+                                     build: Callable[[], Awaitable[Any]],
+                                     response_class: Type[JSONResponse] = JSONResponse) -> Response:
+    """conditional_response for async routes; build() is awaited."""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return _response(await build(), headers, response_class)
+
+
+def _response(content: Any, headers: dict, response_class: Type[JSONResponse]) -> Response:
+    if isinstance(content, Response):
+        content.headers.update(headers)
+        return content
+    if not issubclass(response_class, ORJSONResponse):
+        content = jsonable_encoder(content)
+    return response_class(content=content, headers=headers)
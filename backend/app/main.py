@@ -1,14 +1,27 @@
 """FastAPI application entry point."""
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+from datetime import datetime
 from apscheduler.schedulers.background import BackgroundScheduler
 from app.config import settings
-from app.database import engine, Base
+from app.database import engine, Base, dispose_async_engine, pool_stats
 from app.routers import metrics, processes, history, auth
 from app.services.data_collector import data_collector
+from app.services.metrics_sampler import metrics_sampler
+from app.services.metrics_broadcaster import metrics_broadcaster
+from app.services.recent_history import recent_history
+from app.services.chunk_store import chunk_store
+from app.services.partitions import snapshot_partitioner
+from app.services.process_tracker import process_tracker
+from app.services.process_manager import process_manager
+from app.services.cgroup_collector import cgroup_collector
+from app.services.gpu_collector import gpu_collector
+from app.services.system_monitor import system_monitor
 
-# Create database tables
+# Create database tables (metric_snapshots is partitioned first on PostgreSQL)
+snapshot_partitioner.setup()
 Base.metadata.create_all(bind=engine)
 
 # Background scheduler for data collection
@@ -19,23 +32,94 @@ scheduler = BackgroundScheduler()
 async def lifespan(app: FastAPI):
     """Lifespan context manager for startup/shutdown."""
     # Startup
+    # Read static system info (runs lscpu) now rather than in the first /metrics/system request
+    await asyncio.to_thread(system_monitor.load_static_info)
+    # The sampler owns collection; every published snapshot is also stored
+    metrics_sampler.add_listener(recent_history.append)
+    metrics_sampler.add_listener(data_collector.collect_and_store)
+    metrics_broadcaster.start(asyncio.get_running_loop())
+    if gpu_collector.available:
+        scheduler.add_job(
+            gpu_collector.sample,
+            'interval',
+            seconds=settings.GPU_COLLECTION_INTERVAL,
+            id='sample_gpus',
+            next_run_time=datetime.now()
+        )
     scheduler.add_job(
-        data_collector.collect_and_store,
+        metrics_sampler.sample,
         'interval',
         seconds=settings.METRICS_COLLECTION_INTERVAL,
-        id='collect_metrics'
+        id='sample_metrics',
+        next_run_time=datetime.now()
     )
     scheduler.add_job(
         data_collector.cleanup_old_data,
         'interval',
         hours=24,
         id='cleanup_data',
-        kwargs={'retention_days': settings.HISTORICAL_DATA_RETENTION_DAYS}
+        kwargs={
+            'retention_days': settings.HISTORICAL_DATA_RETENTION_DAYS,
+            'rollup_retention_days': settings.ROLLUP_RETENTION_DAYS,
+            'chunk_retention_days': (
+                settings.COMPRESSED_RETENTION_DAYS if settings.COMPRESSED_STORAGE_ENABLED else None
+            )
+        }
     )
+    scheduler.add_job(
+        system_monitor.refresh_system_info,
+        'interval',
+        seconds=settings.SYSTEM_INFO_REFRESH_INTERVAL,
+        id='refresh_system_info',
+        next_run_time=datetime.now()
+    )
+    scheduler.add_job(
+        process_manager.refresh,
+        'interval',
+        seconds=settings.PROCESS_REFRESH_INTERVAL,
+        id='refresh_processes',
+        next_run_time=datetime.now()
+    )
+    scheduler.add_job(
+        process_tracker.scan,
+        'interval',
+        seconds=settings.PROCESS_TRACKING_INTERVAL,
+        id='track_processes',
+        next_run_time=datetime.now()
+    )
+    if settings.CGROUP_METRICS_ENABLED and cgroup_collector.available():
+        scheduler.add_job(
+            cgroup_collector.sample,
+            'interval',
+            seconds=settings.CGROUP_COLLECTION_INTERVAL,
+            id='sample_cgroups',
+            next_run_time=datetime.now()
+        )
+    if snapshot_partitioner.enabled:
+        scheduler.add_job(
+            snapshot_partitioner.ensure_partitions,
+            'interval',
+            hours=1,
+            id='create_partitions'
+        )
+    if settings.COMPRESSED_STORAGE_ENABLED:
+        scheduler.add_job(
+            chunk_store.compact,
+            'interval',
+            minutes=5,
+            id='compact_chunks',
+            next_run_time=datetime.now()
+        )
     scheduler.start()
     yield
     # Shutdown
     scheduler.shutdown()
+    metrics_broadcaster.stop()
+    metrics_sampler.remove_listener(data_collector.collect_and_store)
+    # Write out snapshots still waiting in the write-behind buffer
+    data_collector.close()
+    metrics_sampler.remove_listener(recent_history.append)
+    await dispose_async_engine()
 
 
 app = FastAPI(
@@ -72,3 +156,9 @@ async def health():
     """Health check endpoint."""
     return {"status": "healthy"}
 
+
+@app.get("/health/database")
+async def database_health():
+    """Connection pool usage and checkout wait times of the database engines."""
+    return pool_stats()
+
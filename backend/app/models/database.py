@@ -1,5 +1,5 @@
 """SQLAlchemy database models."""
-from sqlalchemy import Column, Integer, Float, String, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, Float, String, DateTime, Text, ForeignKey, UniqueConstraint, LargeBinary, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -50,6 +50,104 @@ class MetricSnapshot(Base):
     gpu_data = Column(Text)  # JSON string
 
 
+# Numeric MetricSnapshot columns (shared by the in-memory buffer and the rollup tiers)
+METRIC_FIELDS = (
+    'cpu_percent', 'cpu_count', 'cpu_freq_current',
+    'memory_total', 'memory_available', 'memory_percent', 'memory_used',
+    'disk_total', 'disk_used', 'disk_free', 'disk_percent',
+    'network_bytes_sent', 'network_bytes_recv', 'network_packets_sent', 'network_packets_recv',
+)
+
+# Statistics kept per field in a rollup row, stored as <field>_<stat> columns
+ROLLUP_STATS = ('avg', 'min', 'max')
+
+
+class MetricRollup(Base):
+    """Metric snapshots pre-aggregated into fixed-width time buckets (1m / 1h / 1d)."""
+    __tablename__ = "metric_rollups"
+    __table_args__ = (
+        UniqueConstraint('resolution', 'bucket_start', name='uq_metric_rollups_bucket'),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    resolution = Column(Integer, nullable=False)  # bucket width in seconds
+    bucket_start = Column(DateTime(timezone=True), nullable=False)
+    sample_count = Column(Integer, nullable=False, default=0)
+    
+    # GPU Metrics of the first sample in the bucket (JSON string)
+    gpu_data = Column(Text)
+
+
+# <field>_avg / <field>_min / <field>_max columns for every metric field
+for _field in METRIC_FIELDS:
+    for _stat in ROLLUP_STATS:
+        setattr(MetricRollup, f"{_field}_{_stat}", Column(Float))
+
+
+class GPUSample(Base):
+    """Per-GPU metrics of one snapshot (one row per timestamp and GPU)."""
+    __tablename__ = "gpu_samples"
+    __table_args__ = (
+        Index('ix_gpu_samples_timestamp_gpu', 'timestamp', 'gpu_index'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    timestamp = Column(DateTime(timezone=True), nullable=False)
+    gpu_index = Column(Integer, nullable=False)
+    name = Column(String)
+    temperature = Column(Float)
+    utilization = Column(Float)
+    memory_used = Column(Float)
+    memory_total = Column(Float)
+    memory_percent = Column(Float)
+    power_draw = Column(Float)
+
+
+# Numeric GPUSample columns (same names as the GPUMetrics fields)
+GPU_FIELDS = ('temperature', 'utilization', 'memory_used', 'memory_total', 'memory_percent', 'power_draw')
+
+
+class CgroupSample(Base):
+    """Resource usage of one cgroup (v2) at one sample time."""
+    __tablename__ = "cgroup_samples"
+    __table_args__ = (
+        Index('ix_cgroup_samples_timestamp_path', 'timestamp', 'path'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    timestamp = Column(DateTime(timezone=True), nullable=False)
+    path = Column(String, nullable=False)
+    cpu_percent = Column(Float)
+    cpu_throttled_percent = Column(Float)
+    memory_current = Column(Float)
+    io_read_rate = Column(Float)
+    io_write_rate = Column(Float)
+    io_read_ops_rate = Column(Float)
+    io_write_ops_rate = Column(Float)
+    memory_pressure = Column(Float)
+    memory_pressure_full = Column(Float)
+
+
+# Numeric CgroupSample columns (same names as the CgroupMetrics fields)
+CGROUP_FIELDS = (
+    'cpu_percent', 'cpu_throttled_percent', 'memory_current',
+    'io_read_rate', 'io_write_rate', 'io_read_ops_rate', 'io_write_ops_rate',
+    'memory_pressure', 'memory_pressure_full',
+)
+
+
+class MetricChunk(Base):
+    """Closed time window of metric snapshots stored as compressed column blocks."""
+    __tablename__ = "metric_chunks"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    chunk_start = Column(DateTime(timezone=True), nullable=False, unique=True, index=True)
+    chunk_end = Column(DateTime(timezone=True), nullable=False, index=True)
+    sample_count = Column(Integer, nullable=False)
+    payload = Column(LargeBinary, nullable=False)  # see services/chunk_store.py for the format
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
 class ProcessHistory(Base):
     """Process execution history."""
     __tablename__ = "process_history"
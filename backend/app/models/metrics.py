@@ -1,19 +1,28 @@
 """Pydantic models for API requests/responses."""
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
 
 class CPUMetrics(BaseModel):
     """CPU metrics model."""
+    model_config = ConfigDict(frozen=True)
+    
     percent: float
     count: int
     freq_current: Optional[float] = None
     per_cpu: Optional[List[float]] = None
+    # Share of CPU time (percent) spent in each state since the previous sample
+    iowait: Optional[float] = None
+    irq: Optional[float] = None
+    softirq: Optional[float] = None
+    steal: Optional[float] = None
 
 
 class MemoryMetrics(BaseModel):
     """Memory metrics model."""
+    model_config = ConfigDict(frozen=True)
+    
     total: float
     available: float
     used: float
@@ -23,6 +32,8 @@ class MemoryMetrics(BaseModel):
 
 class DiskMetrics(BaseModel):
     """Disk metrics model."""
+    model_config = ConfigDict(frozen=True)
+    
     total: float
     used: float
     free: float
@@ -31,6 +42,8 @@ class DiskMetrics(BaseModel):
 
 class NetworkMetrics(BaseModel):
     """Network metrics model with live rates from system."""
+    model_config = ConfigDict(frozen=True)
+    
     bytes_sent: float
     bytes_recv: float
     packets_sent: float
@@ -44,6 +57,8 @@ class NetworkMetrics(BaseModel):
 
 class GPUMetrics(BaseModel):
     """GPU metrics model."""
+    model_config = ConfigDict(frozen=True)
+    
     index: int
     name: str
     temperature: Optional[float] = None
@@ -56,6 +71,8 @@ class GPUMetrics(BaseModel):
 
 class SystemMetrics(BaseModel):
     """Complete system metrics model."""
+    model_config = ConfigDict(frozen=True)
+    
     timestamp: datetime
     cpu: CPUMetrics
     memory: MemoryMetrics
@@ -64,6 +81,29 @@ class SystemMetrics(BaseModel):
     gpus: List[GPUMetrics]
 
 
+class CgroupMetrics(BaseModel):
+    """Resource usage of one cgroup (v2) since the previous sample."""
+    model_config = ConfigDict(frozen=True)
+    
+    path: str  # relative to the cgroup root, e.g. /system.slice/docker-<id>.scope
+    cpu_percent: Optional[float] = None  # percent of one core
+    cpu_throttled_percent: Optional[float] = None
+    memory_current: Optional[float] = None  # bytes
+    memory_max: Optional[float] = None  # bytes; None without a limit (not kept in history)
+    io_read_rate: Optional[float] = None  # bytes/second
+    io_write_rate: Optional[float] = None
+    io_read_ops_rate: Optional[float] = None  # operations/second
+    io_write_ops_rate: Optional[float] = None
+    memory_pressure: Optional[float] = None  # percent of time some tasks stalled on memory
+    memory_pressure_full: Optional[float] = None  # percent of time all tasks stalled on memory
+
+
+class CgroupListResponse(BaseModel):
+    """Live cgroup metrics response model."""
+    timestamp: Optional[datetime] = None  # None before the first sample
+    cgroups: List[CgroupMetrics]
+
+
 class ProcessInfo(BaseModel):
     """Process information model."""
     pid: int
@@ -78,7 +118,11 @@ class ProcessInfo(BaseModel):
 class ProcessListResponse(BaseModel):
     """Process list response model."""
     processes: List[ProcessInfo]
-    total: int
+    total: int  # processes matching the filters
+    process_count: Optional[int] = None  # all running processes
+    version: Optional[int] = None  # process table version, for ?since=
+    delta: bool = False  # processes holds only added/changed rows since the requested version
+    removed: List[int] = []  # PIDs gone since the requested version (deltas only)
 
 
 class HistoricalMetricsRequest(BaseModel):
@@ -89,9 +133,19 @@ class HistoricalMetricsRequest(BaseModel):
 
 
 class HistoricalMetricsResponse(BaseModel):
-    """Historical metrics response model."""
+    """Historical metrics response model (format=rows)."""
     metrics: List[Dict[str, Any]]
     count: int
+    # Raw pages only (aggregate=false): cursor of the next page, None on the last one
+    next_cursor: Optional[str] = None
+
+
+class HistoricalMetricsColumnarResponse(BaseModel):
+    """Historical metrics response model (format=columnar)."""
+    timestamps: List[str]
+    columns: Dict[str, List[Any]]
+    count: int
+    next_cursor: Optional[str] = None
 
 
 class NetworkInterface(BaseModel):
@@ -118,5 +172,7 @@ class SystemInfo(BaseModel):
     uptime: float
     boot_time: datetime
     network_interfaces: List[NetworkInterface] = []
+    network_interfaces_age: Optional[float] = None  # seconds since the interfaces were read
     public_ip: Optional[str] = None
+    public_ip_age: Optional[float] = None  # seconds since the public IP was looked up
 
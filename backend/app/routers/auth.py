@@ -4,9 +4,11 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import BaseModel, EmailStr
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import run_db
 from app.models.database import User
-from app.auth import verify_password, get_password_hash, create_access_token, get_current_active_user
+from app.auth import (
+    verify_password_async, get_password_hash_async, create_access_token, get_current_active_user, get_user_by_username
+)
 from app.config import settings
 
 router = APIRouter()
@@ -19,9 +21,7 @@ class UserRegister(BaseModel):
     password: str
 
 
-@router.post("/register")
-def register(user: UserRegister, db: Session = Depends(get_db)):
-    """Register a new user."""
+def _create_user(db: Session, user: UserRegister, hashed_password: str) -> str:
     # Check if user exists
     if db.query(User).filter(User.username == user.username).first():
         raise HTTPException(status_code=400, detail="Username already registered")
@@ -29,20 +29,26 @@ def register(user: UserRegister, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create new user
-    hashed_password = get_password_hash(user.password)
     db_user = User(username=user.username, email=user.email, hashed_password=hashed_password)
     db.add(db_user)
     db.commit()
-    db.refresh(db_user)
-    
-    return {"message": "User created successfully", "username": db_user.username}
+    return user.username
+
+
+@router.post("/register")
+async def register(user: UserRegister):
+    """Register a new user."""
+    hashed_password = await get_password_hash_async(user.password)
+    username = await run_db(_create_user, user, hashed_password)
+    return {"message": "User created successfully", "username": username}
 
 
 @router.post("/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     """Login and get access token."""
-    user = db.query(User).filter(User.username == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    user = await run_db(get_user_by_username, form_data.username)
+    # bcrypt runs on its own threads so logins never hold up other requests
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -57,7 +63,7 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
 
 
 @router.get("/me")
-def read_users_me(current_user: User = Depends(get_current_active_user)):
+async def read_users_me(current_user: User = Depends(get_current_active_user)):
     """Get current user information."""
     return {"username": current_user.username, "email": current_user.email}
 
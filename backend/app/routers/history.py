@@ -1,15 +1,28 @@
 """Historical data endpoints (authentication required)."""
-from datetime import datetime
-from fastapi import APIRouter, Depends, Query
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from app.database import get_db
-from app.models.database import User, MetricSnapshot
+from sqlalchemy import and_, cast, func, literal_column, select, tuple_, Integer
+from app.database import SessionLocal, db_executor, engine, run_db, run_select
+from app.models.database import User, CgroupSample, GPUSample, MetricSnapshot, CGROUP_FIELDS, GPU_FIELDS, METRIC_FIELDS
 from app.auth import get_current_active_user
-from app.models.metrics import HistoricalMetricsRequest, HistoricalMetricsResponse
+from app.config import settings
+from app.models.metrics import HistoricalMetricsRequest, HistoricalMetricsResponse, HistoricalMetricsColumnarResponse
+from app.http_cache import conditional_response_async, make_etag
+from app.services.data_collector import data_collector
+from app.services.metrics_sampler import metrics_sampler
+from app.services.history_cache import history_cache, Point
+from app.services.exporter import history_exporter, SOURCES as EXPORT_SOURCES
+from app.services.recent_history import recent_history
+from app.services.rollups import rollup_manager
+from app.services.chunk_store import chunk_store
+from app.services.aggregation import MetricRow, aggregate_columns, as_utc, columns_from_rows, local_bound, rows_from_columns
+import asyncio
 import json
-from collections import defaultdict
-from typing import Optional
+import time
+import orjson
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Union
 
 router = APIRouter()
 
@@ -24,115 +37,267 @@ def round_metric_value(value: Optional[float], decimal_places: int = 2) -> Optio
     return round(value, decimal_places)
 
 
-def aggregate_metrics(snapshots, time_range_hours):
-    """Aggregate metrics by time buckets based on time range."""
+def get_bucket_minutes(time_range_hours: float) -> Optional[int]:
+    """Bucket size in minutes for a time range, or None if it should not be aggregated."""
     if time_range_hours <= 1:
         # No aggregation for < 1 hour
-        return snapshots
+        return None
     elif time_range_hours <= 24:
         # Aggregate by minute for < 24 hours
-        bucket_minutes = max(1, int(time_range_hours * 60 / 500))  # Target ~500 points
+        return max(1, int(time_range_hours * 60 / 500))  # Target ~500 points
     elif time_range_hours <= 168:  # 1 week
         # Aggregate by hour for < 1 week
-        bucket_minutes = 60
+        return 60
     else:
         # Aggregate by day for > 1 week
-        bucket_minutes = 1440
+        return 1440
+
+
+def _bucket_expression(dialect: str, bucket_seconds: int, column=MetricSnapshot.timestamp, local_time: bool = True):
+    """
+    SQL expression for the start of a row's time bucket, as seconds since the
+    epoch, for the named dialect. local_time tells that the column holds naive
+    local time (see local_bound).
+    """
+    if dialect == "postgresql":
+        # date_bin aligned to the epoch gives the same buckets as integer division below
+        binned = func.date_bin(
+            literal_column(f"interval '{int(bucket_seconds)} seconds'"),
+            column,
+            literal_column("timestamptz '1970-01-01 00:00:00+00'")
+        )
+        return cast(func.extract("epoch", binned), Integer)
+    # SQLite fallback: integer division of the Unix timestamp; 'utc' converts naive local time first
+    epoch = cast(func.strftime("%s", column, *(("utc",) if local_time else ())), Integer)
+    return epoch // bucket_seconds * bucket_seconds
+
+
+def aggregate_metrics_sql(db: Session, start_time: datetime, end_time: datetime, bucket_minutes: int):
+    """
+    Aggregate metrics by time buckets inside the database (GROUP BY on the bucket
+    start), so only one row per bucket is transferred. Produces the same buckets
+    and averages as aggregate_columns.
+    """
+    bucket_seconds = bucket_minutes * 60
+    bucket = _bucket_expression(db.get_bind().dialect.name, bucket_seconds).label("bucket")
+    averages = [func.avg(getattr(MetricSnapshot, field)).label(field) for field in METRIC_FIELDS]
     
-    # Group by time buckets
-    buckets = defaultdict(list)
-    for snapshot in snapshots:
-        # Round timestamp to bucket
-        timestamp = snapshot.timestamp
-        total_minutes = int(timestamp.timestamp() / 60)
-        bucket_minutes_rounded = (total_minutes // bucket_minutes) * bucket_minutes
-        bucket_key = datetime.fromtimestamp(bucket_minutes_rounded * 60)
-        buckets[bucket_key].append(snapshot)
-    
-    # Aggregate each bucket
-    aggregated = []
-    for bucket_time in sorted(buckets.keys()):
-        bucket_snapshots = buckets[bucket_time]
-        if not bucket_snapshots:
-            continue
-        
-        # Calculate averages
-        count = len(bucket_snapshots)
-        cpu_percents = [s.cpu_percent for s in bucket_snapshots if s.cpu_percent is not None]
-        cpu_freqs = [s.cpu_freq_current for s in bucket_snapshots if s.cpu_freq_current is not None]
-        memory_percents = [s.memory_percent for s in bucket_snapshots if s.memory_percent is not None]
-        memory_useds = [s.memory_used for s in bucket_snapshots if s.memory_used is not None]
-        memory_availables = [s.memory_available for s in bucket_snapshots if s.memory_available is not None]
-        disk_percents = [s.disk_percent for s in bucket_snapshots if s.disk_percent is not None]
-        disk_useds = [s.disk_used for s in bucket_snapshots if s.disk_used is not None]
-        network_bytes_sent = [s.network_bytes_sent for s in bucket_snapshots if s.network_bytes_sent is not None]
-        network_bytes_recv = [s.network_bytes_recv for s in bucket_snapshots if s.network_bytes_recv is not None]
-        network_packets_sent = [s.network_packets_sent for s in bucket_snapshots if s.network_packets_sent is not None]
-        network_packets_recv = [s.network_packets_recv for s in bucket_snapshots if s.network_packets_recv is not None]
-        
-        # Use first snapshot for non-averaged values
-        first = bucket_snapshots[0]
-        
-        # Create aggregated snapshot with rounded values
-        agg_snapshot = MetricSnapshot(
-            timestamp=bucket_time,
-            cpu_percent=round_metric_value(sum(cpu_percents) / len(cpu_percents) if cpu_percents else None, 2),
-            cpu_count=first.cpu_count,
-            cpu_freq_current=round_metric_value(sum(cpu_freqs) / len(cpu_freqs) if cpu_freqs else None, 2),
-            memory_total=round_metric_value(first.memory_total, 0),
-            memory_available=round_metric_value(sum(memory_availables) / len(memory_availables) if memory_availables else None, 0),
-            memory_percent=round_metric_value(sum(memory_percents) / len(memory_percents) if memory_percents else None, 2),
-            memory_used=round_metric_value(sum(memory_useds) / len(memory_useds) if memory_useds else None, 0),
-            disk_total=round_metric_value(first.disk_total, 0),
-            disk_used=round_metric_value(sum(disk_useds) / len(disk_useds) if disk_useds else None, 0),
-            disk_free=round_metric_value(first.disk_free, 0),
-            disk_percent=round_metric_value(sum(disk_percents) / len(disk_percents) if disk_percents else None, 2),
-            network_bytes_sent=round_metric_value(sum(network_bytes_sent) / len(network_bytes_sent) if network_bytes_sent else None, 0),
-            network_bytes_recv=round_metric_value(sum(network_bytes_recv) / len(network_bytes_recv) if network_bytes_recv else None, 0),
-            network_packets_sent=round_metric_value(sum(network_packets_sent) / len(network_packets_sent) if network_packets_sent else None, 0),
-            network_packets_recv=round_metric_value(sum(network_packets_recv) / len(network_packets_recv) if network_packets_recv else None, 0),
-            gpu_data=first.gpu_data  # Use first GPU data (could aggregate this too)
+    rows = db.query(
+        bucket,
+        func.min(MetricSnapshot.id).label("first_id"),
+        *averages
+    ).filter(
+        and_(
+            MetricSnapshot.timestamp >= local_bound(db, start_time),
+            MetricSnapshot.timestamp <= local_bound(db, end_time)
         )
-        aggregated.append(agg_snapshot)
+    ).group_by(bucket).order_by(bucket).all()
     
+    # GPU data is JSON text; like aggregate_columns, use the first snapshot of each bucket
+    first_ids = [row.first_id for row in rows]
+    gpu_data = dict(
+        db.query(MetricSnapshot.id, MetricSnapshot.gpu_data).filter(MetricSnapshot.id.in_(first_ids)).all()
+    ) if first_ids else {}
+    
+    aggregated = []
+    for row in rows:
+        values = {field: getattr(row, field) for field in METRIC_FIELDS}
+        if values["cpu_count"] is not None:
+            values["cpu_count"] = int(round(values["cpu_count"]))
+        aggregated.append(MetricRow(
+            timestamp=datetime.fromtimestamp(int(row.bucket), tz=timezone.utc),
+            gpu_data=gpu_data.get(row.first_id),
+            **values
+        ))
     return aggregated
 
 
-@router.get("/metrics", response_model=HistoricalMetricsResponse)
-def get_historical_metrics(
-    start_time: datetime = Query(...),
-    end_time: datetime = Query(...),
-    metric_type: str = Query(None),
-    limit: int = Query(10000, le=50000),
-    aggregate: bool = Query(True),
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
-):
-    """Get historical metrics (requires authentication)."""
-    # Calculate time range
-    time_range = (end_time - start_time).total_seconds() / 3600  # hours
+def _time_key(value: datetime) -> float:
+    """Key matching a snapshot to its GPU samples (ms precision survives every storage path)."""
+    return round(value.timestamp(), 3)
+
+
+def gpu_history(db: Session, start_time: datetime, end_time: datetime,
+                bucket_minutes: Optional[int] = None) -> Dict[float, List[Dict[str, Any]]]:
+    """
+    Per-GPU history from gpu_samples, keyed by epoch timestamp (bucket start if
+    bucket_minutes is given). Buckets report average and peak utilization, peak
+    temperature and average power instead of a single sample.
+    """
+    in_range = and_(
+        GPUSample.timestamp >= local_bound(db, start_time),
+        GPUSample.timestamp <= local_bound(db, end_time)
+    )
+    history: Dict[float, List[Dict[str, Any]]] = {}
+    if bucket_minutes is None:
+        rows = db.query(
+            GPUSample.timestamp, GPUSample.gpu_index, GPUSample.name, *[getattr(GPUSample, f) for f in GPU_FIELDS]
+        ).filter(in_range).order_by(GPUSample.timestamp.asc(), GPUSample.gpu_index.asc()).all()
+        for row in rows:
+            gpu = {"index": row.gpu_index, "name": row.name}
+            gpu.update((field, getattr(row, field)) for field in GPU_FIELDS)
+            history.setdefault(_time_key(row.timestamp), []).append(gpu)
+        return history
     
-    # Query all snapshots in range (no limit if aggregating)
-    query = db.query(MetricSnapshot).filter(
+    bucket = _bucket_expression(db.get_bind().dialect.name, bucket_minutes * 60, GPUSample.timestamp).label("bucket")
+    rows = db.query(
+        bucket,
+        GPUSample.gpu_index,
+        func.max(GPUSample.name).label("name"),
+        func.avg(GPUSample.utilization).label("utilization"),
+        func.max(GPUSample.utilization).label("utilization_max"),
+        func.max(GPUSample.temperature).label("temperature"),
+        func.avg(GPUSample.power_draw).label("power_draw"),
+        func.avg(GPUSample.memory_used).label("memory_used"),
+        func.max(GPUSample.memory_total).label("memory_total"),
+        func.avg(GPUSample.memory_percent).label("memory_percent")
+    ).filter(in_range).group_by(bucket, GPUSample.gpu_index).order_by(bucket, GPUSample.gpu_index).all()
+    for row in rows:
+        gpu = {"index": row.gpu_index}
+        gpu.update((key, value) for key, value in row._mapping.items() if key not in ("bucket", "gpu_index"))
+        history.setdefault(float(row.bucket), []).append(gpu)
+    return history
+
+
+def cgroup_history_select(start_time: datetime, end_time: datetime, bucket_minutes: Optional[int] = None,
+                          path: Optional[str] = None, limit: Optional[int] = None):
+    """
+    Select of per-cgroup history from cgroup_samples, ordered by time and path
+    (rendered by cgroup_history_rows). Buckets average every field and also
+    report peak CPU and memory.
+    """
+    conditions = [CgroupSample.timestamp >= start_time, CgroupSample.timestamp <= end_time]
+    if path:
+        conditions.append(CgroupSample.path == path)
+    if bucket_minutes is None:
+        statement = select(
+            CgroupSample.timestamp, CgroupSample.path, *[getattr(CgroupSample, f) for f in CGROUP_FIELDS]
+        ).where(and_(*conditions)).order_by(CgroupSample.timestamp.asc(), CgroupSample.path.asc())
+        return statement if limit is None else statement.limit(limit)
+    
+    bucket = _bucket_expression(
+        engine.dialect.name, bucket_minutes * 60, CgroupSample.timestamp, local_time=False
+    ).label("bucket")
+    return select(
+        bucket,
+        CgroupSample.path,
+        func.max(CgroupSample.cpu_percent).label("cpu_percent_max"),
+        func.max(CgroupSample.memory_current).label("memory_current_max"),
+        *[func.avg(getattr(CgroupSample, field)).label(field) for field in CGROUP_FIELDS]
+    ).where(and_(*conditions)).group_by(bucket, CgroupSample.path).order_by(bucket, CgroupSample.path)
+
+
+def cgroup_history_rows(rows, bucketed: bool) -> List[Dict[str, Any]]:
+    """Response entries of cgroup_history_select rows."""
+    if not bucketed:
+        return [
+            {"timestamp": row.timestamp.isoformat(), "path": row.path,
+             **{field: round_metric_value(getattr(row, field), 2) for field in CGROUP_FIELDS}}
+            for row in rows
+        ]
+    return [
+        {"timestamp": datetime.fromtimestamp(int(row.bucket), tz=timezone.utc).isoformat(), "path": row.path,
+         **{key: round_metric_value(value, 2) for key, value in row._mapping.items() if key not in ("bucket", "path")}}
+        for row in rows
+    ]
+
+
+def settled_time() -> float:
+    """
+    Epoch time before which stored history can no longer change: older than
+    the latest sample, and every snapshot and closed rollup bucket up to it
+    written to the database.
+    """
+    settled = time.time() - settings.METRICS_COLLECTION_INTERVAL
+    oldest_unwritten = data_collector.oldest_unwritten
+    if oldest_unwritten is not None:
+        settled = min(settled, oldest_unwritten.timestamp())
+    return settled
+
+
+def range_closed(end_time: datetime, bucket_minutes: Optional[int]) -> bool:
+    """Whether history up to end_time (and the rest of its last bucket) can no longer change."""
+    return end_time.timestamp() + (bucket_minutes * 60 if bucket_minutes else 0) < settled_time()
+
+
+def _raw_columns(db: Session, start_time: datetime, end_time: datetime) -> Dict[str, Any]:
+    """Samples of a range as columns, from memory, compressed storage or metric_snapshots."""
+    if recent_history.covers(start_time, end_time):
+        return recent_history.query_columns(start_time, end_time)
+    if settings.COMPRESSED_STORAGE_ENABLED:
+        return chunk_store.read_columns(db, start_time, end_time)
+    return columns_from_rows(db.query(MetricSnapshot).filter(
         and_(
-            MetricSnapshot.timestamp >= start_time,
-            MetricSnapshot.timestamp <= end_time
+            MetricSnapshot.timestamp >= local_bound(db, start_time),
+            MetricSnapshot.timestamp <= local_bound(db, end_time)
         )
-    ).order_by(MetricSnapshot.timestamp.asc())
-    
-    if not aggregate:
-        query = query.limit(limit)
-    
-    snapshots = query.all()
+    ).order_by(MetricSnapshot.timestamp.asc()).all())
+
+
+def _load_snapshots(db: Session, start_time: datetime, end_time: datetime, bucket_minutes: Optional[int],
+                    metric_type: Optional[str], limit: int, aggregate: bool):
+    """Snapshots (or bucket rows) and per-GPU history for a range, from the cheapest source that covers it."""
+    resolution = rollup_manager.select_resolution(bucket_minutes * 60) if bucket_minutes else None
+    use_rollups = resolution is not None and rollup_manager.covers(db, resolution, start_time)
+    from_memory = not use_rollups and recent_history.covers(start_time, end_time)
     
-    # Aggregate if requested and time range is large
-    if aggregate and time_range > 1 and len(snapshots) > 500:
-        snapshots = aggregate_metrics(snapshots, time_range)
+    if use_rollups:
+        # Read the coarsest rollup tier that still gives the requested point density
+        with data_collector.commit_lock:
+            snapshots = rollup_manager.query(
+                db, resolution, start_time, end_time, bucket_minutes * 60,
+                unwritten=data_collector.unwritten_rollups(resolution),
+                raw_columns=lambda edge_start, edge_end: _raw_columns(db, edge_start, edge_end)
+            )
+    elif from_memory and bucket_minutes:
+        # Range is still held in memory; bucket its columns without building per-sample rows
+        columns = recent_history.query_columns(start_time, end_time)
+        snapshots = rows_from_columns(aggregate_columns(columns, bucket_minutes * 60), suffix="_avg")
+    elif from_memory:
+        # Range is still held in memory; skip the database entirely
+        snapshots = recent_history.query(start_time, end_time, limit=None if aggregate else limit)
+    elif settings.COMPRESSED_STORAGE_ENABLED:
+        # Decode only the chunks overlapping the range (plus raw rows outside them)
+        columns = chunk_store.read_columns(db, start_time, end_time)
+        if bucket_minutes:
+            snapshots = rows_from_columns(aggregate_columns(columns, bucket_minutes * 60), suffix="_avg")
+        else:
+            if not aggregate:
+                columns = {key: value[:limit] for key, value in columns.items()}
+            snapshots = rows_from_columns(columns)
+    elif bucket_minutes:
+        # Bucket in the database; only the aggregated rows are loaded
+        snapshots = aggregate_metrics_sql(db, start_time, end_time, bucket_minutes)
+    else:
+        # Query all snapshots in range
+        query = db.query(MetricSnapshot).filter(
+            and_(
+                MetricSnapshot.timestamp >= local_bound(db, start_time),
+                MetricSnapshot.timestamp <= local_bound(db, end_time)
+            )
+        ).order_by(MetricSnapshot.timestamp.asc())
+        
+        if not aggregate:
+            query = query.limit(limit)
+        
+        snapshots = query.all()
     
+    # GPU history comes from gpu_samples for rows read from the database and for
+    # every bucketed range; raw samples held in memory carry their own GPU data
+    gpus = None
+    if metric_type in (None, "gpu") and (bucket_minutes or not from_memory):
+        gpus = gpu_history(db, start_time, end_time, bucket_minutes)
+    return snapshots, gpus
+
+
+def _render_points(snapshots, gpus, metric_type: Optional[str]) -> List[Point]:
+    """Response points of snapshots as (epoch timestamp, point) pairs."""
     metrics = []
     for snapshot in snapshots:
+        # Raw rows are naive local time, the buffer, rollups and SQL buckets aware UTC
+        timestamp = as_utc(snapshot.timestamp)
         metric_data = {
-            "timestamp": snapshot.timestamp.isoformat(),
+            "timestamp": timestamp.isoformat(),
             "cpu": {
                 "percent": round_metric_value(snapshot.cpu_percent, 2),
                 "count": snapshot.cpu_count,
@@ -158,7 +323,15 @@ def get_historical_metrics(
             }
         }
         
-        if snapshot.gpu_data:
+        gpu = gpus.get(_time_key(timestamp)) if gpus else None
+        if gpu is not None:
+            metric_data["gpu"] = [
+                {key: round_metric_value(value, 2) if isinstance(value, float) else value for key, value in g.items()}
+                for g in gpu
+            ]
+        elif snapshot.gpu_data:
+            # Raw samples held in memory, rows from before gpu_samples existed and
+            # buckets whose GPU samples are not written yet
             try:
                 metric_data["gpu"] = json.loads(snapshot.gpu_data)
             except:
@@ -171,47 +344,446 @@ def get_historical_metrics(
             else:
                 continue
         
-        metrics.append(metric_data)
+        metrics.append((timestamp.timestamp(), metric_data))
     
-    return HistoricalMetricsResponse(metrics=metrics, count=len(metrics))
+    return metrics
 
 
-@router.get("/processes")
-def get_process_history(
+def build_historical_metrics(db: Session, start_time: datetime, end_time: datetime,
+                             metric_type: Optional[str], limit: int, aggregate: bool) -> List[Dict[str, Any]]:
+    """
+    Historical metric points for a time range. Aggregated ranges are aligned to whole
+    buckets and served through the history cache, which only computes the
+    buckets it does not hold yet.
+    """
+    # Calculate time range
+    time_range = (end_time - start_time).total_seconds() / 3600  # hours
+    
+    bucket_minutes = get_bucket_minutes(time_range) if aggregate else None
+    if bucket_minutes and history_cache.enabled:
+        bucket_seconds = bucket_minutes * 60
+        start, end = history_cache.align(bucket_seconds, start_time.timestamp(), end_time.timestamp())
+        
+        def compute(compute_from: int, compute_to: int) -> List[Point]:
+            snapshots, gpus = _load_snapshots(
+                db,
+                datetime.fromtimestamp(compute_from, tz=timezone.utc),
+                datetime.fromtimestamp(compute_to, tz=timezone.utc),
+                bucket_minutes, metric_type, limit, aggregate
+            )
+            # The end is inclusive in the queries; a bucket starting exactly there belongs to the next range
+            return [point for point in _render_points(snapshots, gpus, metric_type) if compute_from <= point[0] < compute_to]
+        
+        metrics = history_cache.get(bucket_seconds, start, end, metric_type, settled_time(), compute)
+    else:
+        snapshots, gpus = _load_snapshots(db, start_time, end_time, bucket_minutes, metric_type, limit, aggregate)
+        metrics = [point for _, point in _render_points(snapshots, gpus, metric_type)]
+    
+    return metrics
+
+
+# Fields of each metric group of a history point
+METRIC_GROUPS = {
+    "cpu": ("percent", "count", "freq_current"),
+    "memory": ("total", "available", "used", "percent"),
+    "disk": ("total", "used", "free", "percent"),
+    "network": ("bytes_sent", "bytes_recv", "packets_sent", "packets_recv"),
+    "gpu": None,  # per-GPU objects; fields depend on the source (e.g. utilization_max when aggregated)
+}
+
+# {group: selected fields, or None for the whole group}
+FieldSelection = Dict[str, Optional[Set[str]]]
+
+
+def parse_fields(fields: Optional[str]) -> Optional[FieldSelection]:
+    """
+    Parse a field list like "cpu.percent,memory.used,gpu" (whole groups or
+    group.field), or None for all fields.
+    """
+    if not fields:
+        return None
+    selection: FieldSelection = {}
+    for item in fields.split(","):
+        group, _, field = item.strip().partition(".")
+        if group not in METRIC_GROUPS:
+            raise HTTPException(status_code=400, detail=f"Unknown field {item.strip()!r}, expected one of {sorted(METRIC_GROUPS)} or <group>.<field>")
+        known = METRIC_GROUPS[group]
+        if field and known is not None and field not in known:
+            raise HTTPException(status_code=400, detail=f"Unknown field {item.strip()!r}, {group} has {list(known)}")
+        if not field:
+            selection[group] = None
+        elif group not in selection or selection[group] is not None:
+            selection.setdefault(group, set()).add(field)
+    return selection
+
+
+def _select(value: Any, names: Optional[Set[str]]) -> Any:
+    if names is None:
+        return value
+    if isinstance(value, list):
+        # GPUs keep their index so the values can still be told apart
+        return [{key: item[key] for key in item if key in names or key == "index"} for item in value]
+    return {key: value[key] for key in value if key in names}
+
+
+def select_fields(points: List[Dict[str, Any]], selection: FieldSelection) -> List[Dict[str, Any]]:
+    """Points reduced to the selected fields; points with none of the selected groups are dropped."""
+    selected = []
+    for point in points:
+        groups = {group: _select(point[group], names) for group, names in selection.items() if group in point}
+        if groups:
+            selected.append({"timestamp": point["timestamp"], **groups})
+    return selected
+
+
+def columnar_metrics(points: List[Dict[str, Any]], selection: Optional[FieldSelection]) -> Dict[str, List[Any]]:
+    """
+    Points as one array per field, named <group>.<field> (GPUs as
+    gpu.<index>.<field>). Values missing from a point are null.
+    """
+    columns: Dict[str, List[Any]] = {}
+    for group, fields in METRIC_GROUPS.items():
+        if selection is not None and group not in selection:
+            continue
+        names = selection.get(group) if selection is not None else None
+        if fields is None:
+            # One column per GPU index and field present in the range, filled in a single pass
+            gpu_columns: Dict[Tuple[Any, str], List[Any]] = {}
+            for position, point in enumerate(points):
+                for gpu in point.get(group) or ():
+                    index = gpu.get("index")
+                    for field, value in gpu.items():
+                        if field in ("index", "name") or (names is not None and field not in names):
+                            continue
+                        column = gpu_columns.get((index, field))
+                        if column is None:
+                            column = gpu_columns[(index, field)] = [None] * len(points)
+                        column[position] = value
+            for (index, field) in sorted(gpu_columns, key=lambda key: (key[0] is None, key[0] or 0)):
+                columns[f"{group}.{index}.{field}"] = gpu_columns[(index, field)]
+            continue
+        for field in fields:
+            if names is None or field in names:
+                columns[f"{group}.{field}"] = [(point.get(group) or {}).get(field) for point in points]
+    return columns
+
+
+# Raw rows read from the database (and GPU samples looked up) per step of a streamed page
+RAW_BATCH_SIZE = 2000
+
+
+def parse_cursor(cursor: str) -> Tuple[datetime, int]:
+    """(timestamp, id) of the last row of the previous page from a next_cursor value."""
+    try:
+        micros, _, row_id = cursor.partition("_")
+        return datetime.fromtimestamp(int(micros) / 1e6, tz=timezone.utc), int(row_id)
+    except (ValueError, OverflowError):
+        raise HTTPException(status_code=400, detail=f"Invalid cursor {cursor!r}")
+
+
+def _cursor(row) -> str:
+    return _format_cursor(as_utc(row.timestamp).timestamp(), row.id)
+
+
+def _format_cursor(epoch: float, row_id: int) -> str:
+    return f"{round(epoch * 1e6)}_{row_id}"
+
+
+class RawHistoryPage:
+    """
+    One page of raw (unaggregated) history, ordered by (timestamp, id).
+
+    Pages are keyset-paginated: a page holds at most limit snapshots after
+    the (timestamp, id) of the cursor, and next_cursor continues where it
+    ended. Rows are read through a server-side cursor RAW_BATCH_SIZE at a
+    time and rendered batch by batch, with the GPU samples of each batch
+    looked up separately, so memory does not grow with the page. Pages
+    the recent history buffer covers are served from memory, including
+    samples not written yet; with compressed storage the page is read
+    chunk window by chunk window.
+    """
+    
+    def __init__(self, start_time: datetime, end_time: datetime, metric_type: Optional[str],
+                 limit: int, after: Optional[Tuple[datetime, int]] = None):
+        self.start_time = start_time
+        self.end_time = end_time
+        self.metric_type = metric_type
+        self.limit = limit
+        self.after = after
+        self.next_cursor: Optional[str] = None  # set once the page has been read, None on the last page
+    
+    def batches(self) -> Iterator[List[Dict[str, Any]]]:
+        """Rendered points of the page, batch by batch."""
+        if recent_history.covers(self._resume_time(), self.end_time):
+            yield from self._memory_batches()
+            return
+        if settings.COMPRESSED_STORAGE_ENABLED:
+            yield from self._chunk_batches()
+            return
+        # Own session: a streamed page outlives the request's dependencies
+        db = SessionLocal()
+        try:
+            table = MetricSnapshot.__table__
+            conditions = [table.c.timestamp >= local_bound(db, self.start_time),
+                          table.c.timestamp <= local_bound(db, self.end_time)]
+            if self.after is not None and self.after[1]:
+                after = tuple_(local_bound(db, self.after[0]), self.after[1])
+                conditions.append(tuple_(table.c.timestamp, table.c.id) > after)
+            elif self.after is not None:
+                # Cursors of pages served from memory or chunks carry no row id
+                conditions.append(table.c.timestamp > local_bound(db, self.after[0]))
+            # One row past the page tells whether there is a next one
+            statement = select(table).where(and_(*conditions)).order_by(
+                table.c.timestamp.asc(), table.c.id.asc()
+            ).limit(self.limit + 1)
+            
+            connection = db.connection(execution_options={"stream_results": True, "yield_per": RAW_BATCH_SIZE})
+            read = 0
+            last = None
+            for rows in connection.execute(statement).partitions():
+                more = len(rows) > self.limit - read
+                rows = rows[:self.limit - read]
+                if rows:
+                    read += len(rows)
+                    last = rows[-1]
+                    gpus = None
+                    if self.metric_type in (None, "gpu"):
+                        gpus = gpu_history(db, rows[0].timestamp, rows[-1].timestamp)
+                    yield [point for _, point in _render_points(rows, gpus, self.metric_type)]
+                if more:
+                    self.next_cursor = _cursor(last)
+                    break
+        finally:
+            db.close()
+    
+    def _resume_time(self) -> datetime:
+        """Where the page starts: start_time, or the cursor's timestamp when that is later."""
+        if self.after is None or self.after[0].timestamp() <= self.start_time.timestamp():
+            return self.start_time
+        return self.after[0]
+    
+    def _memory_batches(self) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Pages of the recent history buffer. Like compacted samples, buffered
+        ones are ordered by their unique timestamps and carry no row id.
+        """
+        # At most one sample has the cursor's own timestamp, so limit + 2 leaves limit + 1 after it
+        columns = recent_history.query_columns(self._resume_time(), self.end_time, limit=self.limit + 2)
+        if self.after is not None:
+            newer = columns['timestamp'] > self.after[0].timestamp()
+            columns = {key: value[newer] for key, value in columns.items()}
+        count = min(len(columns['timestamp']), self.limit)
+        for offset in range(0, count, RAW_BATCH_SIZE):
+            rows = rows_from_columns({key: value[offset:min(offset + RAW_BATCH_SIZE, count)]
+                                      for key, value in columns.items()})
+            # Buffered samples keep their GPU readings in gpu_data
+            yield [point for _, point in _render_points(rows, None, self.metric_type)]
+        if len(columns['timestamp']) > count:
+            self.next_cursor = _format_cursor(float(columns['timestamp'][count - 1]), 0)
+    
+    def _chunk_batches(self) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Pages of compressed storage, read one chunk window at a time. Compacted
+        samples have no row id; their timestamps are unique and order the page.
+        """
+        start_time = self._resume_time()
+        db = SessionLocal()
+        try:
+            read = 0
+            last = None
+            for columns in chunk_store.iter_columns(db, start_time, self.end_time):
+                if self.after is not None:
+                    newer = columns['timestamp'] > self.after[0].timestamp()
+                    columns = {key: value[newer] for key, value in columns.items()}
+                count = len(columns['timestamp'])
+                if not count:
+                    continue
+                if read == self.limit:
+                    # The page ended with the previous window and there is more
+                    self.next_cursor = _format_cursor(last, 0)
+                    break
+                rows = rows_from_columns({key: value[:self.limit - read] for key, value in columns.items()})
+                read += len(rows)
+                last = rows[-1].timestamp.timestamp()
+                gpus = None
+                if self.metric_type in (None, "gpu"):
+                    gpus = gpu_history(db, rows[0].timestamp, rows[-1].timestamp)
+                yield [point for _, point in _render_points(rows, gpus, self.metric_type)]
+                if count > len(rows):
+                    self.next_cursor = _format_cursor(last, 0)
+                    break
+        finally:
+            db.close()
+
+
+def stream_rows(page: RawHistoryPage, selection: Optional[FieldSelection]) -> Iterator[bytes]:
+    """The page as {"metrics": [...], "count": n, "next_cursor": ...}, encoded point by point as rows are read."""
+    yield b'{"metrics":['
+    count = 0
+    for points in page.batches():
+        if selection is not None:
+            points = select_fields(points, selection)
+        if points:
+            yield (b',' if count else b'') + b','.join(orjson.dumps(point) for point in points)
+            count += len(points)
+    yield b'],"count":' + orjson.dumps(count) + b',"next_cursor":' + orjson.dumps(page.next_cursor) + b'}'
+
+
+@router.get("/cache")
+async def get_history_cache_stats(current_user: User = Depends(get_current_active_user)):
+    """Get history cache counters, for sizing HISTORY_CACHE_MAX_POINTS (requires authentication)."""
+    return history_cache.stats()
+
+
+@router.get("/metrics", response_model=Union[HistoricalMetricsResponse, HistoricalMetricsColumnarResponse])
+async def get_historical_metrics(
+    request: Request,
     start_time: datetime = Query(...),
     end_time: datetime = Query(...),
-    limit: int = Query(1000, le=10000),
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    metric_type: str = Query(None),
+    fields: Optional[str] = Query(None),
+    format: str = Query("rows", pattern="^(rows|columnar)$"),
+    limit: int = Query(10000, le=50000),
+    aggregate: bool = Query(True),
+    cursor: Optional[str] = Query(None),
+    current_user: User = Depends(get_current_active_user)
 ):
-    """Get process execution history (requires authentication)."""
+    """
+    Get historical metrics (requires authentication).
+    fields selects groups or group.field values (e.g. cpu.percent,memory,gpu).
+    format=columnar returns {"timestamps": [...], "columns": {"cpu.percent": [...], ...}, "count": n}.
+    With aggregate=false, limit is the page size: the response streams up to
+    limit raw samples and next_cursor (passed as cursor) continues after them.
+    Ranges that ended in the past never change and may be cached for
+    HISTORY_CLOSED_MAX_AGE; open ranges are revalidated with their ETag.
+    """
+    selection = parse_fields(fields)
+    after = parse_cursor(cursor) if cursor and not aggregate else None
+    time_range = (end_time - start_time).total_seconds() / 3600  # hours
+    bucket_minutes = get_bucket_minutes(time_range) if aggregate else None
+    params = (request.url.path, start_time.isoformat(), end_time.isoformat(), metric_type, fields, format, limit, aggregate, cursor)
+    if range_closed(end_time, bucket_minutes):
+        etag = make_etag(*params, per_process=False)
+        cache_control = f"private, max-age={settings.HISTORY_CLOSED_MAX_AGE}, immutable"
+    else:
+        etag = make_etag(*params, metrics_sampler.version, data_collector.data_version)
+        cache_control = "private, no-cache"
+    
+    async def build():
+        if not aggregate:
+            page = RawHistoryPage(start_time, end_time, metric_type, limit, after)
+            if format == "rows":
+                return StreamingResponse(stream_rows(page, selection), media_type="application/json")
+            # Raw pages read through the sync engine's server-side cursor, on the database threads
+            metrics = await asyncio.get_running_loop().run_in_executor(
+                db_executor, lambda: [point for points in page.batches() for point in points]
+            )
+        else:
+            metrics = await run_db(build_historical_metrics, start_time, end_time, metric_type, limit, aggregate, sync_engine=True)
+        if format == "columnar":
+            content = {
+                "timestamps": [point["timestamp"] for point in metrics],
+                "columns": columnar_metrics(metrics, selection),
+                "count": len(metrics)
+            }
+            if not aggregate:
+                content["next_cursor"] = page.next_cursor
+            return content
+        if selection is not None:
+            metrics = select_fields(metrics, selection)
+        return {"metrics": metrics, "count": len(metrics)}
+    
+    # Plain dicts serialized by orjson; a 50k point response skips two full passes over every value
+    return await conditional_response_async(request, etag, cache_control, build, response_class=ORJSONResponse)
+
+
+@router.get("/export")
+async def export_history(
+    start_time: datetime = Query(...),
+    end_time: datetime = Query(...),
+    format: str = Query("csv", pattern="^(csv|arrow|parquet|msgpack)$"),
+    source: str = Query("metrics", pattern="^(metrics|gpus)$"),
+    fields: Optional[str] = Query(None),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Stream every stored sample of a time range as a file (requires authentication).
+    source=metrics exports metric_snapshots, source=gpus one row per GPU and
+    sample; fields limits the columns (comma-separated column names).
+    """
+    _, columns = EXPORT_SOURCES[source]
+    selected = [field.strip() for field in fields.split(",")] if fields else []
+    unknown = [field for field in selected if field not in columns]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields {unknown}, {source} has {list(columns)}")
+    try:
+        writer = history_exporter.writer(format, source, selected)
+    except ImportError as e:
+        raise HTTPException(status_code=501, detail=f"{format} export is not available: {e}")
+    
+    filename = f"{source}-{start_time:%Y%m%dT%H%M%S}-{end_time:%Y%m%dT%H%M%S}.{writer.extension}"
+    return StreamingResponse(
+        history_exporter.stream(writer, source, start_time, end_time),
+        media_type=writer.media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.get("/cgroups")
+async def get_cgroup_history(
+    start_time: datetime = Query(...),
+    end_time: datetime = Query(...),
+    path: Optional[str] = Query(None),
+    limit: int = Query(10000, le=50000),
+    aggregate: bool = Query(True),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get per-cgroup resource history, optionally for one cgroup path (requires authentication)."""
+    time_range = (end_time - start_time).total_seconds() / 3600  # hours
+    bucket_minutes = get_bucket_minutes(time_range) if aggregate else None
+    statement = cgroup_history_select(start_time, end_time, bucket_minutes, path, None if bucket_minutes else limit)
+    samples = await run_select(statement, lambda rows: cgroup_history_rows(rows, bucket_minutes is not None))
+    return {"samples": samples, "count": len(samples)}
+
+
+def process_history_select(start_time: datetime, end_time: datetime, limit: int):
+    """Select of the processes recorded in a time range, newest first (rendered by process_history_rows)."""
     from app.models.database import ProcessHistory
     
-    query = db.query(ProcessHistory).filter(
+    return select(ProcessHistory.__table__).where(
         and_(
             ProcessHistory.created_at >= start_time,
             ProcessHistory.created_at <= end_time
         )
     ).order_by(ProcessHistory.created_at.desc()).limit(limit)
-    
-    processes = query.all()
-    
-    return {
-        "processes": [
-            {
-                "id": p.id,
-                "pid": p.pid,
-                "name": p.name,
-                "username": p.username,
-                "cpu_percent": p.cpu_percent,
-                "memory_percent": p.memory_percent,
-                "status": p.status,
-                "started_at": p.started_at.isoformat() if p.started_at else None,
-                "ended_at": p.ended_at.isoformat() if p.ended_at else None,
-                "created_at": p.created_at.isoformat()
-            }
-            for p in processes
-        ],
-        "count": len(processes)
-    }
 
+
+def process_history_rows(rows) -> List[Dict[str, Any]]:
+    """Response entries of process_history_select rows."""
+    return [
+        {
+            "id": p.id,
+            "pid": p.pid,
+            "name": p.name,
+            "username": p.username,
+            "cpu_percent": p.cpu_percent,
+            "memory_percent": p.memory_percent,
+            "status": p.status,
+            "started_at": p.started_at.isoformat() if p.started_at else None,
+            "ended_at": p.ended_at.isoformat() if p.ended_at else None,
+            "created_at": p.created_at.isoformat()
+        }
+        for p in rows
+    ]
+
+
+@router.get("/processes")
+async def get_process_history(
+    start_time: datetime = Query(...),
+    end_time: datetime = Query(...),
+    limit: int = Query(1000, le=10000),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get process execution history (requires authentication)."""
+    processes = await run_select(process_history_select(start_time, end_time, limit), process_history_rows)
+    return {"processes": processes, "count": len(processes)}
@@ -1,7 +1,14 @@
 """Real-time metrics endpoints (public)."""
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import json
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from app.http_cache import conditional_response, make_etag
 from app.services.system_monitor import system_monitor
-from app.models.metrics import SystemMetrics, SystemInfo
+from app.services.metrics_sampler import metrics_sampler
+from app.services.metrics_broadcaster import metrics_broadcaster, parse_groups, Subscriber
+from app.services.cgroup_collector import cgroup_collector
+from app.models.metrics import SystemMetrics, SystemInfo, CgroupListResponse
 from app.models.database import User
 from app.auth import get_current_active_user
 
@@ -17,40 +24,61 @@ def restart_system(current_user: User = Depends(get_current_active_user)):
     return {"message": "System restart initiated"}
 
 
+def _snapshot_response(request: Request, select):
+    """
+    Part of the sampler snapshot as a conditional response. The ETag is the
+    snapshot version; shared caches may reuse the body until the next sample.
+    """
+    version, snapshot = metrics_sampler.get_versioned_snapshot()
+    max_age = max(0, int(metrics_sampler.interval - (metrics_sampler.age or 0)))
+    return conditional_response(
+        request, make_etag(request.url.path, version), f"public, max-age={max_age}", lambda: select(snapshot)
+    )
+
+
 @router.get("/system", response_model=SystemInfo)
-def get_system_info():
+def get_system_info(request: Request):
     """Get general system information."""
-    return system_monitor.get_system_info()
+    info = system_monitor.get_system_info()
+    # Uptime is shown to the minute, so a cached body stays valid until the minute rolls over.
+    # The body still carries the exact uptime and cache ages, hence the weak ETag.
+    uptime = int(info.uptime)
+    return conditional_response(
+        request,
+        make_etag(request.url.path, system_monitor.info_version, uptime // 60, weak=True),
+        f"public, max-age={60 - uptime % 60}",
+        lambda: info
+    )
 
 
 @router.get("/current", response_model=SystemMetrics)
-def get_current_metrics():
+def get_current_metrics(request: Request):
     """Get current system metrics (public endpoint)."""
-    return system_monitor.get_all_metrics()
+    return _snapshot_response(request, lambda snapshot: snapshot)
 
 
 @router.get("/cpu")
-def get_cpu_metrics():
+def get_cpu_metrics(request: Request):
     """Get CPU metrics only."""
-    return system_monitor.get_cpu_metrics()
+    return _snapshot_response(request, lambda snapshot: snapshot.cpu)
 
 
 @router.get("/memory")
-def get_memory_metrics():
+def get_memory_metrics(request: Request):
     """Get memory metrics only."""
-    return system_monitor.get_memory_metrics()
+    return _snapshot_response(request, lambda snapshot: snapshot.memory)
 
 
 @router.get("/disk")
-def get_disk_metrics():
+def get_disk_metrics(request: Request):
     """Get disk metrics only."""
-    return system_monitor.get_disk_metrics()
+    return _snapshot_response(request, lambda snapshot: snapshot.disk)
 
 
 @router.get("/network")
-def get_network_metrics():
+def get_network_metrics(request: Request):
     """Get network metrics with live rates calculated directly from system."""
-    return system_monitor.get_network_metrics()
+    return _snapshot_response(request, lambda snapshot: snapshot.network)
 
 
 @router.get("/network/pernic")
@@ -60,7 +88,67 @@ def get_network_metrics_pernic():
 
 
 @router.get("/gpu")
-def get_gpu_metrics():
+def get_gpu_metrics(request: Request):
     """Get GPU metrics only."""
-    return system_monitor.get_gpu_metrics()
-
+    return _snapshot_response(request, lambda snapshot: snapshot.gpus)
+
+
+@router.get("/cgroups", response_model=CgroupListResponse)
+def get_cgroup_metrics(prefix: Optional[str] = None, limit: Optional[int] = Query(None, ge=1)):
+    """
+    Get per-cgroup (container / systemd slice) resource usage, highest CPU first.
+    prefix limits the result to cgroups below a path, e.g. /system.slice.
+    """
+    cgroups = cgroup_collector.get_snapshot()
+    if prefix:
+        cgroups = [cgroup for cgroup in cgroups if cgroup.path.startswith(prefix)]
+    return CgroupListResponse(timestamp=cgroup_collector.sampled_at, cgroups=cgroups[:limit])
+
+
+async def _receive_stream_commands(websocket: WebSocket, subscriber: Subscriber):
+    """Apply group changes sent by the client, e.g. {"groups": ["cpu", "gpus"]}."""
+    while True:
+        message = await websocket.receive_text()
+        try:
+            command = json.loads(message)
+        except ValueError:
+            continue
+        if isinstance(command, dict) and isinstance(command.get("groups"), list):
+            subscriber.groups = parse_groups(command["groups"])
+
+
+async def _send_stream_frames(websocket: WebSocket, subscriber: Subscriber):
+    """Forward broadcaster frames to the client."""
+    while True:
+        frame = await subscriber.get()
+        await websocket.send_text(frame)
+
+
+@router.websocket("/stream")
+async def stream_metrics(websocket: WebSocket, groups: Optional[str] = None):
+    """
+    Push every new metrics snapshot over a WebSocket (public endpoint).
+    groups is a comma-separated subset of cpu,memory,disk,network,gpus (default: all).
+    """
+    await websocket.accept()
+    subscriber = metrics_broadcaster.subscribe(parse_groups(groups.split(",") if groups else None))
+    try:
+        # Send the current snapshot right away instead of waiting for the next sample
+        snapshot = await asyncio.to_thread(metrics_sampler.get_snapshot)
+        await websocket.send_text(
+            metrics_broadcaster.render(snapshot, metrics_sampler.version, subscriber.groups)
+        )
+        
+        tasks = [
+            asyncio.create_task(_receive_stream_commands(websocket, subscriber)),
+            asyncio.create_task(_send_stream_frames(websocket, subscriber)),
+        ]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        metrics_broadcaster.unsubscribe(subscriber)
@@ -3,16 +3,62 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from app.models.database import User
 from app.auth import get_current_active_user
 from app.services.process_manager import process_manager
-from app.models.metrics import ProcessListResponse, ProcessInfo
+from app.models.metrics import ProcessListResponse
+from typing import Optional
 
 router = APIRouter()
 
 
 @router.get("/", response_model=ProcessListResponse)
-def get_processes(current_user: User = Depends(get_current_active_user)):
-    """Get all running processes (requires authentication)."""
-    processes = process_manager.get_all_processes()
-    return ProcessListResponse(processes=processes, total=len(processes))
+def get_processes(
+    sort: str = Query("cpu_percent", description="Field to sort by"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    limit: Optional[int] = Query(None, ge=1, description="Page size (all processes if omitted)"),
+    offset: int = Query(0, ge=0),
+    user: Optional[str] = Query(None, description="Exact username"),
+    status: Optional[str] = Query(None, description="Exact status, e.g. running or sleeping"),
+    name: Optional[str] = Query(None, description="Case-insensitive substring of the process name"),
+    min_cpu: Optional[float] = Query(None, ge=0),
+    min_memory: Optional[float] = Query(None, ge=0),
+    search: Optional[str] = Query(None, description="Case-insensitive substring of the name, user, PID or status"),
+    since: Optional[int] = Query(None, description="Version from a previous response; returns only the changes"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Get running processes, filtered, sorted and paged on the server (requires authentication).
+    
+    With since, the response is a delta against that version: added and changed
+    rows in processes and vanished PIDs in removed (sort and paging do not apply).
+    If the version is no longer kept, a full response is returned instead.
+    """
+    if since is not None:
+        changes = process_manager.get_changes(
+            since, user=user, status=status, name=name, min_cpu=min_cpu, min_memory=min_memory, search=search
+        )
+        if changes is not None:
+            version, changed, removed, total, process_count = changes
+            return ProcessListResponse(
+                processes=[process._asdict() for process in changed],
+                total=total,
+                process_count=process_count,
+                version=version,
+                delta=True,
+                removed=removed
+            )
+    
+    try:
+        processes, total, process_count, version = process_manager.get_processes(
+            sort=sort, order=order, limit=limit, offset=offset, user=user, status=status,
+            name=name, min_cpu=min_cpu, min_memory=min_memory, search=search
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ProcessListResponse(
+        processes=[process._asdict() for process in processes],
+        total=total,
+        process_count=process_count,
+        version=version
+    )
 
 
 @router.post("/{pid}/kill")
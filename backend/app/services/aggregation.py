@@ -0,0 +1,134 @@
+"""Columnar (NumPy) time-bucket aggregation of metric samples."""
+import math
+from collections import namedtuple
+from operator import attrgetter
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+import numpy as np
+from sqlalchemy.orm import Session
+from app.models.database import METRIC_FIELDS
+
+# Read-only row with the same attribute names as MetricSnapshot, used as a
+# lightweight result carrier instead of ORM instances
+MetricRow = namedtuple('MetricRow', ('timestamp',) + METRIC_FIELDS + ('gpu_data',))
+
+
+def as_utc(value: datetime) -> datetime:
+    """Timezone-aware UTC datetime; naive values are local time, as the collector writes them."""
+    return value.astimezone(timezone.utc)
+
+
+def local_bound(db: Session, value: datetime) -> datetime:
+    """
+    Bound for a metric_snapshots or gpu_samples timestamp. SQLite keeps the
+    collector's naive local time as text and compares text, so the bound is
+    converted to naive local time; PostgreSQL stores and compares instants.
+    """
+    if db.get_bind().dialect.name != "sqlite":
+        return value
+    return value.astimezone().replace(tzinfo=None)
+
+
+def columns_from_rows(rows: Sequence[Any]) -> Dict[str, np.ndarray]:
+    """
+    Convert MetricSnapshot-like rows into columns.
+    Returns 'timestamp' (epoch seconds), one float64 array per metric field with
+    NaN for missing values, and an object array 'gpu_data'.
+    """
+    count = len(rows)
+    columns: Dict[str, np.ndarray] = {
+        'timestamp': np.fromiter((r.timestamp.timestamp() for r in rows), dtype=np.float64, count=count)
+    }
+    for field in METRIC_FIELDS:
+        # None converts to NaN
+        columns[field] = np.fromiter(map(attrgetter(field), rows), dtype=np.float64, count=count)
+    gpu_data = np.empty(count, dtype=object)
+    gpu_data[:] = list(map(attrgetter('gpu_data'), rows))
+    columns['gpu_data'] = gpu_data
+    return columns
+
+
+def aggregate_columns(columns: Dict[str, np.ndarray], bucket_seconds: int,
+                      fields: Iterable[str] = METRIC_FIELDS) -> Dict[str, np.ndarray]:
+    """
+    Bucket columnar samples into fixed-width time buckets aligned to the epoch.
+
+    Bucket ids come from integer division of the timestamps and every statistic
+    is a single reduceat call per field. NaN marks a missing value and is
+    ignored; a bucket with no value for a field gets NaN.
+
+    Returns 'timestamp' (bucket starts), 'count' (samples per bucket),
+    '<field>_avg' / '<field>_min' / '<field>_max' per field, and 'gpu_data'
+    (value of the first sample of each bucket) if present in the input.
+
+    Capacity fields (cpu_count, memory_total, disk_total, disk_free) are
+    averaged like every other field, as the SQL buckets and rollups do; the
+    per-object code this replaced reported the bucket's first value for them.
+    """
+    fields = list(fields)
+    timestamps = columns['timestamp']
+    if len(timestamps) == 0:
+        result = {'timestamp': np.empty(0), 'count': np.empty(0, dtype=np.int64)}
+        for field in fields:
+            for stat in ('avg', 'min', 'max'):
+                result[f"{field}_{stat}"] = np.empty(0)
+        if 'gpu_data' in columns:
+            result['gpu_data'] = np.empty(0, dtype=object)
+        return result
+
+    order = None
+    if np.any(timestamps[1:] < timestamps[:-1]):
+        order = np.argsort(timestamps, kind='stable')
+        timestamps = timestamps[order]
+
+    bucket_ids = np.floor_divide(timestamps, bucket_seconds).astype(np.int64)
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(bucket_ids)) + 1))
+
+    sizes = np.diff(np.append(starts, len(timestamps)))
+    stats: Dict[str, np.ndarray] = {}
+    for field in fields:
+        values = columns[field] if order is None else columns[field][order]
+        missing = np.isnan(values)
+        if missing.any():
+            counts = sizes - np.add.reduceat(missing, starts)
+            sums = np.add.reduceat(np.where(missing, 0.0, values), starts)
+        else:
+            counts = sizes
+            sums = np.add.reduceat(values, starts)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            stats[f"{field}_avg"] = np.where(counts > 0, sums / counts, np.nan)
+        # fmin/fmax skip NaN, and give NaN only for buckets without any value
+        stats[f"{field}_min"] = np.fmin.reduceat(values, starts)
+        stats[f"{field}_max"] = np.fmax.reduceat(values, starts)
+
+    result = {
+        'timestamp': (bucket_ids[starts] * bucket_seconds).astype(np.float64),
+        'count': sizes,
+    }
+    result.update(stats)
+    if 'gpu_data' in columns:
+        gpu_data = columns['gpu_data'] if order is None else columns['gpu_data'][order]
+        result['gpu_data'] = gpu_data[starts]
+    return result
+
+
+def rows_from_columns(columns: Dict[str, np.ndarray], suffix: str = '') -> List[MetricRow]:
+    """
+    Build MetricRow carriers from columns; suffix selects e.g. the '_avg' columns
+    of aggregate_columns output. NaN becomes None like a NULL column.
+    """
+    count = len(columns['timestamp'])
+    timestamps = [datetime.fromtimestamp(ts, tz=timezone.utc) for ts in columns['timestamp'].tolist()]
+    fields = []
+    for field in METRIC_FIELDS:
+        column = columns.get(f"{field}{suffix}")
+        if column is None:
+            fields.append([None] * count)
+            continue
+        values = [None if math.isnan(v) else v for v in column.tolist()]
+        if field == 'cpu_count':
+            values = [None if v is None else int(round(v)) for v in values]
+        fields.append(values)
+    gpu_data: Optional[np.ndarray] = columns.get('gpu_data')
+    gpu_values = gpu_data.tolist() if gpu_data is not None else [None] * count
+    return [MetricRow(*row) for row in zip(timestamps, *fields, gpu_values)]
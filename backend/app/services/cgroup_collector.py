@@ -0,0 +1,226 @@
+"""cgroup v2 resource accounting per container / systemd slice."""
+import os
+import threading
+import time
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import insert
+from app.config import settings
+from app.database import SessionLocal
+from app.models.database import CgroupSample, CGROUP_FIELDS
+from app.models.metrics import CgroupMetrics
+
+logger = logging.getLogger(__name__)
+
+# A cgroup instance: a removed and recreated cgroup gets a new directory inode
+_Key = Tuple[str, int]
+
+# Cumulative counters read per cgroup; rates are derived from their deltas
+_COUNTERS = (
+    'usage_usec', 'throttled_usec', 'rbytes', 'wbytes', 'rios', 'wios',
+    'memory_some_usec', 'memory_full_usec',
+)
+
+
+def _parse_flat_keyed(data: str) -> Dict[str, int]:
+    """'key value' lines (cpu.stat)."""
+    values = {}
+    for line in data.splitlines():
+        key, _, value = line.partition(' ')
+        if value.isdigit():
+            values[key] = int(value)
+    return values
+
+
+def _parse_io_stat(data: str) -> Dict[str, int]:
+    """io.stat lines ('8:0 rbytes=1 wbytes=2 ...') summed over all devices."""
+    totals: Dict[str, int] = {}
+    for line in data.splitlines():
+        for field in line.split()[1:]:
+            key, _, value = field.partition('=')
+            if value.isdigit():
+                totals[key] = totals.get(key, 0) + int(value)
+    return totals
+
+
+def _parse_pressure(data: str) -> Dict[str, int]:
+    """Stall totals (usec) of a PSI file: {'some': ..., 'full': ...}."""
+    totals = {}
+    for line in data.splitlines():
+        kind, _, rest = line.partition(' ')
+        for field in rest.split():
+            if field.startswith('total='):
+                totals[kind] = int(field[6:])
+    return totals
+
+
+class CgroupCollector:
+    """
+    Samples cgroup v2 accounting files of every cgroup under root.
+
+    Each scheduler run walks the hierarchy down to max_depth (the root cgroup
+    is depth 0, /system.slice/docker-<id>.scope depth 2) and reads cpu.stat,
+    memory.current, memory.max, io.stat and memory.pressure of each cgroup -
+    a handful of files per container or slice, independent of the number of
+    processes in it. Cumulative counters are turned into rates against the previous run:
+    CPU and throttling in percent of one core, IO in bytes and operations per
+    second, memory pressure as the share of wall time tasks were stalled on
+    memory. Samples are published for the live endpoint and written to
+    cgroup_samples for history.
+
+    root is injectable, so the collector also runs against a fake sysfs tree.
+    """
+
+    def __init__(self, root: str = '/sys/fs/cgroup', max_depth: int = 2, store: bool = True):
+        self.root = root.rstrip('/') or '/'
+        self.max_depth = max_depth
+        self.store = store
+        self._counters: Dict[_Key, Dict[str, int]] = {}
+        self._last_sample: Optional[float] = None
+        self._snapshot: List[CgroupMetrics] = []
+        self._sampled_at: Optional[datetime] = None
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        """Whether a cgroup v2 (unified) hierarchy is mounted at root."""
+        return os.path.exists(os.path.join(self.root, 'cgroup.controllers'))
+
+    @property
+    def sampled_at(self) -> Optional[datetime]:
+        return self._sampled_at
+
+    def get_snapshot(self) -> List[CgroupMetrics]:
+        """Cgroups of the latest sample, busiest CPU consumers first."""
+        return self._snapshot
+
+    def _walk(self) -> List[Tuple[str, str, int]]:
+        """(cgroup path, directory, inode) of every cgroup down to max_depth."""
+        cgroups = [('/', self.root, os.stat(self.root).st_ino)]
+        level = [('', self.root)]
+        for _ in range(self.max_depth):
+            children = []
+            for path, directory in level:
+                try:
+                    with os.scandir(directory) as entries:
+                        for entry in entries:
+                            if entry.is_dir(follow_symlinks=False):
+                                child = f"{path}/{entry.name}"
+                                cgroups.append((child, entry.path, entry.inode()))
+                                children.append((child, entry.path))
+                except OSError:
+                    # Removed while walking
+                    continue
+            level = children
+        return cgroups
+
+    @staticmethod
+    def _read(directory: str, name: str) -> Optional[str]:
+        try:
+            with open(os.path.join(directory, name)) as f:
+                return f.read()
+        except OSError:
+            # Controller not enabled for this cgroup (or cgroup removed)
+            return None
+
+    def _read_cgroup(self, directory: str) -> Tuple[Dict[str, int], Optional[int], Optional[int]]:
+        """Cumulative counters, memory.current and memory.max (None if unlimited) of one cgroup."""
+        counters: Dict[str, int] = {}
+        data = self._read(directory, 'cpu.stat')
+        if data is not None:
+            cpu = _parse_flat_keyed(data)
+            for key in ('usage_usec', 'throttled_usec'):
+                if key in cpu:
+                    counters[key] = cpu[key]
+        data = self._read(directory, 'io.stat')
+        if data is not None:
+            io = _parse_io_stat(data)
+            for key in ('rbytes', 'wbytes', 'rios', 'wios'):
+                counters[key] = io.get(key, 0)
+        data = self._read(directory, 'memory.pressure')
+        if data is not None:
+            pressure = _parse_pressure(data)
+            for kind in ('some', 'full'):
+                if kind in pressure:
+                    counters[f'memory_{kind}_usec'] = pressure[kind]
+        data = self._read(directory, 'memory.current')
+        memory_current = int(data) if data is not None and data.strip().isdigit() else None
+        # 'max' means no limit
+        data = self._read(directory, 'memory.max')
+        memory_max = int(data) if data is not None and data.strip().isdigit() else None
+        return counters, memory_current, memory_max
+
+    def collect(self) -> List[CgroupMetrics]:
+        """Read every cgroup and compute rates against the previous collect()."""
+        now = time.monotonic()
+        elapsed = now - self._last_sample if self._last_sample is not None else None
+
+        cgroups = []
+        counters_by_key = {}
+        for path, directory, inode in self._walk():
+            counters, memory_current, memory_max = self._read_cgroup(directory)
+            if not counters and memory_current is None:
+                continue
+            key = (path, inode)
+            counters_by_key[key] = counters
+            previous = self._counters.get(key)
+
+            rates: Dict[str, Optional[float]] = dict.fromkeys(_COUNTERS)
+            if previous is not None and elapsed:
+                for name in _COUNTERS:
+                    if name in counters and name in previous and counters[name] >= previous[name]:
+                        rates[name] = (counters[name] - previous[name]) / elapsed
+
+            def percent(name):
+                # usec of CPU (or stall) time per second of wall time, as a percentage
+                return round(rates[name] / 1e4, 2) if rates[name] is not None else None
+
+            cgroups.append(CgroupMetrics(
+                path=path,
+                cpu_percent=percent('usage_usec'),
+                cpu_throttled_percent=percent('throttled_usec'),
+                memory_current=memory_current,
+                memory_max=memory_max,
+                io_read_rate=rates['rbytes'],
+                io_write_rate=rates['wbytes'],
+                io_read_ops_rate=rates['rios'],
+                io_write_ops_rate=rates['wios'],
+                memory_pressure=percent('memory_some_usec'),
+                memory_pressure_full=percent('memory_full_usec')
+            ))
+
+        # Removed cgroups drop out of the counter cache
+        self._counters = counters_by_key
+        self._last_sample = now
+        cgroups.sort(key=lambda cgroup: cgroup.cpu_percent or 0.0, reverse=True)
+        return cgroups
+
+    def sample(self):
+        """Collect, publish and store one sample (scheduler job)."""
+        with self._lock:
+            try:
+                first = self._last_sample is None
+                cgroups = self.collect()
+                timestamp = datetime.now(timezone.utc)
+                self._snapshot = cgroups
+                self._sampled_at = timestamp
+                # The first run only primes the counters; it has no rates to store
+                if self.store and not first and cgroups:
+                    self._write(timestamp, cgroups)
+            except Exception as e:
+                logger.error(f"Error collecting cgroup metrics: {e}")
+
+    def _write(self, timestamp: datetime, cgroups: List[CgroupMetrics]):
+        db = SessionLocal()
+        try:
+            db.execute(insert(CgroupSample), [
+                dict(timestamp=timestamp, path=cgroup.path, **{field: getattr(cgroup, field) for field in CGROUP_FIELDS})
+                for cgroup in cgroups
+            ])
+            db.commit()
+        finally:
+            db.close()
+
+
+# Global instance
+cgroup_collector = CgroupCollector(root=settings.CGROUP_ROOT, max_depth=settings.CGROUP_MAX_DEPTH)
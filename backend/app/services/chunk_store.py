@@ -0,0 +1,285 @@
+"""Compressed columnar storage of closed metric time chunks."""
+import struct
+import zlib
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List
+import numpy as np
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.models.database import MetricChunk, MetricSnapshot, METRIC_FIELDS
+from app.services.aggregation import local_bound
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b'MC1'
+_HEADER = struct.Struct('<3sI')  # magic, sample count
+_SECTION = struct.Struct('<I')  # section length
+
+# Closed chunks encoded per compaction run, so a large backlog is spread out
+MAX_CHUNKS_PER_RUN = 24
+
+
+def _shuffle(values: np.ndarray) -> bytes:
+    """Group the n-th byte of every 64-bit value together; similar bytes compress far better."""
+    return values.view(np.uint8).reshape(-1, 8).T.tobytes()
+
+
+def _unshuffle(data: bytes, count: int) -> np.ndarray:
+    return np.frombuffer(data, dtype=np.uint8).reshape(8, count).T.copy().view(np.uint64).ravel()
+
+
+def encode_timestamps(timestamps_us: np.ndarray) -> bytes:
+    """
+    Delta-of-delta encode int64 microsecond timestamps. With a steady sampling
+    interval every value shrinks to the scheduling jitter.
+    """
+    deltas = np.diff(timestamps_us, prepend=0)
+    dod = np.diff(deltas, prepend=0)
+    zigzag = ((dod << 1) ^ (dod >> 63)).astype(np.uint64)  # small magnitudes -> small codes
+    return zlib.compress(_shuffle(zigzag))
+
+
+def decode_timestamps(data: bytes, count: int) -> np.ndarray:
+    zigzag = _unshuffle(zlib.decompress(data), count)
+    dod = (zigzag >> np.uint64(1)).astype(np.int64) ^ -(zigzag & np.uint64(1)).astype(np.int64)
+    return np.cumsum(np.cumsum(dod))
+
+
+def encode_floats(values: np.ndarray) -> bytes:
+    """
+    Gorilla-style XOR encoding: each float64 is XORed with its predecessor, so
+    unchanged values become zero words and slowly changing ones share their
+    sign/exponent bits. The XOR stream is byte-shuffled and deflated instead of
+    bit-packed, which keeps encoding and decoding vectorized. NaN round-trips.
+    """
+    bits = np.ascontiguousarray(values, dtype=np.float64).view(np.uint64)
+    xored = bits ^ np.concatenate((np.zeros(1, dtype=np.uint64), bits[:-1]))
+    return zlib.compress(_shuffle(xored))
+
+
+def decode_floats(data: bytes, count: int) -> np.ndarray:
+    xored = _unshuffle(zlib.decompress(data), count)
+    return np.bitwise_xor.accumulate(xored).view(np.float64)
+
+
+def encode_chunk(columns: Dict[str, np.ndarray]) -> bytes:
+    """Encode 'timestamp' (epoch seconds), the METRIC_FIELDS and 'gpu_data' into one payload."""
+    count = len(columns['timestamp'])
+    timestamps_us = np.round(columns['timestamp'] * 1_000_000).astype(np.int64)
+    sections = [encode_timestamps(timestamps_us)]
+    sections.extend(encode_floats(columns[field]) for field in METRIC_FIELDS)
+    # JSON text never contains a raw newline, so it can separate the GPU entries
+    gpu_text = '\n'.join(value or '' for value in columns['gpu_data'].tolist())
+    sections.append(zlib.compress(gpu_text.encode('utf-8')))
+
+    parts = [_HEADER.pack(_MAGIC, count)]
+    for section in sections:
+        parts.append(_SECTION.pack(len(section)))
+        parts.append(section)
+    return b''.join(parts)
+
+
+def decode_chunk(payload: bytes) -> Dict[str, np.ndarray]:
+    """Inverse of encode_chunk."""
+    magic, count = _HEADER.unpack_from(payload, 0)
+    if magic != _MAGIC:
+        raise ValueError("Unknown metric chunk format")
+    offset = _HEADER.size
+    sections = []
+    while offset < len(payload):
+        (length,) = _SECTION.unpack_from(payload, offset)
+        offset += _SECTION.size
+        sections.append(payload[offset:offset + length])
+        offset += length
+
+    columns = {'timestamp': decode_timestamps(sections[0], count) / 1_000_000}
+    for i, field in enumerate(METRIC_FIELDS):
+        columns[field] = decode_floats(sections[i + 1], count)
+    gpu_data = np.empty(count, dtype=object)
+    if count:
+        gpu_data[:] = [value or None for value in zlib.decompress(sections[-1]).decode('utf-8').split('\n')]
+    columns['gpu_data'] = gpu_data
+    return columns
+
+
+def _empty_columns() -> Dict[str, np.ndarray]:
+    columns = {'timestamp': np.empty(0, dtype=np.float64)}
+    for field in METRIC_FIELDS:
+        columns[field] = np.empty(0, dtype=np.float64)
+    columns['gpu_data'] = np.empty(0, dtype=object)
+    return columns
+
+
+def _concat_columns(parts: List[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    parts = [part for part in parts if len(part['timestamp'])]
+    if not parts:
+        return _empty_columns()
+    if len(parts) == 1:
+        return parts[0]
+    return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+
+def _merge_columns(parts: List[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    """
+    Concatenate column sets into one sorted by timestamp. Samples with the
+    same timestamp (to the microsecond) are kept once, from the earliest part,
+    so raw rows that were already encoded into a chunk are not counted twice.
+    """
+    columns = _concat_columns(parts)
+    timestamps_us = np.round(columns['timestamp'] * 1_000_000).astype(np.int64)
+    if np.all(np.diff(timestamps_us) > 0):
+        return columns
+    order = np.argsort(timestamps_us, kind='stable')
+    sorted_us = timestamps_us[order]
+    keep = order[np.concatenate(([True], np.diff(sorted_us) != 0))]
+    return {key: value[keep] for key, value in columns.items()}
+
+
+def _utc(epoch: float) -> datetime:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc)
+
+
+class ChunkStore:
+    """
+    Optional long-term storage engine for metric history.
+
+    A compaction job encodes every closed chunk_seconds window of
+    metric_snapshots into one compressed metric_chunks row and deletes the
+    raw rows it encoded in the same transaction. Rows that arrive late for a
+    window that already has a chunk are merged into it by the next run.
+    Reads decode only the chunks overlapping the requested range and merge in
+    the raw rows of the range, i.e. the current, still open chunk and late
+    rows not compacted yet.
+    """
+
+    def __init__(self, chunk_seconds: int, settle_seconds: float):
+        self.chunk_seconds = chunk_seconds
+        # Raw rows are written in batches; wait this long after a window closes
+        self.settle_seconds = settle_seconds
+
+    def _raw_columns(self, db: Session, start_time: datetime, end_time: datetime,
+                     end_inclusive: bool = False, extra_filter=None) -> Dict[str, np.ndarray]:
+        """Load metric_snapshots rows of a range as columns."""
+        start_time, end_time = local_bound(db, start_time), local_bound(db, end_time)
+        upper = MetricSnapshot.timestamp <= end_time if end_inclusive else MetricSnapshot.timestamp < end_time
+        query = db.query(
+            MetricSnapshot.timestamp,
+            *[getattr(MetricSnapshot, field) for field in METRIC_FIELDS],
+            MetricSnapshot.gpu_data
+        ).filter(and_(MetricSnapshot.timestamp >= start_time, upper))
+        if extra_filter is not None:
+            query = query.filter(extra_filter)
+        rows = query.order_by(MetricSnapshot.timestamp.asc()).all()
+
+        count = len(rows)
+        columns = {'timestamp': np.fromiter((row[0].timestamp() for row in rows), dtype=np.float64, count=count)}
+        for i, field in enumerate(METRIC_FIELDS):
+            columns[field] = np.fromiter((row[i + 1] for row in rows), dtype=np.float64, count=count)
+        gpu_data = np.empty(count, dtype=object)
+        gpu_data[:] = [row[-1] for row in rows]
+        columns['gpu_data'] = gpu_data
+        return columns
+
+    def compact(self):
+        """Encode closed windows that have no chunk yet (scheduler job)."""
+        try:
+            db = SessionLocal()
+            try:
+                written = self._compact(db)
+                if written:
+                    logger.info(f"Compacted {written} metric chunks")
+            finally:
+                db.close()
+        except Exception as e:
+            logger.error(f"Error compacting metric chunks: {e}")
+
+    def _compact(self, db: Session) -> int:
+        closed_before = datetime.now(timezone.utc).timestamp() - self.settle_seconds
+        written = 0
+        while written < MAX_CHUNKS_PER_RUN:
+            # Compacted rows are deleted, so the oldest raw row is in the next window to encode
+            first_raw = db.query(func.min(MetricSnapshot.timestamp)).scalar()
+            if first_raw is None:
+                break
+            start = first_raw.timestamp() - first_raw.timestamp() % self.chunk_seconds
+            end = start + self.chunk_seconds
+            if end > closed_before:
+                break
+
+            in_window = and_(MetricSnapshot.timestamp >= local_bound(db, _utc(start)),
+                             MetricSnapshot.timestamp < local_bound(db, _utc(end)))
+            # Rows written while this window is encoded are left for the next run
+            last_id = db.query(func.max(MetricSnapshot.id)).filter(in_window).scalar()
+            encoded = and_(in_window, MetricSnapshot.id <= last_id)
+            columns = self._raw_columns(db, _utc(start), _utc(end), extra_filter=MetricSnapshot.id <= last_id)
+            chunk = db.query(MetricChunk).filter(MetricChunk.chunk_start == _utc(start)).one_or_none()
+            if chunk is None:
+                db.add(MetricChunk(
+                    chunk_start=_utc(start),
+                    chunk_end=_utc(end),
+                    sample_count=len(columns['timestamp']),
+                    payload=encode_chunk(columns)
+                ))
+            else:
+                # Late rows for a window that was already compacted
+                columns = _merge_columns([decode_chunk(chunk.payload), columns])
+                chunk.sample_count = len(columns['timestamp'])
+                chunk.payload = encode_chunk(columns)
+            db.query(MetricSnapshot).filter(encoded).delete(synchronize_session=False)
+            db.commit()
+            written += 1
+        return written
+
+    def read_columns(self, db: Session, start_time: datetime, end_time: datetime) -> Dict[str, np.ndarray]:
+        """All samples in [start_time, end_time] as columns, decoding only overlapping chunks."""
+        chunks = db.query(MetricChunk).filter(
+            and_(MetricChunk.chunk_end > start_time, MetricChunk.chunk_start <= end_time)
+        ).order_by(MetricChunk.chunk_start.asc()).all()
+
+        start = start_time.timestamp()
+        end = end_time.timestamp()
+        parts = []
+        for chunk in chunks:
+            columns = decode_chunk(chunk.payload)
+            timestamps = columns['timestamp']
+            lo = np.searchsorted(timestamps, start, side='left')
+            hi = np.searchsorted(timestamps, end, side='right')
+            parts.append({key: value[lo:hi] for key, value in columns.items()})
+
+        # Raw rows anywhere in the range: the open window, gaps between chunks
+        # and late rows not merged into their chunk yet
+        parts.append(self._raw_columns(db, start_time, end_time, end_inclusive=True))
+        return _merge_columns(parts)
+
+    def iter_columns(self, db: Session, start_time: datetime, end_time: datetime) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        Samples in [start_time, end_time] as columns, one chunk_seconds window
+        at a time, so long ranges are read with bounded memory.
+        """
+        end = end_time.timestamp()
+        window_start = start_time.timestamp()
+        while window_start <= end:
+            window_end = window_start - window_start % self.chunk_seconds + self.chunk_seconds
+            columns = self.read_columns(db, _utc(window_start), _utc(min(window_end, end)))
+            if window_end <= end:
+                # The next window starts at window_end
+                inside = columns['timestamp'] < window_end
+                columns = {key: value[inside] for key, value in columns.items()}
+            if len(columns['timestamp']):
+                yield columns
+            window_start = window_end
+
+    def cleanup(self, db: Session, retention_days: int):
+        """Delete chunks that ended before the retention cutoff."""
+        cutoff_date = datetime.now(timezone.utc) - timedelta(days=retention_days)
+        db.query(MetricChunk).filter(MetricChunk.chunk_end < cutoff_date).delete()
+
+
+# Global instance
+chunk_store = ChunkStore(
+    chunk_seconds=settings.COMPRESSED_CHUNK_MINUTES * 60,
+    settle_seconds=settings.METRICS_WRITE_FLUSH_INTERVAL + settings.METRICS_COLLECTION_INTERVAL * 2
+)
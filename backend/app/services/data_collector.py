@@ -1,63 +1,269 @@
 """Background data collection service."""
-from datetime import datetime, timedelta
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
+from app.config import settings
 from app.database import SessionLocal
-from app.models.database import MetricSnapshot
-from app.services.system_monitor import system_monitor
+from app.models.database import CgroupSample, GPUSample, MetricSnapshot, MetricRollup, ProcessHistory, GPU_FIELDS
+from app.models.metrics import SystemMetrics
+from app.services.metrics_sampler import metrics_sampler
+from app.services.rollups import rollup_manager, RollupManager
+from app.services.aggregation import as_utc, local_bound
+from app.services.chunk_store import chunk_store
+from app.services.history_cache import history_cache
+from app.services.partitions import snapshot_partitioner, SnapshotPartitioner
+from typing import Any, Dict, List, Optional, Tuple
 import json
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
 
 class DataCollector:
-    """Background service for collecting and storing metrics."""
+    """
+    Background service for collecting and storing metrics.
     
-    def collect_and_store(self):
-        """Collect current metrics and store in database."""
+    Snapshots are buffered in memory (write-behind) and written as one
+    multi-row INSERT once batch_size rows are pending or flush_interval seconds
+    have passed since the last flush. Flushes run off the sampler thread, and
+    the buffer keeps at most max_pending rows, dropping the oldest while the
+    database is unavailable or slow. Rollup rows for buckets closed by the
+    queued snapshots are written in the same transaction; they are bounded the
+    same way, and dropped snapshots and rollup rows are counted and logged.
+    """
+    
+    def __init__(self, batch_size: int, flush_interval: float, max_pending: int,
+                 rollups: RollupManager, partitioner: SnapshotPartitioner):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.rollups = rollups
+        self.partitioner = partitioner
+        self._pending: deque = deque(maxlen=max(self.batch_size, max_pending))
+        self._pending_rollups: deque = deque(maxlen=max(self.batch_size, max_pending))
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # Held while a batch commits; hold it to read unwritten rows and the tables consistently
+        self.commit_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._in_flight: Optional[datetime] = None  # oldest timestamp of the batch being written
+        self._in_flight_rollups: List[Dict[str, Any]] = []  # rollup rows of the batch being written
+        self._data_version = 0
+        self.dropped = 0
+        self.dropped_rollups = 0
+    
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+    
+    @property
+    def data_version(self) -> int:
+        """Increases whenever stored history changes (a batch is written or old data is removed)."""
+        return self._data_version
+    
+    @property
+    def oldest_unwritten(self) -> Optional[datetime]:
+        """
+        Oldest time whose history is not fully committed to the database: the
+        oldest pending or in-flight snapshot, or the start of the oldest closed
+        rollup bucket still waiting to be written. None if everything is written.
+        """
+        with self._pending_lock:
+            candidates = [self._pending[0]['timestamp']] if self._pending else []
+            if self._in_flight is not None:
+                candidates.append(self._in_flight)
+            candidates.extend(
+                row['bucket_start'] for rows in (self._in_flight_rollups, self._pending_rollups) for row in rows
+            )
+        # Snapshots are naive local time, rollup buckets aware UTC
+        return min(candidates, key=as_utc) if candidates else None
+    
+    def unwritten_rollups(self, resolution: int) -> List[Dict[str, Any]]:
+        """
+        Rollup rows of a tier that are not committed to the database: closed
+        buckets waiting to be written and the bucket still being filled. Take
+        them under commit_lock along with the table, so none is seen twice.
+        """
+        with self._pending_lock:
+            # Buckets close under this lock, so a bucket is either open or queued here
+            return [
+                row for rows in (self._in_flight_rollups, self._pending_rollups) for row in rows
+                if row['resolution'] == resolution
+            ] + self.rollups.open_rows(resolution)
+    
+    def _snapshot_row(self, metrics: SystemMetrics) -> Dict[str, Any]:
+        """Convert a metrics snapshot into a metric_snapshots row."""
+        # Prepare GPU data as JSON
+        gpu_data = [gpu.model_dump() for gpu in metrics.gpus]
+        
+        return dict(
+            timestamp=metrics.timestamp,
+            cpu_percent=metrics.cpu.percent,
+            cpu_count=metrics.cpu.count,
+            cpu_freq_current=metrics.cpu.freq_current,
+            memory_total=metrics.memory.total,
+            memory_available=metrics.memory.available,
+            memory_percent=metrics.memory.percent,
+            memory_used=metrics.memory.used,
+            disk_total=metrics.disk.total,
+            disk_used=metrics.disk.used,
+            disk_free=metrics.disk.free,
+            disk_percent=metrics.disk.percent,
+            network_bytes_sent=metrics.network.bytes_sent,
+            network_bytes_recv=metrics.network.bytes_recv,
+            network_packets_sent=metrics.network.packets_sent,
+            network_packets_recv=metrics.network.packets_recv,
+            gpu_data=json.dumps(gpu_data)
+        )
+    
+    def collect_and_store(self, metrics: Optional[SystemMetrics] = None):
+        """Queue a metrics snapshot (the sampler's latest if not given) for storage."""
         try:
-            metrics = system_monitor.get_all_metrics()
-            db = SessionLocal()
-            try:
-                # Prepare GPU data as JSON
-                gpu_data = [gpu.dict() for gpu in metrics.gpus]
-                
-                snapshot = MetricSnapshot(
-                    timestamp=metrics.timestamp,
-                    cpu_percent=metrics.cpu.percent,
-                    cpu_count=metrics.cpu.count,
-                    cpu_freq_current=metrics.cpu.freq_current,
-                    memory_total=metrics.memory.total,
-                    memory_available=metrics.memory.available,
-                    memory_percent=metrics.memory.percent,
-                    memory_used=metrics.memory.used,
-                    disk_total=metrics.disk.total,
-                    disk_used=metrics.disk.used,
-                    disk_free=metrics.disk.free,
-                    disk_percent=metrics.disk.percent,
-                    network_bytes_sent=metrics.network.bytes_sent,
-                    network_bytes_recv=metrics.network.bytes_recv,
-                    network_packets_sent=metrics.network.packets_sent,
-                    network_packets_recv=metrics.network.packets_recv,
-                    gpu_data=json.dumps(gpu_data)
-                )
-                db.add(snapshot)
-                db.commit()
-            finally:
-                db.close()
+            if metrics is None:
+                metrics = metrics_sampler.get_snapshot()
+            row = self._snapshot_row(metrics)
+            
+            with self._pending_lock:
+                if len(self._pending) == self._pending.maxlen:
+                    self.dropped += 1
+                    if self.dropped == 1 or self.dropped % 100 == 0:
+                        logger.warning(f"Metrics write buffer full, dropped {self.dropped} oldest snapshots")
+                self._pending.append(row)
+                self._queue_rollups(self.rollups.add(row))
+                due = (len(self._pending) >= self.batch_size or
+                       time.monotonic() - self._last_flush >= self.flush_interval)
+            
+            # Write in the background so a slow database never delays sampling
+            if due and not self._flush_lock.locked():
+                threading.Thread(target=self.flush, name="metrics-flush", daemon=True).start()
         except Exception as e:
             logger.error(f"Error collecting metrics: {e}")
     
-    def cleanup_old_data(self, retention_days: int = 30):
-        """Remove metrics older than retention period."""
+    def _queue_rollups(self, rollup_rows: List[Dict[str, Any]]):
+        """Queue rollup rows, counting the oldest ones pushed out when full. Call with _pending_lock held."""
+        lost = len(self._pending_rollups) + len(rollup_rows) - self._pending_rollups.maxlen
+        self._pending_rollups.extend(rollup_rows)
+        if lost > 0:
+            previous = self.dropped_rollups
+            self.dropped_rollups += lost
+            if previous == 0 or previous // 100 != self.dropped_rollups // 100:
+                logger.warning(f"Metrics write buffer full, dropped {self.dropped_rollups} oldest rollup rows")
+    
+    def _take_pending(self) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Remove and return all pending snapshot and rollup rows."""
+        with self._pending_lock:
+            rows = list(self._pending)
+            rollup_rows = list(self._pending_rollups)
+            self._pending.clear()
+            self._pending_rollups.clear()
+            # Set together with emptying the queue, so readers always see the rows as unwritten
+            self._in_flight = rows[0]['timestamp'] if rows else None
+            self._in_flight_rollups = rollup_rows
+            self._last_flush = time.monotonic()
+        return rows, rollup_rows
+    
+    def _requeue(self, rows: List[Dict[str, Any]], rollup_rows: List[Dict[str, Any]]):
+        """Put rows from a failed flush back in front of newer ones (still bounded)."""
+        with self._pending_lock:
+            newer = list(self._pending)
+            self._pending.clear()
+            self._pending.extend(rows + newer)
+            lost = len(rows) + len(newer) - len(self._pending)
+            if lost > 0:
+                # extend() keeps the newest rows when over capacity
+                self.dropped += lost
+            newer_rollups = list(self._pending_rollups)
+            self._pending_rollups.clear()
+            self._queue_rollups(rollup_rows + newer_rollups)
+    
+    def _gpu_rows(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """gpu_samples rows (one per GPU) for a batch of snapshot rows."""
+        gpu_rows = []
+        for row in rows:
+            for gpu in json.loads(row['gpu_data'] or '[]'):
+                gpu_row = {field: gpu.get(field) for field in GPU_FIELDS}
+                gpu_row.update(timestamp=row['timestamp'], gpu_index=gpu['index'], name=gpu.get('name'))
+                gpu_rows.append(gpu_row)
+        return gpu_rows
+    
+    def _write_rows(self, db: Session, rows: List[Dict[str, Any]], rollup_rows: List[Dict[str, Any]]):
+        """Write one batch of rows in a single transaction."""
+        if rows:
+            # Executemany on a Core insert is sent as multi-row INSERT ... VALUES batches
+            db.execute(insert(MetricSnapshot), rows)
+            gpu_rows = self._gpu_rows(rows)
+            if gpu_rows:
+                db.execute(insert(GPUSample), gpu_rows)
+        self.rollups.write(db, rollup_rows)
+        with self.commit_lock:
+            db.commit()
+            with self._pending_lock:
+                self._in_flight = None
+                self._in_flight_rollups = []
+    
+    def flush(self):
+        """Write all pending snapshots to the database as one batch."""
+        with self._flush_lock:
+            rows, rollup_rows = self._take_pending()
+            if not rows and not rollup_rows:
+                return
+            try:
+                db = SessionLocal()
+                try:
+                    self._write_rows(db, rows, rollup_rows)
+                    self._data_version += 1
+                finally:
+                    db.close()
+            except Exception as e:
+                logger.error(f"Error storing {len(rows)} metric snapshots: {e}")
+                self._requeue(rows, rollup_rows)
+            finally:
+                with self._pending_lock:
+                    self._in_flight = None
+                    self._in_flight_rollups = []
+    
+    def close(self):
+        """Write everything still buffered, including partially filled rollup buckets (on shutdown)."""
+        with self._pending_lock:
+            self._queue_rollups(self.rollups.drain())
+        self.flush()
+    
+    def cleanup_old_data(self, retention_days: int = 30, rollup_retention_days: int = 365,
+                         chunk_retention_days: Optional[int] = None):
+        """Remove raw metrics, GPU and cgroup samples, process history, rollups and compressed chunks past their retention periods."""
         try:
             db = SessionLocal()
             try:
-                cutoff_date = datetime.utcnow() - timedelta(days=retention_days)
-                db.query(MetricSnapshot).filter(
-                    MetricSnapshot.timestamp < cutoff_date
+                if self.partitioner.enabled:
+                    # Whole partitions are dropped; no row-by-row delete
+                    self.partitioner.drop_expired(datetime.now(timezone.utc) - timedelta(days=retention_days))
+                else:
+                    cutoff_date = local_bound(db, datetime.now(timezone.utc) - timedelta(days=retention_days))
+                    db.query(MetricSnapshot).filter(
+                        MetricSnapshot.timestamp < cutoff_date
+                    ).delete()
+                db.query(GPUSample).filter(
+                    GPUSample.timestamp < local_bound(db, datetime.now(timezone.utc) - timedelta(days=retention_days))
+                ).delete()
+                db.query(CgroupSample).filter(
+                    CgroupSample.timestamp < datetime.now(timezone.utc) - timedelta(days=retention_days)
                 ).delete()
+                # Finished processes; rows of processes still running are kept
+                db.query(ProcessHistory).filter(
+                    ProcessHistory.ended_at < datetime.now(timezone.utc) - timedelta(days=retention_days)
+                ).delete()
+                rollup_cutoff_date = datetime.utcnow() - timedelta(days=rollup_retention_days)
+                db.query(MetricRollup).filter(
+                    MetricRollup.bucket_start < rollup_cutoff_date
+                ).delete()
+                if chunk_retention_days is not None:
+                    chunk_store.cleanup(db, chunk_retention_days)
                 db.commit()
+                self._data_version += 1
+                # Cached series may still hold buckets that were just deleted
+                history_cache.clear()
             finally:
                 db.close()
         except Exception as e:
@@ -65,5 +271,10 @@ class DataCollector:
 
 
 # Global instance
-data_collector = DataCollector()
-
+data_collector = DataCollector(
+    batch_size=settings.METRICS_WRITE_BATCH_SIZE,
+    flush_interval=settings.METRICS_WRITE_FLUSH_INTERVAL,
+    max_pending=settings.METRICS_WRITE_MAX_PENDING,
+    rollups=rollup_manager,
+    partitioner=snapshot_partitioner
+)
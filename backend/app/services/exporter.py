@@ -0,0 +1,364 @@
+"""Streaming export of stored history (CSV, Arrow IPC, Parquet, msgpack)."""
+import csv
+import io
+import logging
+import math
+import queue
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+from sqlalchemy import BigInteger, Integer, and_, cast, func, select
+from app.config import settings
+from app.database import SessionLocal, engine
+from app.models.database import GPUSample, MetricSnapshot, GPU_FIELDS, METRIC_FIELDS
+from app.services.aggregation import as_utc, local_bound
+from app.services.chunk_store import chunk_store
+
+logger = logging.getLogger(__name__)
+
+# Exportable tables: model and the columns after the timestamp
+SOURCES = {
+    "metrics": (MetricSnapshot, METRIC_FIELDS),
+    "gpus": (GPUSample, ('gpu_index', 'name') + GPU_FIELDS),
+}
+
+# Columns that are not float64
+_INT_COLUMNS = {'cpu_count', 'gpu_index'}
+_STRING_COLUMNS = {'name'}
+
+# One batch of rows as {column: values}; timestamps are datetimes, or integer
+# microseconds since the epoch for writers with epoch_timestamps
+Batch = Dict[str, List[Any]]
+
+# Output chunk size and queued chunks of a PostgreSQL COPY
+_COPY_CHUNK_SIZE = 1 << 20
+_COPY_QUEUE_DEPTH = 4
+
+
+class _Sink(io.RawIOBase):
+    """Write-only file that hands out what was written since the last drain()."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class _CopyPipe(io.RawIOBase):
+    """
+    File that COPY ... TO STDOUT writes into on a worker thread; chunks() hands
+    the output out in pieces of about _COPY_CHUNK_SIZE bytes. The queue between
+    them is bounded, so a slow client holds the COPY back.
+    """
+
+    _DONE = object()
+
+    def __init__(self):
+        self._queue: queue.Queue = queue.Queue(maxsize=_COPY_QUEUE_DEPTH)
+        self._buffer = bytearray()
+        self._abandoned = False
+        self.rowcount = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        if len(self._buffer) >= _COPY_CHUNK_SIZE:
+            self._put(bytes(self._buffer))
+            self._buffer.clear()
+        return len(data)
+
+    def _put(self, item):
+        while True:
+            if self._abandoned:
+                # Aborts the COPY once the reader is gone
+                raise IOError("export stream closed")
+            try:
+                self._queue.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def finish(self, error: Optional[BaseException] = None):
+        """Called by the writing thread when the COPY ends, with its exception if it failed."""
+        try:
+            if self._buffer and error is None:
+                self._put(bytes(self._buffer))
+            self._put(error if error is not None else self._DONE)
+        except IOError:
+            pass
+
+    def chunks(self) -> Iterator[bytes]:
+        try:
+            while True:
+                item = self._queue.get()
+                if item is self._DONE:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            self._abandoned = True
+
+
+class CSVWriter:
+    media_type = "text/csv"
+    extension = "csv"
+    epoch_timestamps = False
+
+    def __init__(self, columns: Sequence[str]):
+        self.columns = columns
+
+    def begin(self) -> bytes:
+        return (",".join(self.columns) + "\r\n").encode()
+
+    def write(self, batch: Batch) -> bytes:
+        buffer = io.StringIO()
+        rows = zip(*(batch[column] for column in self.columns))
+        csv.writer(buffer).writerows(
+            (timestamp.isoformat(), *values) for timestamp, *values in rows
+        )
+        return buffer.getvalue().encode()
+
+    def end(self) -> bytes:
+        return b''
+
+
+class MsgpackWriter:
+    """A sequence of msgpack maps, one per batch: {column: [values]}; timestamps are epoch seconds."""
+    media_type = "application/msgpack"
+    extension = "msgpack"
+    epoch_timestamps = True
+
+    def __init__(self, columns: Sequence[str]):
+        import msgpack
+        self.columns = columns
+        self._packer = msgpack.Packer()
+
+    def begin(self) -> bytes:
+        return b''
+
+    def write(self, batch: Batch) -> bytes:
+        columns = {column: batch[column] for column in self.columns}
+        columns['timestamp'] = [timestamp / 1e6 for timestamp in columns['timestamp']]
+        return self._packer.pack(columns)
+
+    def end(self) -> bytes:
+        return b''
+
+
+class ArrowWriter:
+    """Arrow IPC stream; one record batch per database fetch."""
+    media_type = "application/vnd.apache.arrow.stream"
+    extension = "arrow"
+    epoch_timestamps = True
+
+    def __init__(self, columns: Sequence[str]):
+        import pyarrow
+        self.pa = pyarrow
+        self.columns = columns
+        self.schema = pyarrow.schema([(column, self._type(column)) for column in columns])
+        self._sink = _Sink()
+        self._writer = None
+
+    def _type(self, column: str):
+        if column == 'timestamp':
+            return self.pa.timestamp('us', tz='UTC')
+        if column in _INT_COLUMNS:
+            return self.pa.int32()
+        if column in _STRING_COLUMNS:
+            return self.pa.string()
+        return self.pa.float64()
+
+    def _open(self, sink):
+        return self.pa.ipc.new_stream(sink, self.schema)
+
+    def _write_batch(self, record_batch):
+        self._writer.write_batch(record_batch)
+
+    def begin(self) -> bytes:
+        self._writer = self._open(self._sink)
+        return self._sink.drain()
+
+    def write(self, batch: Batch) -> bytes:
+        arrays = [self.pa.array(batch[field.name], type=field.type) for field in self.schema]
+        self._write_batch(self.pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        return self._sink.drain()
+
+    def end(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
+
+
+class ParquetWriter(ArrowWriter):
+    """Parquet file; one row group per database fetch, the footer is sent last."""
+    media_type = "application/vnd.apache.parquet"
+    extension = "parquet"
+
+    def _open(self, sink):
+        import pyarrow.parquet
+        return pyarrow.parquet.ParquetWriter(sink, self.schema, compression='zstd')
+
+
+WRITERS = {
+    "csv": CSVWriter,
+    "arrow": ArrowWriter,
+    "parquet": ParquetWriter,
+    "msgpack": MsgpackWriter,
+}
+
+
+class HistoryExporter:
+    """
+    Streams a time range of a history table in one of the WRITERS formats.
+
+    Rows are read through a server-side cursor (psycopg2 named cursor)
+    batch_size rows at a time and each batch is encoded and handed out before
+    the next one is fetched, so memory stays bounded by one batch whatever
+    the length of the range. The binary formats get timestamps as epoch
+    microseconds computed by the database, and on PostgreSQL a CSV export is
+    written by COPY ... TO STDOUT without building rows in Python. With
+    compressed storage, metrics are decoded chunk by chunk instead.
+    """
+
+    def __init__(self, batch_size: int):
+        self.batch_size = max(1, batch_size)
+
+    def writer(self, format: str, source: str, fields: Sequence[str] = ()):
+        """
+        Writer for a format and the columns of source (all if fields is empty).
+        Raises ImportError when the format's library is not installed.
+        """
+        _, available = SOURCES[source]
+        columns = ('timestamp',) + tuple(field for field in available if not fields or field in fields)
+        return WRITERS[format](columns)
+
+    def _batches(self, source: str, start_time: datetime, end_time: datetime,
+                 columns: Sequence[str], epoch: bool) -> Iterator[Batch]:
+        if source == "metrics" and settings.COMPRESSED_STORAGE_ENABLED:
+            # Compacted samples only exist in metric_chunks
+            yield from self._chunk_batches(start_time, end_time, columns, epoch)
+            return
+        model, _ = SOURCES[source]
+        table = model.__table__
+        # Own session: the stream outlives the request's dependencies
+        db = SessionLocal()
+        try:
+            timestamp = _epoch_us(db, table.c.timestamp) if epoch else table.c.timestamp
+            statement = select(timestamp, *[table.c[column] for column in columns[1:]]).where(
+                and_(table.c.timestamp >= local_bound(db, start_time), table.c.timestamp <= local_bound(db, end_time))
+            ).order_by(table.c.timestamp.asc(), table.c.id.asc())
+            # Core rows (no ORM loading); stream_results opens a server-side cursor on PostgreSQL
+            connection = db.connection(execution_options={"stream_results": True, "yield_per": self.batch_size})
+            for rows in connection.execute(statement).partitions():
+                batch = dict(zip(columns, (list(values) for values in zip(*rows))))
+                if not epoch and batch['timestamp'][0].tzinfo is None:
+                    # SQLite returns naive datetimes: local time, as the collector writes snapshots
+                    batch['timestamp'] = [as_utc(timestamp) for timestamp in batch['timestamp']]
+                yield batch
+        finally:
+            db.close()
+
+    def _copy_csv(self, source: str, start_time: datetime, end_time: datetime,
+                  columns: Sequence[str]) -> Iterator[bytes]:
+        """
+        CSV rows (no header) written by PostgreSQL's COPY ... TO STDOUT on a
+        worker thread; returns the number of rows.
+        """
+        model, _ = SOURCES[source]
+        table = model.__table__
+        # ISO 8601 in UTC, like the other formats
+        timestamp = func.to_char(func.timezone('UTC', table.c.timestamp), 'YYYY-MM-DD"T"HH24:MI:SS.US"+00:00"')
+        statement = select(timestamp, *[table.c[column] for column in columns[1:]]).where(
+            and_(table.c.timestamp >= start_time, table.c.timestamp <= end_time)
+        ).order_by(table.c.timestamp.asc(), table.c.id.asc())
+        pipe = _CopyPipe()
+
+        def copy():
+            db = SessionLocal()
+            try:
+                connection = db.connection()
+                compiled = statement.compile(dialect=connection.dialect)
+                cursor = connection.connection.dbapi_connection.cursor()
+                query = cursor.mogrify(str(compiled), compiled.params).decode()
+                cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv)", pipe)
+                pipe.rowcount = cursor.rowcount
+                pipe.finish()
+            except Exception as e:
+                pipe.finish(e)
+            finally:
+                db.close()
+
+        threading.Thread(target=copy, name="export-copy", daemon=True).start()
+        yield from pipe.chunks()
+        return pipe.rowcount
+
+    def _chunk_batches(self, start_time: datetime, end_time: datetime,
+                       columns: Sequence[str], epoch: bool) -> Iterator[Batch]:
+        """Batches of compressed storage, decoded one chunk window at a time."""
+        db = SessionLocal()
+        try:
+            batch: Batch = {column: [] for column in columns}
+            for window in chunk_store.iter_columns(db, start_time, end_time):
+                if epoch:
+                    batch['timestamp'].extend((window['timestamp'] * 1e6).round().astype('int64').tolist())
+                else:
+                    batch['timestamp'].extend(
+                        datetime.fromtimestamp(timestamp, tz=timezone.utc) for timestamp in window['timestamp'].tolist()
+                    )
+                for column in columns[1:]:
+                    # NaN marks a NULL column
+                    values = [None if math.isnan(value) else value for value in window[column].tolist()]
+                    if column in _INT_COLUMNS:
+                        values = [None if value is None else int(value) for value in values]
+                    batch[column].extend(values)
+                if len(batch['timestamp']) >= self.batch_size:
+                    yield batch
+                    batch = {column: [] for column in columns}
+            if batch['timestamp']:
+                yield batch
+        finally:
+            db.close()
+
+    def stream(self, writer, source: str, start_time: datetime, end_time: datetime) -> Iterator[bytes]:
+        """Encoded export of [start_time, end_time], chunk by chunk."""
+        rows = 0
+        try:
+            yield writer.begin()
+            if (isinstance(writer, CSVWriter) and engine.dialect.name == "postgresql"
+                    and not (source == "metrics" and settings.COMPRESSED_STORAGE_ENABLED)):
+                rows = yield from self._copy_csv(source, start_time, end_time, writer.columns)
+            else:
+                for batch in self._batches(source, start_time, end_time, writer.columns, writer.epoch_timestamps):
+                    rows += len(batch['timestamp'])
+                    yield writer.write(batch)
+            yield writer.end()
+        except Exception as e:
+            # Headers are already sent; the client sees a truncated body
+            logger.error(f"Error exporting {source} after {rows} rows: {e}")
+            raise
+        logger.info(f"Exported {rows} {source} rows as {writer.extension}")
+
+
+def _epoch_us(db, column):
+    """SQL expression for a metric_snapshots or gpu_samples timestamp as integer microseconds since the epoch."""
+    if db.get_bind().dialect.name == "postgresql":
+        return cast(func.extract('epoch', column) * 1000000, BigInteger)
+    # SQLite keeps naive local text 'YYYY-MM-DD HH:MM:SS.ffffff': whole seconds in UTC plus the stored microseconds
+    return (cast(func.strftime('%s', column, 'utc'), Integer) * 1000000
+            + cast(func.substr(column, 21, 6), Integer))
+
+
+# Global instance
+history_exporter = HistoryExporter(batch_size=settings.EXPORT_BATCH_SIZE)
@@ -0,0 +1,237 @@
+"""NVIDIA GPU metrics collection through NVML."""
+import threading
+import time
+import logging
+from typing import Any, List, Optional, Sequence, Set
+from app.config import settings
+from app.models.metrics import GPUMetrics
+
+logger = logging.getLogger(__name__)
+
+# nvmlDeviceGetFieldValues IDs (nvml.h); POWER_INSTANT needs NVML 12 and is not in pynvml 11.5
+NVML_FI_DEV_TOTAL_ENERGY_CONSUMPTION = 83  # mJ since the driver was loaded
+NVML_FI_DEV_POWER_INSTANT = 186  # mW
+
+# Fields read in one nvmlDeviceGetFieldValues call per GPU and sample
+BATCHED_FIELDS = (NVML_FI_DEV_TOTAL_ENERGY_CONSUMPTION, NVML_FI_DEV_POWER_INSTANT)
+
+
+class PynvmlBackend:
+    """
+    NVML through pynvml; the calls GPUCollector makes. Any object with the same
+    methods (e.g. a fake NVML for tests and benchmarks) can be used instead.
+    """
+
+    def __init__(self):
+        import pynvml
+        pynvml.nvmlInit()
+        self.nvml = pynvml
+
+    def is_not_supported(self, error: Exception) -> bool:
+        """Whether error means the device lacks the queried feature (as opposed to a transient failure)."""
+        return getattr(error, 'value', None) == self.nvml.NVML_ERROR_NOT_SUPPORTED
+
+    def is_lost(self, error: Exception) -> bool:
+        """Whether error means the device fell off the bus or needs a reset."""
+        return getattr(error, 'value', None) == self.nvml.NVML_ERROR_GPU_IS_LOST
+
+    def device_count(self) -> int:
+        return self.nvml.nvmlDeviceGetCount()
+
+    def device_handle(self, index: int) -> Any:
+        return self.nvml.nvmlDeviceGetHandleByIndex(index)
+
+    def device_name(self, handle: Any) -> str:
+        name = self.nvml.nvmlDeviceGetName(handle)
+        # Older pynvml releases return bytes
+        return name.decode('utf-8') if isinstance(name, bytes) else name
+
+    def field_values(self, handle: Any, field_ids: Sequence[int]) -> List[Optional[float]]:
+        """Values of several fields in one NVML call; None for fields the device did not return."""
+        values = self.nvml.nvmlDeviceGetFieldValues(handle, list(field_ids))
+        result = []
+        for value in values:
+            if value.nvmlReturn != self.nvml.NVML_SUCCESS:
+                result.append(None)
+            elif value.valueType == self.nvml.NVML_VALUE_TYPE_DOUBLE:
+                result.append(value.value.dVal)
+            elif value.valueType == self.nvml.NVML_VALUE_TYPE_UNSIGNED_INT:
+                result.append(float(value.value.uiVal))
+            elif value.valueType == self.nvml.NVML_VALUE_TYPE_SIGNED_LONG_LONG:
+                result.append(float(value.value.sllVal))
+            else:
+                result.append(float(value.value.ullVal))
+        return result
+
+    def temperature(self, handle: Any) -> float:
+        return self.nvml.nvmlDeviceGetTemperature(handle, self.nvml.NVML_TEMPERATURE_GPU)
+
+    def utilization(self, handle: Any) -> float:
+        return self.nvml.nvmlDeviceGetUtilizationRates(handle).gpu
+
+    def memory(self, handle: Any):
+        """(used, total) in bytes."""
+        info = self.nvml.nvmlDeviceGetMemoryInfo(handle)
+        return info.used, info.total
+
+    def power_usage(self, handle: Any) -> float:
+        """Power draw in milliwatts."""
+        return self.nvml.nvmlDeviceGetPowerUsage(handle)
+
+
+class _Device:
+    """Static information and probed capabilities of one GPU."""
+
+    def __init__(self, index: int, handle: Any, name: str):
+        self.index = index
+        self.handle = handle
+        self.name = name
+        # Queries the device answered with NOT_SUPPORTED; they are not retried
+        self.unsupported: Set[str] = set()
+        self.energy: Optional[float] = None  # last energy counter value (mJ)
+        self.energy_at: Optional[float] = None  # time.monotonic() it was read
+
+
+class GPUCollector:
+    """
+    Samples NVIDIA GPUs on its own cadence and publishes the latest readings.
+
+    Handles, names and which queries each device supports are looked up once
+    and cached; only nvmlDeviceGetCount runs on every sample to notice GPUs
+    appearing or disappearing, which rebuilds the cache. Power comes from one
+    batched nvmlDeviceGetFieldValues call per GPU: the average since the
+    previous sample from the energy counter, else the instantaneous reading,
+    else nvmlDeviceGetPowerUsage on devices without those fields. Queries a
+    device reports as not supported (e.g. memory info on unified-memory
+    systems) are skipped from then on instead of failing every sample. A GPU
+    that is lost (fell off the bus, needs a reset) is left out of the sample
+    and the devices are opened again on the next one.
+
+    backend is a PynvmlBackend or a fake with the same methods; None (no NVML
+    driver) makes every snapshot empty.
+    """
+
+    def __init__(self, backend: Optional[Any], interval: float, max_age: Optional[float] = None):
+        self.backend = backend
+        self.interval = interval
+        # A snapshot older than this is refreshed on read (e.g. scheduler stalled)
+        self.max_age = max_age if max_age is not None else interval * 2
+        self._devices: Optional[List[_Device]] = None
+        self._snapshot: Optional[List[GPUMetrics]] = None
+        self._sampled_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return self.backend is not None
+
+    def _load_devices(self, count: int) -> List[_Device]:
+        devices = []
+        for index in range(count):
+            try:
+                handle = self.backend.device_handle(index)
+                devices.append(_Device(index, handle, self.backend.device_name(handle)))
+            except Exception as e:
+                logger.warning(f"Error opening GPU {index}: {e}")
+        logger.info(f"Found {len(devices)} GPU(s)")
+        return devices
+
+    def _query(self, device: _Device, feature: str, call, *args):
+        """Result of a per-device NVML call, or None; remembers features the device lacks."""
+        if feature in device.unsupported:
+            return None
+        try:
+            return call(device.handle, *args)
+        except Exception as e:
+            if self.backend.is_lost(e):
+                # Fails the whole device; collect() reopens the GPUs
+                raise
+            if self.backend.is_not_supported(e):
+                device.unsupported.add(feature)
+            else:
+                logger.debug(f"Error reading {feature} of GPU {device.index}: {e}")
+            return None
+
+    def _power(self, device: _Device, now: float) -> Optional[float]:
+        """Power draw in watts."""
+        fields = self._query(device, 'fields', self.backend.field_values, BATCHED_FIELDS)
+        energy, instant = fields if fields is not None else (None, None)
+        if energy is None and instant is None and fields is not None:
+            # Neither field exists on this device/driver; use the single-value call from now on
+            device.unsupported.add('fields')
+
+        power = None
+        if energy is not None:
+            if device.energy is not None and energy >= device.energy and now > device.energy_at:
+                power = (energy - device.energy) / (now - device.energy_at) / 1000.0  # mJ/s -> W
+            device.energy, device.energy_at = energy, now
+        if power is None and instant is not None:
+            power = instant / 1000.0
+        if power is None and 'fields' in device.unsupported:
+            milliwatts = self._query(device, 'power', self.backend.power_usage)
+            power = milliwatts / 1000.0 if milliwatts is not None else None
+        return power
+
+    def _read_device(self, device: _Device, now: float) -> GPUMetrics:
+        memory = self._query(device, 'memory', self.backend.memory)
+        memory_used, memory_total = memory if memory is not None else (None, None)
+        return GPUMetrics(
+            index=device.index,
+            name=device.name,
+            temperature=self._query(device, 'temperature', self.backend.temperature),
+            utilization=self._query(device, 'utilization', self.backend.utilization),
+            memory_used=memory_used,
+            memory_total=memory_total,
+            memory_percent=(memory_used / memory_total) * 100 if memory_total else None,
+            power_draw=self._power(device, now)
+        )
+
+    def collect(self) -> List[GPUMetrics]:
+        """Read every GPU."""
+        if self.backend is None:
+            return []
+        try:
+            count = self.backend.device_count()
+        except Exception as e:
+            logger.error(f"Error enumerating GPUs: {e}")
+            return []
+        if self._devices is None or count != len(self._devices):
+            self._devices = self._load_devices(count)
+
+        now = time.monotonic()
+        gpus = []
+        for device in self._devices:
+            try:
+                gpus.append(self._read_device(device, now))
+            except Exception as e:
+                logger.warning(f"Error getting metrics for GPU {device.index}: {e}")
+                # Reopen the devices next time, e.g. after a GPU reset
+                self._devices = None
+        return gpus
+
+    def sample(self) -> List[GPUMetrics]:
+        """Take a new sample and publish it (scheduler job)."""
+        with self._lock:
+            gpus = self.collect()
+            self._snapshot = gpus
+            self._sampled_at = time.monotonic()
+            return gpus
+
+    def get_snapshot(self) -> List[GPUMetrics]:
+        """Latest readings, sampling only if they are missing or stale."""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._sampled_at <= self.max_age:
+            return snapshot
+        return self.sample()
+
+
+def _default_backend() -> Optional[PynvmlBackend]:
+    try:
+        return PynvmlBackend()
+    except Exception:
+        # No NVIDIA driver (or pynvml) on this host
+        return None
+
+
+# Global instance
+gpu_collector = GPUCollector(backend=_default_backend(), interval=settings.GPU_COLLECTION_INTERVAL)
@@ -0,0 +1,129 @@
+"""In-process cache of aggregated history series."""
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# (bucket seconds, aligned start, aligned end, metric_type)
+CacheKey = Tuple[int, int, int, Optional[str]]
+
+# One bucket of a series: (bucket start as epoch seconds, rendered metric point)
+Point = Tuple[float, Dict[str, Any]]
+
+
+class _Entry:
+    __slots__ = ('points', 'final_until')
+
+    def __init__(self, points: List[Point], final_until: int):
+        self.points = points
+        # Buckets starting before this epoch second are complete and can be reused
+        self.final_until = final_until
+
+
+class HistoryCache:
+    """
+    LRU cache of aggregated history series, bounded by the total number of points.
+
+    Ranges are aligned to whole buckets, so every request for e.g. "last 24
+    hours" made within the same bucket maps to the same key. Buckets that lie
+    entirely before the settled time (older than the latest sample and
+    written to the database) never change; when the window slides, those are
+    taken from the most useful cached series with the same bucket size and
+    metric_type and only the newer buckets are computed. Open buckets at the
+    end of a range are always recomputed.
+    """
+
+    def __init__(self, max_points: int):
+        self.max_points = max_points
+        self._entries: 'OrderedDict[CacheKey, _Entry]' = OrderedDict()
+        self._points = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.partial_hits = 0  # only the newest buckets were computed
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_points > 0
+
+    @staticmethod
+    def align(bucket_seconds: int, start: float, end: float) -> Tuple[int, int]:
+        """Start of the first bucket and end (exclusive) of the last bucket covering [start, end]."""
+        return int(start // bucket_seconds * bucket_seconds), int(end // bucket_seconds * bucket_seconds) + bucket_seconds
+
+    def _reusable(self, bucket_seconds: int, start: int, metric_type: Optional[str]) -> Optional[_Entry]:
+        """Cached series with the most complete buckets from start onwards (lock held)."""
+        best = None
+        for (size, entry_start, _, entry_type), entry in self._entries.items():
+            if (size == bucket_seconds and entry_type == metric_type and entry_start <= start < entry.final_until and
+                    (best is None or entry.final_until > best.final_until)):
+                best = entry
+        return best
+
+    def get(self, bucket_seconds: int, start: int, end: int, metric_type: Optional[str], settled: float,
+            compute: Callable[[int, int], List[Point]]) -> List[Dict[str, Any]]:
+        """
+        Points of the aligned range [start, end). compute(from, to) must return
+        the points of the buckets in [from, to), ordered by time.
+        """
+        key = (bucket_seconds, start, end, metric_type)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.final_until >= end:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return [point for _, point in entry.points]
+            base = self._reusable(bucket_seconds, start, metric_type)
+            reused = [] if base is None else [
+                point for point in base.points if start <= point[0] < min(base.final_until, end)
+            ]
+            compute_from = start if base is None else min(base.final_until, end)
+            if base is None:
+                self.misses += 1
+            else:
+                self.partial_hits += 1
+
+        points = reused + (compute(compute_from, end) if compute_from < end else [])
+        final_until = min(int(settled // bucket_seconds * bucket_seconds), end)
+        self._store(key, _Entry(points, final_until))
+        return [point for _, point in points]
+
+    def _store(self, key: CacheKey, entry: _Entry):
+        if len(entry.points) > self.max_points:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._points -= len(previous.points)
+            self._entries[key] = entry
+            self._points += len(entry.points)
+            while self._points > self.max_points:
+                _, evicted = self._entries.popitem(last=False)
+                self._points -= len(evicted.points)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every cached series (e.g. after old data was deleted)."""
+        with self._lock:
+            self._entries.clear()
+            self._points = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(
+                hits=self.hits,
+                partial_hits=self.partial_hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                entries=len(self._entries),
+                points=self._points,
+                max_points=self.max_points
+            )
+
+
+# Global instance
+history_cache = HistoryCache(max_points=settings.HISTORY_CACHE_MAX_POINTS)
@@ -0,0 +1,116 @@
+"""Fan-out of sampler snapshots to live stream subscribers."""
+import asyncio
+import json
+import logging
+from typing import Dict, FrozenSet, Iterable, Optional, Set
+from app.config import settings
+from app.models.metrics import SystemMetrics
+from app.services.metrics_sampler import metrics_sampler, MetricsSampler
+
+logger = logging.getLogger(__name__)
+
+# Metric groups a subscriber can select (top-level SystemMetrics fields)
+METRIC_GROUPS: FrozenSet[str] = frozenset({'cpu', 'memory', 'disk', 'network', 'gpus'})
+
+
+def parse_groups(groups: Optional[Iterable[str]]) -> FrozenSet[str]:
+    """Normalize a group selection; unknown names are ignored, empty means all groups."""
+    if not groups:
+        return METRIC_GROUPS
+    selected = frozenset(g.strip().lower() for g in groups if g and g.strip()) & METRIC_GROUPS
+    return selected or METRIC_GROUPS
+
+
+class Subscriber:
+    """A single stream consumer with a bounded frame queue."""
+
+    def __init__(self, groups: FrozenSet[str], queue_size: int):
+        self.groups = groups
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def offer(self, frame: str):
+        """Enqueue a frame, dropping the oldest one if the consumer is behind."""
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(frame)
+
+    async def get(self) -> str:
+        """Wait for the next frame."""
+        return await self.queue.get()
+
+
+class MetricsBroadcaster:
+    """
+    Pushes every snapshot published by the sampler to all subscribers.
+
+    Snapshots arrive on the sampler's thread and are handed to the event loop;
+    each distinct group selection is serialized once per snapshot no matter
+    how many subscribers share it. Per-subscriber queues are bounded and drop
+    the oldest frame, so a stuck client costs at most queue_size frames.
+    """
+
+    def __init__(self, sampler: MetricsSampler, queue_size: int):
+        self.sampler = sampler
+        self.queue_size = queue_size
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscribers: Set[Subscriber] = set()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """Attach to the event loop and start receiving sampler snapshots."""
+        self._loop = loop
+        self.sampler.add_listener(self._on_snapshot)
+
+    def stop(self):
+        """Detach from the sampler."""
+        self.sampler.remove_listener(self._on_snapshot)
+        self._loop = None
+
+    def subscribe(self, groups: FrozenSet[str]) -> Subscriber:
+        """Register a subscriber; must be called from the event loop."""
+        subscriber = Subscriber(groups, self.queue_size)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        """Remove a subscriber; must be called from the event loop."""
+        self._subscribers.discard(subscriber)
+
+    def render(self, snapshot: SystemMetrics, version: int, groups: FrozenSet[str]) -> str:
+        """Serialize the selected groups of a snapshot as one JSON frame."""
+        frame = snapshot.model_dump(mode='json', include=set(groups) | {'timestamp'})
+        frame['version'] = version
+        return json.dumps(frame)
+
+    def _on_snapshot(self, snapshot: SystemMetrics):
+        """Sampler listener (runs on the sampler thread)."""
+        loop = self._loop
+        if loop is None or not self._subscribers:
+            return
+        version = self.sampler.version
+        try:
+            loop.call_soon_threadsafe(self._fan_out, snapshot, version)
+        except RuntimeError:
+            # Event loop already closed during shutdown
+            pass
+
+    def _fan_out(self, snapshot: SystemMetrics, version: int):
+        """Deliver a snapshot to every subscriber (runs on the event loop)."""
+        frames: Dict[FrozenSet[str], str] = {}
+        for subscriber in list(self._subscribers):
+            frame = frames.get(subscriber.groups)
+            if frame is None:
+                frame = frames[subscriber.groups] = self.render(snapshot, version, subscriber.groups)
+            subscriber.offer(frame)
+
+
+# Global instance
+metrics_broadcaster = MetricsBroadcaster(metrics_sampler, queue_size=settings.METRICS_STREAM_QUEUE_SIZE)
@@ -0,0 +1,118 @@
+"""Shared background sampler for live system metrics."""
+import threading
+import time
+import logging
+from typing import Callable, List, Optional, Tuple
+from app.config import settings
+from app.models.metrics import SystemMetrics
+from app.services.system_monitor import system_monitor, SystemMonitor
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsSampler:
+    """
+    Owns metric collection and publishes the latest SystemMetrics snapshot.
+
+    A scheduler job calls sample() at a fixed cadence; request handlers read the
+    published snapshot through get_snapshot() and never call the collectors
+    themselves. If the snapshot is missing or stale, concurrent callers are
+    coalesced so that only one of them runs the collectors and the rest reuse
+    its result. Listeners (storage, broadcasting) run once for every snapshot
+    a scheduled sample() returns, also when that snapshot was published by a
+    refresh a request started; other request refreshes just publish.
+    """
+
+    def __init__(self, monitor: SystemMonitor, interval: float, max_age: Optional[float] = None):
+        self.monitor = monitor
+        self.interval = interval
+        # A snapshot older than this is refreshed on read (e.g. scheduler stalled)
+        self.max_age = max_age if max_age is not None else interval * 2
+        self._snapshot: Optional[SystemMetrics] = None
+        self._sampled_at = 0.0  # time.monotonic() of the published snapshot
+        self._version = 0
+        self._published: Tuple[int, Optional[SystemMetrics]] = (0, None)  # version and snapshot, swapped together
+        self._sample_lock = threading.Lock()
+        self._notified_version = 0  # last version the listeners ran for
+        self._notify_lock = threading.Lock()
+        self._listeners: List[Callable[[SystemMetrics], None]] = []
+
+    @property
+    def version(self) -> int:
+        """Monotonically increasing number of the published snapshot."""
+        return self._version
+
+    @property
+    def age(self) -> Optional[float]:
+        """Seconds since the published snapshot was taken, None before the first sample."""
+        if self._snapshot is None:
+            return None
+        return time.monotonic() - self._sampled_at
+
+    def add_listener(self, listener: Callable[[SystemMetrics], None]):
+        """Register a callback invoked with every newly published snapshot."""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[SystemMetrics], None]):
+        """Unregister a snapshot callback."""
+        try:
+            self._listeners.remove(listener)
+        except ValueError:
+            pass
+
+    def sample(self) -> SystemMetrics:
+        """Take a new sample, publish it and notify the listeners (scheduler entry point)."""
+        return self._refresh(self._version, notify=True)
+
+    def get_snapshot(self) -> SystemMetrics:
+        """Return the latest snapshot, sampling only if it is missing or stale."""
+        seen_version = self._version
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._sampled_at <= self.max_age:
+            return snapshot
+        return self._refresh(seen_version, notify=False)
+
+    def get_versioned_snapshot(self) -> Tuple[int, SystemMetrics]:
+        """Like get_snapshot(), together with the version of the returned snapshot."""
+        self.get_snapshot()
+        return self._published
+
+    def _refresh(self, seen_version: int, notify: bool) -> SystemMetrics:
+        """
+        Run the collectors unless a newer snapshot than seen_version was published
+        while waiting for the lock, so callers queued behind an in-flight sample
+        reuse its result instead of sampling again. notify runs the listeners
+        with the returned snapshot on the calling thread, unless they already
+        ran for it.
+        """
+        with self._sample_lock:
+            if self._snapshot is not None and self._version != seen_version:
+                version, snapshot = self._published
+            else:
+                sampled_at = time.monotonic()
+                snapshot = self.monitor.get_all_metrics()
+
+                # Publish: readers see either the old or the new snapshot, never a partial one
+                self._snapshot = snapshot
+                self._sampled_at = sampled_at
+                self._version += 1
+                version = self._version
+                self._published = (version, snapshot)
+
+        if not notify:
+            return snapshot
+        with self._notify_lock:
+            if version <= self._notified_version:
+                return snapshot
+            self._notified_version = version
+        for listener in list(self._listeners):
+            try:
+                listener(snapshot)
+            except Exception as e:
+                logger.error(f"Error in metrics snapshot listener: {e}")
+
+        return snapshot
+
+
+# Global instance
+metrics_sampler = MetricsSampler(system_monitor, interval=settings.METRICS_COLLECTION_INTERVAL)
@@ -0,0 +1,244 @@
+"""Time-range partitioning of metric_snapshots (PostgreSQL)."""
+import re
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateColumn
+from app.config import settings
+from app.database import engine
+from app.models.database import MetricSnapshot
+
+logger = logging.getLogger(__name__)
+
+PARTITION_PERIODS = {'day': timedelta(days=1), 'week': timedelta(days=7)}
+
+# Partition that takes over the rows of a table created before partitioning
+LEGACY_PARTITION = f"{MetricSnapshot.__tablename__}_legacy"
+# Catches rows outside every range partition until ensure_partitions moves them out
+DEFAULT_PARTITION = f"{MetricSnapshot.__tablename__}_default"
+
+_BOUND_RE = re.compile(r"FROM \((?:'([^']+)'|MINVALUE)\) TO \('([^']+)'\)")
+
+
+def _parse_bound(value: str) -> datetime:
+    """Parse a timestamptz literal as rendered by pg_get_expr, e.g. '2024-01-01 00:00:00+00'."""
+    if re.search(r"[+-]\d\d$", value):
+        value += ':00'
+    return datetime.fromisoformat(value).astimezone(timezone.utc)
+
+
+class SnapshotPartitioner:
+    """
+    Keeps metric_snapshots range-partitioned by timestamp in PostgreSQL.
+
+    The table is created as PARTITION BY RANGE (timestamp) with one partition
+    per day or week, and partitions are created `ahead` periods in advance by
+    a scheduler job. A DEFAULT partition takes rows no partition covers yet
+    (e.g. before the job first ran, or after a clock jump), so a batch insert
+    never fails on them; the job moves them into the partition it creates
+    for their range. Retention detaches and drops whole partitions, so its cost
+    does not depend on the number of rows, and the timestamp range filters of
+    history queries let the planner skip partitions outside the range. Other
+    databases (SQLite for local development) keep the plain table and row
+    deletes.
+    """
+
+    def __init__(self, engine: Engine, period: str, ahead: int):
+        if period not in PARTITION_PERIODS:
+            raise ValueError(f"Unknown partition period {period!r}, expected one of {sorted(PARTITION_PERIODS)}")
+        self.engine = engine
+        self.period = period
+        self.ahead = max(1, ahead)
+        self.table = MetricSnapshot.__table__
+
+    @property
+    def enabled(self) -> bool:
+        return self.engine.dialect.name == 'postgresql'
+
+    def _period_start(self, value: datetime) -> datetime:
+        """Start (UTC midnight, Mondays for weeks) of the period containing value."""
+        start = value.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        if self.period == 'week':
+            start -= timedelta(days=start.weekday())
+        return start
+
+    def _partition_name(self, start: datetime) -> str:
+        return f"{self.table.name}_p{start:%Y%m%d}"
+
+    def _quote(self, name: str) -> str:
+        return self.engine.dialect.identifier_preparer.quote(name)
+
+    def _table_kind(self, conn: Connection) -> Optional[str]:
+        """pg_class.relkind of the table: 'p' partitioned, 'r' plain, None if missing."""
+        return conn.execute(
+            text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)"),
+            {'name': self.table.name}
+        ).scalar()
+
+    def _partitions(self, conn: Connection) -> List[Tuple[str, Optional[datetime], datetime]]:
+        """(name, lower bound or None for MINVALUE, upper bound) of every partition."""
+        rows = conn.execute(text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = to_regclass(:name)"
+        ), {'name': self.table.name}).all()
+        partitions = []
+        for name, bound in rows:
+            match = _BOUND_RE.search(bound or '')
+            if match is None:
+                continue
+            lower = _parse_bound(match.group(1)) if match.group(1) else None
+            partitions.append((name, lower, _parse_bound(match.group(2))))
+        return sorted(partitions, key=lambda p: p[2])
+
+    def _create_parent(self, conn: Connection):
+        """Create metric_snapshots as a partitioned table with the model's columns and indexes."""
+        columns = [str(CreateColumn(column).compile(dialect=self.engine.dialect)) for column in self.table.columns]
+        # A primary key on a partitioned table has to include the partition key
+        key = self._quote(self.table.c.timestamp.name)
+        conn.execute(text(
+            f"CREATE TABLE {self._quote(self.table.name)} ("
+            f"{', '.join(columns)}, PRIMARY KEY ({self._quote(self.table.c.id.name)}, {key})"
+            f") PARTITION BY RANGE ({key})"
+        ))
+        for index in self.table.indexes:
+            index.create(conn)
+
+    def _migrate(self, conn: Connection):
+        """Turn an existing plain table into the first (MINVALUE) partition of a new partitioned one."""
+        table = self._quote(self.table.name)
+        legacy = self._quote(LEGACY_PARTITION)
+        key = self._quote(self.table.c.timestamp.name)
+        conn.execute(text(f"ALTER TABLE {table} RENAME TO {legacy}"))
+        # Free the index names for the new table
+        for index in [f"{self.table.name}_pkey"] + [index.name for index in self.table.indexes]:
+            renamed = index.replace(self.table.name, LEGACY_PARTITION, 1)
+            conn.execute(text(f"ALTER INDEX IF EXISTS {self._quote(index)} RENAME TO {self._quote(renamed)}"))
+        conn.execute(text(f"DELETE FROM {legacy} WHERE {key} IS NULL"))
+        conn.execute(text(f"ALTER TABLE {legacy} ALTER COLUMN {key} SET NOT NULL"))
+        # A partition needs the parent's primary key (id, timestamp); attaching cannot add a second one
+        pkey = conn.execute(text(
+            "SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(:name) AND contype = 'p'"
+        ), {'name': LEGACY_PARTITION}).scalar()
+        if pkey is not None:
+            conn.execute(text(f"ALTER TABLE {legacy} DROP CONSTRAINT {self._quote(pkey)}"))
+        conn.execute(text(
+            f"ALTER TABLE {legacy} ADD CONSTRAINT {self._quote(f'{LEGACY_PARTITION}_pkey')} "
+            f"PRIMARY KEY ({self._quote(self.table.c.id.name)}, {key})"
+        ))
+
+        self._create_parent(conn)
+        max_id, max_timestamp = conn.execute(text(f"SELECT max(id), max({key}) FROM {legacy}")).one()
+        conn.execute(
+            text("SELECT setval(pg_get_serial_sequence(:name, 'id'), :value, false)"),
+            {'name': self.table.name, 'value': (max_id or 0) + 1}
+        )
+        newest = max(max_timestamp or datetime.now(timezone.utc), datetime.now(timezone.utc))
+        upper = self._period_start(newest) + PARTITION_PERIODS[self.period]
+        conn.execute(text(
+            f"ALTER TABLE {table} ATTACH PARTITION {legacy} "
+            f"FOR VALUES FROM (MINVALUE) TO ('{upper.isoformat()}')"
+        ))
+        logger.info(f"Converted {self.table.name} to a partitioned table; existing rows are in {LEGACY_PARTITION}")
+
+    def setup(self):
+        """Create or convert the partitioned table and its first partitions (call before create_all)."""
+        if not self.enabled:
+            return
+        with self.engine.begin() as conn:
+            kind = self._table_kind(conn)
+            if kind is None:
+                self._create_parent(conn)
+            elif kind == 'r':
+                self._migrate(conn)
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {self._quote(DEFAULT_PARTITION)} "
+                f"PARTITION OF {self._quote(self.table.name)} DEFAULT"
+            ))
+        self.ensure_partitions()
+
+    def ensure_partitions(self):
+        """Create partitions from the last existing one up to `ahead` periods in the future (scheduler job)."""
+        if not self.enabled:
+            return
+        try:
+            with self.engine.begin() as conn:
+                partitions = self._partitions(conn)
+                length = PARTITION_PERIODS[self.period]
+                now = datetime.now(timezone.utc)
+                start = partitions[-1][2] if partitions else self._period_start(now)
+                target = self._period_start(now) + length * (self.ahead + 1)
+                created = 0
+                while start < target:
+                    end = self._period_start(start) + length
+                    self._create_partition(conn, start, end)
+                    start = end
+                    created += 1
+            if created:
+                logger.info(f"Created {created} {self.table.name} partitions")
+        except Exception as e:
+            logger.error(f"Error creating metric partitions: {e}")
+
+    def _create_partition(self, conn: Connection, start: datetime, end: datetime):
+        """Create the partition for [start, end), moving its rows out of the default partition."""
+        table = self._quote(self.table.name)
+        name = self._quote(self._partition_name(start))
+        default = self._quote(DEFAULT_PARTITION)
+        key = self._quote(self.table.c.timestamp.name)
+        bounds = f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        in_range = f"{key} >= :start AND {key} < :end"
+        params = {'start': start, 'end': end}
+        stray = conn.execute(text(f"SELECT count(*) FROM {default} WHERE {in_range}"), params).scalar()
+        if not stray:
+            conn.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} {bounds}"))
+            return
+        # The default partition may not hold rows of a new partition's range, so it is detached meanwhile
+        conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {default}"))
+        conn.execute(text(f"CREATE TABLE {name} PARTITION OF {table} {bounds}"))
+        conn.execute(text(f"INSERT INTO {name} SELECT * FROM {default} WHERE {in_range}"), params)
+        conn.execute(text(f"DELETE FROM {default} WHERE {in_range}"), params)
+        conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT"))
+        logger.warning(f"Moved {stray} {self.table.name} rows from {DEFAULT_PARTITION} to {self._partition_name(start)}")
+
+    def drop_expired(self, cutoff: datetime) -> int:
+        """
+        Detach and drop every partition that ends before cutoff. Rows older than
+        cutoff in the legacy partition are deleted until it expires as a whole,
+        and those in the default partition are deleted.
+        Returns the number of dropped partitions.
+        """
+        with self.engine.connect() as conn:
+            partitions = self._partitions(conn)
+        table = self._quote(self.table.name)
+        # Concurrent detach (PostgreSQL 14+) does not block inserts, but cannot run in a transaction
+        concurrently = ' CONCURRENTLY' if (self.engine.dialect.server_version_info or (0,)) >= (14,) else ''
+        dropped = 0
+        for name, lower, upper in partitions:
+            if upper <= cutoff:
+                with self.engine.execution_options(isolation_level='AUTOCOMMIT').connect() as conn:
+                    conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {self._quote(name)}{concurrently}"))
+                    conn.execute(text(f"DROP TABLE {self._quote(name)}"))
+                dropped += 1
+            elif lower is None:
+                self._delete_before(name, cutoff)
+        self._delete_before(DEFAULT_PARTITION, cutoff)
+        if dropped:
+            logger.info(f"Dropped {dropped} expired {self.table.name} partitions")
+        return dropped
+
+
+    def _delete_before(self, name: str, cutoff: datetime):
+        with self.engine.begin() as conn:
+            conn.execute(
+                text(f"DELETE FROM {self._quote(name)} WHERE {self._quote(self.table.c.timestamp.name)} < :cutoff"),
+                {'cutoff': cutoff}
+            )
+
+
+# Global instance
+snapshot_partitioner = SnapshotPartitioner(
+    engine,
+    period=settings.METRICS_PARTITION_PERIOD,
+    ahead=settings.METRICS_PARTITIONS_AHEAD
+)
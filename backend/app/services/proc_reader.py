@@ -0,0 +1,160 @@
+"""Direct /proc reader for the process table (Linux fast path)."""
+import os
+import pwd
+import sys
+import time
+import logging
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# /proc/[pid]/stat state letters, named like psutil's STATUS_* constants
+PROC_STATUSES = {
+    'R': 'running', 'S': 'sleeping', 'D': 'disk-sleep', 'Z': 'zombie', 'T': 'stopped',
+    't': 'tracing-stop', 'X': 'dead', 'x': 'dead', 'K': 'wake-kill', 'W': 'waking',
+    'P': 'parked', 'I': 'idle',
+}
+
+# comm is cut to this many characters; longer names are taken from cmdline like psutil does
+_COMM_LENGTH = 15
+
+# (pid, starttime in clock ticks) identifies a process instance across PID reuse
+_Key = Tuple[int, int]
+
+
+class ProcReader:
+    """
+    Reads the process table straight from /proc.
+
+    One scan reads /proc/[pid]/stat of every process; /proc/[pid]/status is
+    only read the first time a process is seen, for its uid. Name, username
+    and create time are cached per process instance, uid -> username lookups
+    are cached for the lifetime of the reader, and CPU% is computed from the
+    utime + stime tick deltas against the previous scan (per core, so it can
+    exceed 100 like psutil's). Returns the same values as the psutil based
+    scan in ProcessManager.
+    """
+
+    def __init__(self, proc_root: str = '/proc'):
+        self.proc_root = proc_root
+        self.clock_ticks = os.sysconf('SC_CLK_TCK')
+        self.page_size = os.sysconf('SC_PAGE_SIZE')
+        self._boot_time: Optional[float] = None
+        self._usernames: Dict[int, str] = {}
+        self._static: Dict[_Key, Tuple[str, str, float]] = {}  # name, username, create_time
+        self._ticks: Dict[_Key, int] = {}
+        self._last_scan: Optional[float] = None
+
+    @staticmethod
+    def available(proc_root: str = '/proc') -> bool:
+        """Whether a Linux procfs is mounted at proc_root."""
+        return sys.platform.startswith('linux') and os.path.exists(os.path.join(proc_root, 'self', 'stat'))
+
+    def _read(self, *parts: str) -> bytes:
+        with open(os.path.join(self.proc_root, *parts), 'rb') as f:
+            return f.read()
+
+    def boot_time(self) -> float:
+        if self._boot_time is None:
+            for line in self._read('stat').splitlines():
+                if line.startswith(b'btime'):
+                    self._boot_time = float(line.split()[1])
+                    break
+            else:
+                raise RuntimeError("btime missing from /proc/stat")
+        return self._boot_time
+
+    def total_memory(self) -> int:
+        """MemTotal in bytes."""
+        for line in self._read('meminfo').splitlines():
+            if line.startswith(b'MemTotal:'):
+                return int(line.split()[1]) * 1024
+        raise RuntimeError("MemTotal missing from /proc/meminfo")
+
+    def _username(self, uid: int) -> str:
+        username = self._usernames.get(uid)
+        if username is None:
+            try:
+                username = pwd.getpwuid(uid).pw_name
+            except KeyError:
+                # uid without a passwd entry; psutil reports the number as well
+                username = str(uid)
+            self._usernames[uid] = username
+        return username
+
+    def _static_fields(self, pid: int, comm: str, starttime: int) -> Tuple[str, str, float]:
+        """Name, username and create time of a newly seen process."""
+        uid = None
+        for line in self._read(str(pid), 'status').splitlines():
+            if line.startswith(b'Uid:'):
+                uid = int(line.split()[1])  # real uid, as psutil.Process.username() uses
+                break
+        name = comm
+        if len(comm) >= _COMM_LENGTH:
+            try:
+                cmdline = self._read(str(pid), 'cmdline').split(b'\0', 1)[0]
+                executable = os.path.basename(cmdline.decode('utf-8', 'replace'))
+                if executable.startswith(comm):
+                    name = executable
+            except OSError:
+                pass
+        username = self._username(uid) if uid is not None else 'unknown'
+        return name, username, self.boot_time() + starttime / self.clock_ticks
+
+    def scan(self) -> List[Tuple[int, str, str, float, float, str, float]]:
+        """
+        All processes as (pid, name, username, cpu_percent, memory_percent,
+        status, create_time) tuples.
+        """
+        now = time.monotonic()
+        elapsed = now - self._last_scan if self._last_scan is not None else None
+        memory_scale = self.page_size * 100.0 / self.total_memory()
+        cpu_scale = 100.0 / (self.clock_ticks * elapsed) if elapsed else 0.0
+
+        rows = []
+        static = {}
+        ticks = {}
+        with os.scandir(self.proc_root) as entries:
+            for entry in entries:
+                if not entry.name.isdigit():
+                    continue
+                pid = int(entry.name)
+                try:
+                    data = self._read(entry.name, 'stat')
+                    # comm is in parentheses and may itself contain spaces or ')'
+                    head, _, rest = data.rpartition(b')')
+                    comm = head.partition(b'(')[2].decode('utf-8', 'replace')
+                    fields = rest.split()
+                    # fields[0] is the state (field 3 in proc(5)); utime/stime are 14/15,
+                    # starttime 22 and rss 24
+                    state = fields[0].decode()
+                    total_ticks = int(fields[11]) + int(fields[12])
+                    starttime = int(fields[19])
+                    rss_pages = int(fields[21])
+
+                    key = (pid, starttime)
+                    fixed = self._static.get(key)
+                    if fixed is None:
+                        fixed = self._static_fields(pid, comm, starttime)
+                except (OSError, IndexError, ValueError):
+                    # Process exited while being read, or is not accessible
+                    continue
+
+                static[key] = fixed
+                ticks[key] = total_ticks
+                previous = self._ticks.get(key)
+                cpu_percent = (total_ticks - previous) * cpu_scale if previous is not None else 0.0
+                name, username, create_time = fixed
+                if not name.startswith(comm):
+                    # Renamed since first seen (e.g. kernel workers); the stat comm is current
+                    name = comm
+                rows.append((
+                    pid, name, username, round(cpu_percent, 1), rss_pages * memory_scale,
+                    PROC_STATUSES.get(state, state), create_time
+                ))
+
+        # Only the processes of this scan are kept, so the caches do not grow with exited ones
+        self._static = static
+        self._ticks = ticks
+        self._last_scan = now
+        return rows
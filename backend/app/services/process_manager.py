@@ -1,20 +1,101 @@
 """Process management service."""
 import psutil
-from typing import List, Optional
-from app.models.metrics import ProcessInfo
+import threading
+import time
+import logging
+from collections import deque, namedtuple
+from operator import attrgetter
+from typing import Dict, List, Optional, Tuple
+from app.config import settings
+from app.services.proc_reader import ProcReader
+
+logger = logging.getLogger(__name__)
+
+# One process table entry; same fields as the ProcessInfo response model
+ProcessRow = namedtuple('ProcessRow', ['pid', 'name', 'username', 'cpu_percent', 'memory_percent', 'status', 'created'])
+
+SORT_FIELDS = frozenset(ProcessRow._fields)
+
+# A row counts as changed in a delta when CPU or memory moved at least this much (percentage points)
+CPU_CHANGE_THRESHOLD = 0.5
+MEMORY_CHANGE_THRESHOLD = 0.1
+
+
+def _sort_rows(rows, sort: str, descending: bool) -> List[ProcessRow]:
+    """Rows ordered by one field; rows without a value (e.g. created from psutil) go last."""
+    get = attrgetter(sort)
+    present = [row for row in rows if get(row) is not None]
+    missing = [row for row in rows if get(row) is None]
+    return sorted(present, key=get, reverse=descending) + missing
+
+
+def _row_changed(old: ProcessRow, new: ProcessRow) -> bool:
+    return (
+        abs(new.cpu_percent - old.cpu_percent) >= CPU_CHANGE_THRESHOLD or
+        abs(new.memory_percent - old.memory_percent) >= MEMORY_CHANGE_THRESHOLD or
+        new.status != old.status or new.name != old.name or new.username != old.username
+    )
 
 
 class ProcessManager:
-    """Process management service."""
+    """
+    Process management service.
+
+    The process table is scanned once per refresh interval by a background
+    job and shared by every caller; requests only filter, sort and page the
+    cached rows. Sorted views are computed once per refresh and sort key.
+    
+    On Linux the table is read with ProcReader straight from /proc; psutil is
+    used elsewhere, or if a /proc scan fails.
+    
+    Every scan gets a new, increasing version. The last history_size scans
+    are kept by PID so a client holding an older version can be sent only
+    the rows that were added, removed or changed since. A kept scan holds
+    the row each process was last sent with: it is replaced only once CPU
+    or memory moved past the thresholds from that row, so a client
+    chaining deltas still sees values that drift slowly across many scans.
+    """
+    
+    def __init__(self, refresh_interval: float, history_size: int, reader: Optional[ProcReader] = None):
+        self.refresh_interval = refresh_interval
+        self.reader = reader
+        # Versions start from the wall clock so they keep increasing across restarts
+        self._version = int(time.time() * 1000)
+        self._history: deque = deque(maxlen=max(1, history_size))  # (version, {pid: row})
+        self._rows: Tuple[ProcessRow, ...] = ()
+        self._refreshed_at: Optional[float] = None  # time.monotonic() of the last scan
+        self._sorted: Dict[Tuple[str, bool], List[ProcessRow]] = {}
+        self._refresh_lock = threading.Lock()
+        self._sorted_lock = threading.Lock()
+    
+    @property
+    def version(self) -> int:
+        return self._version
+    
+    @property
+    def age(self) -> Optional[float]:
+        """Seconds since the process table was scanned, or None before the first scan."""
+        if self._refreshed_at is None:
+            return None
+        return time.monotonic() - self._refreshed_at
     
-    def get_all_processes(self) -> List[ProcessInfo]:
-        """Get all running processes."""
-        processes = []
-        for proc in psutil.process_iter(['pid', 'name', 'username', 'cpu_percent', 
+    def _scan(self) -> Tuple[ProcessRow, ...]:
+        """Read all running processes."""
+        if self.reader is not None:
+            try:
+                return tuple(map(ProcessRow._make, self.reader.scan()))
+            except Exception as e:
+                logger.warning(f"Reading /proc failed, falling back to psutil: {e}")
+        return self._scan_psutil()
+    
+    def _scan_psutil(self) -> Tuple[ProcessRow, ...]:
+        """Read all running processes through psutil."""
+        rows = []
+        for proc in psutil.process_iter(['pid', 'name', 'username', 'cpu_percent',
                                          'memory_percent', 'status', 'create_time']):
             try:
                 pinfo = proc.info
-                processes.append(ProcessInfo(
+                rows.append(ProcessRow(
                     pid=pinfo['pid'],
                     name=pinfo['name'] or 'unknown',
                     username=pinfo['username'] or 'unknown',
@@ -25,10 +106,128 @@ class ProcessManager:
                 ))
             except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
                 pass
+        return tuple(rows)
+    
+    def refresh(self):
+        """Rescan the process table (scheduler job)."""
+        try:
+            with self._refresh_lock:
+                rows = self._scan()
+                published = self._history[-1][1] if self._history else {}
+                by_pid = {}
+                for row in rows:
+                    previous = published.get(row.pid)
+                    if previous is None or previous.created != row.created or _row_changed(previous, row):
+                        previous = row
+                    by_pid[row.pid] = previous
+                with self._sorted_lock:
+                    self._rows = rows
+                    self._sorted = {}
+                    self._version += 1
+                    self._history.append((self._version, by_pid))
+                    self._refreshed_at = time.monotonic()
+        except Exception as e:
+            logger.error(f"Error refreshing process table: {e}")
+    
+    def _current_rows(self) -> Tuple[ProcessRow, ...]:
+        """Cached rows; scans inline only if the background job has not run recently."""
+        age = self.age
+        if age is None or age > self.refresh_interval * 3:
+            if self._refresh_lock.locked():
+                # Another caller is already scanning; wait for it instead of scanning again
+                with self._refresh_lock:
+                    pass
+            else:
+                self.refresh()
+        return self._rows
+    
+    def _sorted_rows(self, sort: str, descending: bool) -> Tuple[int, List[ProcessRow]]:
+        """Current version and its rows in the requested order."""
+        self._current_rows()
+        key = (sort, descending)
+        with self._sorted_lock:
+            view = self._sorted.get(key)
+            if view is None:
+                view = self._sorted[key] = _sort_rows(self._rows, sort, descending)
+            return self._version, view
+    
+    def get_processes(self, sort: str = 'cpu_percent', order: str = 'desc',
+                      limit: Optional[int] = None, offset: int = 0,
+                      user: Optional[str] = None, status: Optional[str] = None,
+                      name: Optional[str] = None, min_cpu: Optional[float] = None,
+                      min_memory: Optional[float] = None,
+                      search: Optional[str] = None) -> Tuple[List[ProcessRow], int, int, int]:
+        """
+        Filter, sort and page the process table.
+        Returns (page, number of matching processes, number of processes, version).
+        """
+        if sort not in SORT_FIELDS:
+            raise ValueError(f"Cannot sort by {sort!r}, expected one of {sorted(SORT_FIELDS)}")
+        version, rows = self._sorted_rows(sort, order == 'desc')
+        process_count = len(rows)
+        match = self._filter(user, status, name, min_cpu, min_memory, search)
+        if match is not None:
+            rows = [row for row in rows if match(row)]
         
-        # Sort by CPU usage descending
-        processes.sort(key=lambda x: x.cpu_percent, reverse=True)
-        return processes
+        end = None if limit is None else offset + limit
+        return rows[offset:end], len(rows), process_count, version
+    
+    @staticmethod
+    def _filter(user: Optional[str], status: Optional[str], name: Optional[str],
+                min_cpu: Optional[float], min_memory: Optional[float], search: Optional[str] = None):
+        """Predicate for the given filters, or None if no filter is set."""
+        filters = []
+        if user:
+            filters.append(lambda row: row.username == user)
+        if status:
+            filters.append(lambda row: row.status == status)
+        if name:
+            needle = name.lower()
+            filters.append(lambda row: needle in row.name.lower())
+        if min_cpu is not None:
+            filters.append(lambda row: row.cpu_percent >= min_cpu)
+        if min_memory is not None:
+            filters.append(lambda row: row.memory_percent >= min_memory)
+        if search:
+            term = search.lower()
+            filters.append(lambda row: (
+                term in row.name.lower() or term in row.username.lower() or
+                term in str(row.pid) or term in row.status.lower()
+            ))
+        if not filters:
+            return None
+        return lambda row: all(f(row) for f in filters)
+    
+    def get_changes(self, since: int, user: Optional[str] = None, status: Optional[str] = None,
+                    name: Optional[str] = None, min_cpu: Optional[float] = None,
+                    min_memory: Optional[float] = None, search: Optional[str] = None):
+        """
+        Rows that were added or changed and PIDs that were removed (or stopped
+        matching the filters) between version since and the current version.
+        Returns (version, changed rows, removed PIDs, number of matching
+        processes, number of processes), or None if since is no longer kept.
+        """
+        self._current_rows()
+        with self._sorted_lock:
+            history = list(self._history)
+        old = next((rows for version, rows in history if version == since), None)
+        if old is None:
+            return None
+        version, current = history[-1]
+        
+        match = self._filter(user, status, name, min_cpu, min_memory, search)
+        if match is not None:
+            old = {pid: row for pid, row in old.items() if match(row)}
+            current = {pid: row for pid, row in current.items() if match(row)}
+        
+        # Kept rows are only replaced when they changed enough, so any other row is a change
+        changed = [row for pid, row in current.items() if old.get(pid) is not row]
+        removed = [pid for pid in old if pid not in current]
+        return version, changed, removed, len(current), len(history[-1][1])
+    
+    def get_all_processes(self) -> List[ProcessRow]:
+        """Get all running processes, sorted by CPU usage descending."""
+        return self.get_processes()[0]
     
     def kill_process(self, pid: int) -> bool:
         """Kill a process by PID."""
@@ -50,5 +249,8 @@ class ProcessManager:
 
 
 # Global instance
-process_manager = ProcessManager()
-
+process_manager = ProcessManager(
+    refresh_interval=settings.PROCESS_REFRESH_INTERVAL,
+    history_size=settings.PROCESS_DELTA_HISTORY,
+    reader=ProcReader() if settings.PROCESS_PROCFS_READER and ProcReader.available() else None
+)
@@ -0,0 +1,198 @@
+"""Process lifecycle recording into process_history."""
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+import psutil
+from sqlalchemy import and_, bindparam, insert
+from app.config import settings
+from app.database import SessionLocal
+from app.models.database import ProcessHistory
+
+logger = logging.getLogger(__name__)
+
+# A process instance: PIDs are reused, the (pid, create_time) pair is not
+ProcessKey = Tuple[int, float]
+
+_history = ProcessHistory.__table__
+
+# Executemany statements; bind names must differ from the column names
+_end_process = _history.update().where(and_(
+    _history.c.pid == bindparam('b_pid'),
+    _history.c.started_at == bindparam('b_started_at'),
+    _history.c.ended_at.is_(None)
+)).values(ended_at=bindparam('b_ended_at'))
+
+_record_usage = _history.update().where(and_(
+    _history.c.pid == bindparam('b_pid'),
+    _history.c.started_at == bindparam('b_started_at'),
+    _history.c.ended_at.is_(None)
+)).values(
+    cpu_percent=bindparam('b_cpu_percent'),
+    memory_percent=bindparam('b_memory_percent'),
+    status=bindparam('b_status')
+)
+
+
+def _started_at(create_time: float) -> datetime:
+    return datetime.fromtimestamp(create_time, tz=timezone.utc)
+
+
+def _same_instance(create_time: float, other: float) -> bool:
+    """Compare create times; ones read back from the database are rounded to microseconds."""
+    return abs(create_time - other) < 0.001
+
+
+class ProcessTracker:
+    """
+    Records process starts and exits in process_history.
+
+    Every scan lists the running PIDs (a single directory read) and diffs them
+    against the previous scan; only new PIDs are inspected, so a scan over
+    thousands of unchanged processes costs a few milliseconds. A row is
+    inserted when a process starts and ended_at is set when it exits, both as
+    executemany batches. Every sample_interval seconds the open rows of
+    processes alive at least that long get their CPU (averaged since the
+    previous sample) and memory usage refreshed. That pass also re-checks
+    create_time, which catches a PID reused between two scans.
+    """
+
+    def __init__(self, sample_interval: float):
+        self.sample_interval = sample_interval
+        self._known: Optional[Dict[int, float]] = None  # pid -> create_time
+        self._procs: Dict[int, psutil.Process] = {}
+        self._last_sample = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _inspect(self, pid: int) -> Optional[Dict[str, Any]]:
+        """process_history row (plus create_time) for a newly seen process, or None if it is already gone."""
+        try:
+            proc = psutil.Process(pid)
+            info = proc.as_dict(['create_time', 'name', 'username', 'memory_percent', 'status'], ad_value=None)
+            proc.cpu_percent(None)  # primes the per-process CPU counter for the first usage sample
+        except psutil.Error:
+            return None
+        if info['create_time'] is None:
+            return None
+        self._procs[pid] = proc
+        return dict(
+            pid=pid,
+            name=info['name'] or 'unknown',
+            username=info['username'] or 'unknown',
+            cpu_percent=0.0,
+            memory_percent=info['memory_percent'] or 0.0,
+            status=info['status'] or 'unknown',
+            started_at=_started_at(info['create_time']),
+            create_time=info['create_time']
+        )
+
+    def _load_open(self, db) -> Dict[int, float]:
+        """Processes recorded as running by a previous run of the tracker."""
+        rows = db.query(ProcessHistory.pid, ProcessHistory.started_at).filter(
+            ProcessHistory.ended_at.is_(None)
+        ).all()
+        known = {}
+        for pid, started_at in rows:
+            if started_at is None:
+                continue
+            if started_at.tzinfo is None:
+                started_at = started_at.replace(tzinfo=timezone.utc)
+            known[pid] = started_at.timestamp()
+        return known
+
+    def _sample(self, known: Dict[int, float], now: float) -> Tuple[List[Dict[str, Any]], List[ProcessKey], List[Dict[str, Any]]]:
+        """
+        Usage of long-lived processes. Returns the usage updates plus instances
+        that turned out to be a reused PID (ended, and their replacement started).
+        """
+        usage, reused, restarted = [], [], []
+        for pid, create_time in known.items():
+            if now - create_time < self.sample_interval:
+                continue
+            proc = self._procs.get(pid)
+            try:
+                if proc is None:
+                    proc = self._procs[pid] = psutil.Process(pid)
+                with proc.oneshot():
+                    if not _same_instance(proc.create_time(), create_time):
+                        raise psutil.NoSuchProcess(pid)
+                    usage.append(dict(
+                        b_pid=pid,
+                        b_started_at=_started_at(create_time),
+                        b_cpu_percent=proc.cpu_percent(None),
+                        b_memory_percent=proc.memory_percent(),
+                        b_status=proc.status()
+                    ))
+            except psutil.NoSuchProcess:
+                reused.append((pid, create_time))
+                self._procs.pop(pid, None)
+                row = self._inspect(pid)
+                if row is not None:
+                    restarted.append(row)
+            except psutil.AccessDenied:
+                continue
+        return usage, reused, restarted
+
+    def scan(self):
+        """Diff running processes against the previous scan and record the changes (scheduler job)."""
+        with self._lock:
+            try:
+                db = SessionLocal()
+                try:
+                    self._scan(db)
+                finally:
+                    db.close()
+            except Exception as e:
+                logger.error(f"Error recording process history: {e}")
+
+    def _scan(self, db):
+        known = self._known if self._known is not None else self._load_open(db)
+        pids = set(psutil.pids())
+        ended: List[ProcessKey] = [(pid, ct) for pid, ct in known.items() if pid not in pids]
+        started = [row for row in map(self._inspect, (pid for pid in pids if pid not in known)) if row is not None]
+        # Open rows from a previous run whose PID now belongs to another process
+        if self._known is None:
+            for pid, create_time in list(known.items()):
+                if pid in pids and pid not in self._procs:
+                    row = self._inspect(pid)
+                    if row is not None and not _same_instance(row['create_time'], create_time):
+                        ended.append((pid, create_time))
+                        started.append(row)
+
+        usage: List[Dict[str, Any]] = []
+        monotonic = time.monotonic()
+        sample_due = monotonic - self._last_sample >= self.sample_interval
+        if sample_due:
+            usage, reused, restarted = self._sample(known, time.time())
+            ended.extend(reused)
+            started.extend(restarted)
+
+        if started or ended or usage:
+            ended_at = datetime.now(timezone.utc)
+            if ended:
+                db.execute(_end_process, [
+                    dict(b_pid=pid, b_started_at=_started_at(ct), b_ended_at=ended_at) for pid, ct in ended
+                ])
+            if usage:
+                db.execute(_record_usage, usage)
+            if started:
+                db.execute(insert(ProcessHistory), [
+                    {key: value for key, value in row.items() if key != 'create_time'} for row in started
+                ])
+            db.commit()
+
+        # Only advance the state once the changes are stored, so a failed write is retried
+        for pid, _ in ended:
+            known.pop(pid, None)
+            if pid not in pids:
+                self._procs.pop(pid, None)
+        for row in started:
+            known[row['pid']] = row['create_time']
+        self._known = known
+        if sample_due:
+            self._last_sample = monotonic
+
+
+# Global instance
+process_tracker = ProcessTracker(sample_interval=settings.PROCESS_SAMPLE_INTERVAL)
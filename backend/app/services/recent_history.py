@@ -0,0 +1,145 @@
+"""In-memory ring buffer of recent metric samples."""
+import json
+import math
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+from app.config import settings
+from app.models.database import METRIC_FIELDS
+from app.models.metrics import SystemMetrics
+from app.services.aggregation import MetricRow, rows_from_columns
+
+logger = logging.getLogger(__name__)
+
+
+class RecentHistoryBuffer:
+    """
+    Fixed-size ring buffer holding the last few hours of samples as NumPy columns.
+
+    Storage is one preallocated float64 array per metric field plus a timestamp
+    array and a GPU JSON column, so memory use is fixed at construction time and
+    appends never allocate per-sample objects. Missing values are stored as NaN.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._timestamps = np.zeros(capacity, dtype=np.float64)  # epoch seconds
+        self._columns: Dict[str, np.ndarray] = {
+            field: np.full(capacity, np.nan, dtype=np.float64) for field in METRIC_FIELDS
+        }
+        self._gpu_data = np.empty(capacity, dtype=object)
+        self._head = 0  # next slot to write
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the numeric arrays (fixed for the lifetime of the buffer)."""
+        return self._timestamps.nbytes + sum(col.nbytes for col in self._columns.values())
+
+    def append(self, metrics: SystemMetrics):
+        """Store one sampler snapshot (sampler listener)."""
+        values = {
+            'cpu_percent': metrics.cpu.percent,
+            'cpu_count': metrics.cpu.count,
+            'cpu_freq_current': metrics.cpu.freq_current,
+            'memory_total': metrics.memory.total,
+            'memory_available': metrics.memory.available,
+            'memory_percent': metrics.memory.percent,
+            'memory_used': metrics.memory.used,
+            'disk_total': metrics.disk.total,
+            'disk_used': metrics.disk.used,
+            'disk_free': metrics.disk.free,
+            'disk_percent': metrics.disk.percent,
+            'network_bytes_sent': metrics.network.bytes_sent,
+            'network_bytes_recv': metrics.network.bytes_recv,
+            'network_packets_sent': metrics.network.packets_sent,
+            'network_packets_recv': metrics.network.packets_recv,
+        }
+        gpu_data = json.dumps([gpu.model_dump() for gpu in metrics.gpus])
+        timestamp = metrics.timestamp.timestamp()
+
+        with self._lock:
+            if self._size and timestamp < self._timestamps[(self._head - 1) % self.capacity]:
+                # Clock went backwards; keep the buffer sorted by starting over
+                logger.warning("System clock moved backwards, resetting recent history buffer")
+                self._head = 0
+                self._size = 0
+
+            slot = self._head
+            self._timestamps[slot] = timestamp
+            for field, value in values.items():
+                self._columns[field][slot] = np.nan if value is None else value
+            self._gpu_data[slot] = gpu_data
+            self._head = (slot + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def _segments(self):
+        """Slices of the storage arrays in chronological order."""
+        if self._size < self.capacity:
+            return [slice(0, self._size)]
+        return [slice(self._head, self.capacity), slice(0, self._head)]
+
+    def covers(self, start_time: datetime, end_time: datetime) -> bool:
+        """Whether [start_time, end_time] lies entirely within the buffered window."""
+        with self._lock:
+            if self._size == 0:
+                return False
+            oldest = self._timestamps[self._segments()[0].start]
+        return oldest <= start_time.timestamp() <= end_time.timestamp()
+
+    def query_columns(self, start_time: datetime, end_time: datetime,
+                      limit: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """
+        Return copies of all columns for samples in [start_time, end_time].
+        Keys are 'timestamp' (epoch seconds), the METRIC_FIELDS and 'gpu_data'.
+        """
+        start = start_time.timestamp()
+        end = end_time.timestamp()
+        with self._lock:
+            # Each segment is sorted, so the range is found by binary search
+            picks = []
+            for segment in self._segments():
+                timestamps = self._timestamps[segment]
+                lo = np.searchsorted(timestamps, start, side='left')
+                hi = np.searchsorted(timestamps, end, side='right')
+                if hi > lo:
+                    picks.append(slice(segment.start + lo, segment.start + hi))
+
+            def gather(array: np.ndarray) -> np.ndarray:
+                if not picks:
+                    return array[:0].copy()
+                if len(picks) == 1:
+                    return array[picks[0]].copy()
+                return np.concatenate([array[pick] for pick in picks])
+
+            columns = {'timestamp': gather(self._timestamps)}
+            for field, array in self._columns.items():
+                columns[field] = gather(array)
+            columns['gpu_data'] = gather(self._gpu_data)
+
+        if limit is not None:
+            columns = {key: value[:limit] for key, value in columns.items()}
+        return columns
+
+    def query(self, start_time: datetime, end_time: datetime,
+              limit: Optional[int] = None) -> List[MetricRow]:
+        """Return samples in [start_time, end_time] as MetricSnapshot-like rows."""
+        return rows_from_columns(self.query_columns(start_time, end_time, limit))
+
+
+def _capacity(hours: float, interval: float) -> int:
+    """Number of slots needed to hold the given number of hours of samples."""
+    return max(1, math.ceil(hours * 3600 / max(interval, 0.001))) + 1
+
+
+# Global instance
+recent_history = RecentHistoryBuffer(
+    _capacity(settings.RECENT_HISTORY_HOURS, settings.METRICS_COLLECTION_INTERVAL)
+)
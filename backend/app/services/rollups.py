@@ -0,0 +1,278 @@
+"""Incrementally maintained rollup tiers for metric history."""
+import math
+import threading
+import logging
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+from app.models.database import MetricChunk, MetricRollup, MetricSnapshot, METRIC_FIELDS
+from app.services.aggregation import MetricRow, aggregate_columns, local_bound
+
+logger = logging.getLogger(__name__)
+
+# Bucket widths (seconds) of the rollup tiers: 1 minute, 1 hour, 1 day
+ROLLUP_RESOLUTIONS = (60, 3600, 86400)
+
+
+def _epoch(value: datetime) -> float:
+    """Seconds since the epoch; naive datetimes are taken as local time like the collector writes them."""
+    return value.timestamp()
+
+
+def _bucket_epoch(value: datetime) -> float:
+    """Seconds since the epoch of a rollup or chunk time; written as aware UTC, SQLite returns them naive."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _bucket_rows(columns: Dict[str, Any], resolution: int) -> List[Dict[str, Any]]:
+    """Rollup rows of aggregate_columns output."""
+    rows = []
+    for i, start in enumerate(columns['timestamp'].tolist()):
+        row = {
+            'resolution': resolution,
+            'bucket_start': datetime.fromtimestamp(start, tz=timezone.utc),
+            'sample_count': int(columns['count'][i]),
+            'gpu_data': columns['gpu_data'][i] if 'gpu_data' in columns else None,
+        }
+        for field in METRIC_FIELDS:
+            for stat in ('avg', 'min', 'max'):
+                value = float(columns[f"{field}_{stat}"][i])
+                row[f"{field}_{stat}"] = None if math.isnan(value) else value
+        rows.append(row)
+    return rows
+
+
+class _OpenBucket:
+    """Running statistics of a bucket that is still receiving samples."""
+
+    __slots__ = ('start', 'count', 'counts', 'sums', 'mins', 'maxs', 'gpu_data')
+
+    def __init__(self, start: float):
+        self.start = start
+        self.count = 0
+        self.counts = [0] * len(METRIC_FIELDS)
+        self.sums = [0.0] * len(METRIC_FIELDS)
+        self.mins: List[Optional[float]] = [None] * len(METRIC_FIELDS)
+        self.maxs: List[Optional[float]] = [None] * len(METRIC_FIELDS)
+        self.gpu_data: Optional[str] = None
+
+    def add(self, row: Dict[str, Any]):
+        self.count += 1
+        if self.gpu_data is None:
+            self.gpu_data = row.get('gpu_data')
+        for i, field in enumerate(METRIC_FIELDS):
+            value = row.get(field)
+            if value is None:
+                continue
+            self.counts[i] += 1
+            self.sums[i] += value
+            if self.mins[i] is None or value < self.mins[i]:
+                self.mins[i] = value
+            if self.maxs[i] is None or value > self.maxs[i]:
+                self.maxs[i] = value
+
+    def to_row(self, resolution: int) -> Dict[str, Any]:
+        """metric_rollups row for this bucket."""
+        row = {
+            'resolution': resolution,
+            'bucket_start': datetime.fromtimestamp(self.start, tz=timezone.utc),
+            'sample_count': self.count,
+            'gpu_data': self.gpu_data,
+        }
+        for i, field in enumerate(METRIC_FIELDS):
+            row[f"{field}_avg"] = self.sums[i] / self.counts[i] if self.counts[i] else None
+            row[f"{field}_min"] = self.mins[i]
+            row[f"{field}_max"] = self.maxs[i]
+        return row
+
+
+def _merge_rollup_rows(rows: List[Any]) -> Dict[str, Any]:
+    """
+    Combine rollup rows (ORM objects or dicts) into one set of statistics.
+    Averages are weighted by sample_count; min/max are taken over all rows.
+    """
+    def get(row: Any, key: str) -> Any:
+        return row[key] if isinstance(row, dict) else getattr(row, key)
+    
+    merged: Dict[str, Any] = {'sample_count': sum(get(r, 'sample_count') or 0 for r in rows)}
+    merged['gpu_data'] = next((get(r, 'gpu_data') for r in rows if get(r, 'gpu_data')), None)
+    for field in METRIC_FIELDS:
+        weighted = [(get(r, f"{field}_avg"), get(r, 'sample_count') or 0) for r in rows]
+        weighted = [(avg, n) for avg, n in weighted if avg is not None and n > 0]
+        total = sum(n for _, n in weighted)
+        merged[f"{field}_avg"] = sum(avg * n for avg, n in weighted) / total if total else None
+        mins = [get(r, f"{field}_min") for r in rows if get(r, f"{field}_min") is not None]
+        maxs = [get(r, f"{field}_max") for r in rows if get(r, f"{field}_max") is not None]
+        merged[f"{field}_min"] = min(mins) if mins else None
+        merged[f"{field}_max"] = max(maxs) if maxs else None
+    return merged
+
+
+class RollupManager:
+    """
+    Maintains the 1m / 1h / 1d rollup tiers as samples arrive.
+
+    Each tier keeps one open bucket in memory. When a sample lands in a later
+    bucket the open one is closed and returned as a metric_rollups row for the
+    collector to write with its next batch. Rows for a bucket that already
+    exists (e.g. a partial bucket written before a restart) are merged into it.
+    """
+
+    def __init__(self, resolutions: Tuple[int, ...] = ROLLUP_RESOLUTIONS):
+        self.resolutions = resolutions
+        self._open: Dict[int, _OpenBucket] = {}
+        self._lock = threading.Lock()
+
+    def add(self, row: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Add a metric_snapshots row; returns rollup rows for buckets it closed."""
+        timestamp = _epoch(row['timestamp'])
+        closed = []
+        with self._lock:
+            for resolution in self.resolutions:
+                start = timestamp - timestamp % resolution
+                bucket = self._open.get(resolution)
+                if bucket is not None and bucket.start != start:
+                    closed.append(bucket.to_row(resolution))
+                    bucket = None
+                if bucket is None:
+                    bucket = self._open[resolution] = _OpenBucket(start)
+                bucket.add(row)
+        return closed
+
+    def open_rows(self, resolution: int) -> List[Dict[str, Any]]:
+        """Partial rollup row of the bucket currently being filled, if any."""
+        with self._lock:
+            bucket = self._open.get(resolution)
+            return [bucket.to_row(resolution)] if bucket is not None else []
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """Close all open buckets (on shutdown); they are merged again after a restart."""
+        with self._lock:
+            rows = [bucket.to_row(resolution) for resolution, bucket in self._open.items()]
+            self._open.clear()
+        return rows
+
+    def write(self, db: Session, rows: List[Dict[str, Any]]):
+        """Insert rollup rows, merging them into rows that already exist for the same bucket."""
+        if not rows:
+            return
+        keys = [(row['resolution'], row['bucket_start']) for row in rows]
+        existing = {
+            (r.resolution, _bucket_epoch(r.bucket_start)): r
+            for r in db.query(MetricRollup).filter(or_(*[
+                and_(MetricRollup.resolution == resolution, MetricRollup.bucket_start == start)
+                for resolution, start in keys
+            ])).all()
+        }
+        for row in rows:
+            current = existing.get((row['resolution'], _bucket_epoch(row['bucket_start'])))
+            if current is None:
+                db.add(MetricRollup(**row))
+                continue
+            for key, value in _merge_rollup_rows([current, row]).items():
+                setattr(current, key, value)
+
+    def select_resolution(self, bucket_seconds: int) -> Optional[int]:
+        """Coarsest tier whose buckets are no wider than the requested bucket size."""
+        candidates = [r for r in self.resolutions if r <= bucket_seconds]
+        return max(candidates) if candidates else None
+
+    def covers(self, db: Session, resolution: int, start_time: datetime) -> bool:
+        """
+        Whether the tier holds every sample from start_time on, i.e. rollups were
+        already being kept when the oldest raw snapshot in range was taken.
+        """
+        first_bucket = db.query(func.min(MetricRollup.bucket_start)).filter(
+            MetricRollup.resolution == resolution
+        ).scalar()
+        if first_bucket is None:
+            return False
+        first_raw = db.query(func.min(MetricSnapshot.timestamp)).filter(
+            MetricSnapshot.timestamp >= local_bound(db, start_time)
+        ).scalar()
+        # Compacted samples are no longer in metric_snapshots
+        first_chunk = db.query(func.min(MetricChunk.chunk_start)).filter(
+            MetricChunk.chunk_end > start_time
+        ).scalar()
+        firsts = [_epoch(first_raw)] if first_raw is not None else []
+        if first_chunk is not None:
+            firsts.append(max(_bucket_epoch(first_chunk), _epoch(start_time)))
+        return not firsts or _bucket_epoch(first_bucket) <= min(firsts)
+
+    def query(self, db: Session, resolution: int, start_time: datetime,
+              end_time: datetime, bucket_seconds: int,
+              unwritten: Sequence[Dict[str, Any]] = (),
+              raw_columns: Optional[Callable[[datetime, datetime], Dict[str, Any]]] = None) -> List[MetricRow]:
+        """
+        Read a tier for [start_time, end_time] and re-bucket it to bucket_seconds.
+
+        Only rollup buckets lying entirely inside the range are read. The
+        ends of the range that cover a rollup bucket partially are bucketed
+        from raw_columns(start, end), the samples of a range as columns (see
+        columns_from_rows); without it they are left out. unwritten are the
+        rollup rows not committed to the database, closed buckets as well as
+        the partial row of the bucket still being filled; they are merged
+        with the stored rows of the same bucket. The caller keeps commits out
+        while it takes them and this reads the table, so each is counted once.
+        Returns MetricRow carriers holding the bucket averages.
+        """
+        start = _epoch(start_time)
+        end = _epoch(end_time)
+        # Rollup buckets in [first_full, last_full) lie entirely inside the range
+        first_full = -(-start // resolution) * resolution
+        last_full = end - end % resolution
+        rows: List[Any] = []
+        edges = []
+        if first_full < last_full:
+            rows.extend(db.query(MetricRollup).filter(
+                and_(
+                    MetricRollup.resolution == resolution,
+                    MetricRollup.bucket_start >= datetime.fromtimestamp(first_full, tz=timezone.utc),
+                    MetricRollup.bucket_start < datetime.fromtimestamp(last_full, tz=timezone.utc)
+                )
+            ).all())
+            rows.extend(
+                row for row in unwritten
+                if row['resolution'] == resolution and first_full <= _bucket_epoch(row['bucket_start']) < last_full
+            )
+            if start < first_full:
+                edges.append((start, first_full))
+            if last_full < end:
+                edges.append((last_full, end))
+        else:
+            edges.append((start, end))
+
+        if raw_columns is not None:
+            for edge_start, edge_end in edges:
+                columns = raw_columns(datetime.fromtimestamp(edge_start, tz=timezone.utc),
+                                      datetime.fromtimestamp(edge_end, tz=timezone.utc))
+                if edge_end == first_full:
+                    # Samples at first_full are in the first whole rollup bucket
+                    inside = columns['timestamp'] < edge_end
+                    columns = {key: value[inside] for key, value in columns.items()}
+                rows.extend(_bucket_rows(aggregate_columns(columns, resolution), resolution))
+
+        groups: Dict[float, List[Any]] = {}
+        for row in rows:
+            bucket_start = _bucket_epoch(row['bucket_start'] if isinstance(row, dict) else row.bucket_start)
+            groups.setdefault(bucket_start - bucket_start % bucket_seconds, []).append((bucket_start, row))
+
+        snapshots = []
+        for bucket_start in sorted(groups):
+            merged = _merge_rollup_rows([row for _, row in sorted(groups[bucket_start], key=lambda item: item[0])])
+            values = {field: merged[f"{field}_avg"] for field in METRIC_FIELDS}
+            if values['cpu_count'] is not None:
+                values['cpu_count'] = int(round(values['cpu_count']))
+            snapshots.append(MetricRow(
+                timestamp=datetime.fromtimestamp(bucket_start, tz=timezone.utc),
+                gpu_data=merged['gpu_data'],
+                **values
+            ))
+        return snapshots
+
+
+# Global instance
+rollup_manager = RollupManager()
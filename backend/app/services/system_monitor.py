@@ -4,6 +4,7 @@ import psutil
 import json
 import time
 import os
+import threading
 import logging
 import subprocess
 import re
@@ -14,39 +15,127 @@ from app.models.metrics import (
     CPUMetrics, MemoryMetrics, DiskMetrics, NetworkMetrics, GPUMetrics, SystemMetrics, SystemInfo, NetworkInterface
 )
 from datetime import datetime
+from app.config import settings
+from app.services.gpu_collector import GPUCollector, gpu_collector
 
 logger = logging.getLogger(__name__)
 
-try:
-    import pynvml
-    NVIDIA_AVAILABLE = True
-    pynvml.nvmlInit()
-except Exception:
-    NVIDIA_AVAILABLE = False
-
 
 class SystemMonitor:
     """System monitoring service."""
     
-    def __init__(self):
+    # Column order of the per-CPU lines in /proc/stat (values in jiffies)
+    _PROC_STAT_FIELDS = ('user', 'nice', 'system', 'idle', 'iowait', 'irq', 'softirq', 'steal')
+    
+    def __init__(self, gpus: Optional[GPUCollector] = None, public_ip_ttl: float = 3600):
+        # GPUs are sampled by their own collector on their own cadence
+        self.gpus = gpus
+        # System info: static fields are read once, slow ones by refresh_system_info()
+        self.public_ip_ttl = public_ip_ttl
+        self._static_info: Optional[Dict] = None
+        self._static_info_lock = threading.Lock()
+        self._network_interfaces: List[NetworkInterface] = []
+        self._network_interfaces_at: Optional[float] = None  # time.monotonic() of the last refresh
+        self._public_ip: Optional[str] = None
+        self._public_ip_at: Optional[float] = None
+        self._info_version = 0  # bumped when a refresh changes interfaces or public IP
+        self._refresh_lock = threading.Lock()
         # Track previous network I/O state for rate calculation
         self._network_io_prev = psutil.net_io_counters()
         self._network_io_prev_time = time.time()
         self._network_io_pernic_prev: Dict[str, Dict[str, int]] = {}
         self._network_io_pernic_prev_time = time.time()
+        # Track previous /proc/stat jiffy counters for CPU utilization deltas
+        self._cpu_times_prev: Dict[str, List[int]] = self._read_proc_stat()
+        # Prime psutil's internal counters for the non-/proc fallback
+        psutil.cpu_percent(interval=None, percpu=True)
+        psutil.cpu_percent(interval=None)
+    
+    def _read_proc_stat(self) -> Dict[str, List[int]]:
+        """
+        Read cumulative CPU jiffies directly from /proc/stat.
+        Returns {'cpu': [...], 'cpu0': [...], ...} with values ordered as _PROC_STAT_FIELDS.
+        """
+        cpu_times = {}
+        try:
+            with open('/proc/stat', 'r') as f:
+                for line in f:
+                    if not line.startswith('cpu'):
+                        break  # cpu lines come first
+                    parts = line.split()
+                    # guest/guest_nice are already accounted for in user/nice
+                    values = [int(v) for v in parts[1:9]]
+                    values.extend([0] * (len(self._PROC_STAT_FIELDS) - len(values)))
+                    cpu_times[parts[0]] = values
+        except (IOError, OSError, ValueError) as e:
+            logger.warning(f"Warning: Could not read /proc/stat: {e}")
+            return {}
+        return cpu_times
+    
+    def _cpu_breakdown(self, current: List[int], previous: Optional[List[int]]) -> Dict[str, float]:
+        """
+        Calculate utilization percentages from two /proc/stat samples of one CPU line.
+        Falls back to the since-boot averages when there is no usable previous sample.
+        """
+        if previous is not None:
+            deltas = [max(0, cur - prev) for cur, prev in zip(current, previous)]
+            if sum(deltas) == 0:
+                deltas = current
+        else:
+            deltas = current
+        
+        fields = dict(zip(self._PROC_STAT_FIELDS, deltas))
+        total = sum(deltas)
+        if total <= 0:
+            return {'percent': 0.0, 'iowait': 0.0, 'irq': 0.0, 'softirq': 0.0, 'steal': 0.0}
+        
+        idle = fields['idle'] + fields['iowait']
+        return {
+            'percent': round((total - idle) / total * 100, 1),
+            'iowait': round(fields['iowait'] / total * 100, 1),
+            'irq': round(fields['irq'] / total * 100, 1),
+            'softirq': round(fields['softirq'] / total * 100, 1),
+            'steal': round(fields['steal'] / total * 100, 1),
+        }
     
     def get_cpu_metrics(self) -> CPUMetrics:
-        """Get CPU metrics."""
-        cpu_percent = psutil.cpu_percent(interval=0.1)
+        """
+        Get CPU metrics without sleeping.
+        Total and per-core utilization come from the same pair of /proc/stat
+        samples (current call vs. previous call), so they always agree.
+        """
         cpu_count = psutil.cpu_count()
         cpu_freq = psutil.cpu_freq()
-        per_cpu = psutil.cpu_percent(percpu=True, interval=0.1)
+        
+        current = self._read_proc_stat()
+        if 'cpu' not in current:
+            # Fallback to psutil (non-blocking, also relative to the previous call)
+            return CPUMetrics(
+                percent=psutil.cpu_percent(interval=None),
+                count=cpu_count,
+                freq_current=cpu_freq.current if cpu_freq else None,
+                per_cpu=psutil.cpu_percent(interval=None, percpu=True)
+            )
+        
+        previous = self._cpu_times_prev
+        self._cpu_times_prev = current
+        
+        total = self._cpu_breakdown(current['cpu'], previous.get('cpu'))
+        per_cpu_names = sorted((name for name in current if name != 'cpu'), key=lambda n: int(n[3:]))
+        per_cpu = [
+            self._cpu_breakdown(current[name], previous.get(name))['percent']
+            for name in per_cpu_names
+        ]
         
         return CPUMetrics(
-            percent=cpu_percent,
+            percent=total['percent'],
             count=cpu_count,
             freq_current=cpu_freq.current if cpu_freq else None,
-            per_cpu=per_cpu
+            per_cpu=per_cpu,
+            iowait=total['iowait'],
+            irq=total['irq'],
+            softirq=total['softirq'],
+            steal=total['steal']
         )
     
     def get_memory_metrics(self) -> MemoryMetrics:
@@ -252,68 +341,10 @@ class SystemMonitor:
         return result
     
     def get_gpu_metrics(self) -> List[GPUMetrics]:
-        """Get NVIDIA GPU metrics."""
-        if not NVIDIA_AVAILABLE:
+        """Get NVIDIA GPU metrics (latest reading of the GPU collector)."""
+        if self.gpus is None:
             return []
-        
-        gpus = []
-        try:
-            device_count = pynvml.nvmlDeviceGetCount()
-            for i in range(device_count):
-                try:
-                    handle = pynvml.nvmlDeviceGetHandleByIndex(i)
-                    
-                    # Get GPU name (handle both string and bytes return types)
-                    name_raw = pynvml.nvmlDeviceGetName(handle)
-                    name = name_raw.decode('utf-8') if isinstance(name_raw, bytes) else name_raw
-                    
-                    # Get temperature (some GPUs may not support this)
-                    try:
-                        temp = pynvml.nvmlDeviceGetTemperature(handle, pynvml.NVML_TEMPERATURE_GPU)
-                    except:
-                        temp = None
-                    
-                    # Get utilization (some GPUs may not support this)
-                    try:
-                        util = pynvml.nvmlDeviceGetUtilizationRates(handle)
-                        utilization = util.gpu
-                    except:
-                        utilization = None
-                    
-                    # Get memory info (some GPUs may not support this - e.g., display GPUs)
-                    try:
-                        mem_info = pynvml.nvmlDeviceGetMemoryInfo(handle)
-                        memory_used = mem_info.used
-                        memory_total = mem_info.total
-                        memory_percent = (mem_info.used / mem_info.total) * 100
-                    except:
-                        memory_used = None
-                        memory_total = None
-                        memory_percent = None
-                    
-                    # Get power usage (some GPUs may not support this)
-                    try:
-                        power = pynvml.nvmlDeviceGetPowerUsage(handle) / 1000.0  # Convert to watts
-                    except:
-                        power = None
-                    
-                    gpus.append(GPUMetrics(
-                        index=i,
-                        name=name,
-                        temperature=temp,
-                        utilization=utilization,
-                        memory_used=memory_used,
-                        memory_total=memory_total,
-                        memory_percent=memory_percent,
-                        power_draw=power
-                    ))
-                except Exception as e:
-                    logger.warning(f"Error getting metrics for GPU {i}: {e}")
-                    continue
-        except Exception as e:
-            logger.error(f"Error enumerating GPUs: {e}")
-        
-        return gpus
+        return self.gpus.get_snapshot()
     
     def get_network_interfaces(self) -> List[NetworkInterface]:
         """Get network interface information (like ifconfig)."""
@@ -392,11 +423,8 @@ class SystemMonitor:
         
         return None
     
-    def get_system_info(self) -> SystemInfo:
-        """Get general system information."""
-        boot_time = datetime.fromtimestamp(psutil.boot_time())
-        uptime = (datetime.now() - boot_time).total_seconds()
-        
+    def _read_static_info(self) -> Dict:
+        """System info that does not change while the process runs."""
         # Determine Hostname
         hostname = platform.node()
         # Try to read from mounted host hostname file if available
@@ -435,11 +463,7 @@ class SystemMonitor:
                     except Exception:
                         pass
         
-        # Get network interfaces and public IP
-        network_interfaces = self.get_network_interfaces()
-        public_ip = self.get_public_ip()
-        
-        return SystemInfo(
+        return dict(
             hostname=hostname,
             os=platform.system(),
             os_release=platform.release(),
@@ -449,10 +473,61 @@ class SystemMonitor:
             cpu_count=psutil.cpu_count(logical=True),
             cpu_cores=psutil.cpu_count(logical=False),
             total_memory=psutil.virtual_memory().total,
-            uptime=uptime,
-            boot_time=boot_time,
-            network_interfaces=network_interfaces,
-            public_ip=public_ip
+            boot_time=datetime.fromtimestamp(psutil.boot_time())
+        )
+    
+    def load_static_info(self) -> Dict:
+        """Static system info, read (lscpu, /proc/cpuinfo) on the first call only; called at startup."""
+        if self._static_info is None:
+            with self._static_info_lock:
+                if self._static_info is None:
+                    self._static_info = self._read_static_info()
+        return self._static_info
+    
+    def refresh_system_info(self):
+        """
+        Refresh the slow system info fields (scheduler job): network interfaces
+        every run, the public IP once it is older than public_ip_ttl (or missing).
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            return  # previous refresh still waiting on the public IP services
+        try:
+            interfaces = self.get_network_interfaces()
+            if interfaces != self._network_interfaces:
+                self._info_version += 1
+            self._network_interfaces = interfaces
+            self._network_interfaces_at = time.monotonic()
+            if self._public_ip_at is None or time.monotonic() - self._public_ip_at >= self.public_ip_ttl:
+                public_ip = self.get_public_ip()
+                if public_ip is not None:
+                    if public_ip != self._public_ip:
+                        self._info_version += 1
+                    self._public_ip = public_ip
+                    self._public_ip_at = time.monotonic()
+        finally:
+            self._refresh_lock.release()
+    
+    @property
+    def info_version(self) -> int:
+        """Changes whenever refresh_system_info() finds different interfaces or public IP."""
+        return self._info_version
+    
+    def get_system_info(self) -> SystemInfo:
+        """
+        Get general system information. Never blocks on the network: interfaces
+        and public IP are the last values from refresh_system_info(), with their
+        age in seconds (None if not fetched yet).
+        """
+        static = self.load_static_info()
+        now = time.monotonic()
+        
+        return SystemInfo(
+            uptime=(datetime.now() - static['boot_time']).total_seconds(),
+            network_interfaces=self._network_interfaces,
+            network_interfaces_age=now - self._network_interfaces_at if self._network_interfaces_at is not None else None,
+            public_ip=self._public_ip,
+            public_ip_age=now - self._public_ip_at if self._public_ip_at is not None else None,
+            **static
         )
     
     def reboot_system(self) -> bool:
@@ -514,5 +589,5 @@ class SystemMonitor:
 
 
 # Global instance
-system_monitor = SystemMonitor()
+system_monitor = SystemMonitor(gpus=gpu_collector, public_ip_ttl=settings.PUBLIC_IP_TTL)
 
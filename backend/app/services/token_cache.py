@@ -0,0 +1,99 @@
+"""Cache of recently validated access tokens."""
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from sqlalchemy import event
+from app.config import settings
+from app.models.database import User
+
+logger = logging.getLogger(__name__)
+
+
+def _detached_copy(user: User) -> User:
+    """Transient User with the column values of user, safe to share between requests and threads."""
+    return User(**{column.key: getattr(user, column.key) for column in User.__table__.columns})
+
+
+class TokenCache:
+    """
+    LRU map of access token -> user for tokens validated within the last ttl
+    seconds, bounded by max_entries.
+
+    A hit skips both JWT verification and the users lookup. Entries never
+    outlive the token's own expiry, and invalidate_user() drops every token
+    of a user whose row changed (called from ORM events on User). Each worker
+    process has its own cache, so changes made by another process are seen
+    after at most ttl seconds.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # token -> (user, monotonic time the entry expires)
+        self._entries: 'OrderedDict[str, Tuple[User, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, token: str) -> Optional[User]:
+        """Cached user of token, or None."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(token)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[token]
+            self.misses += 1
+            return None
+
+    def put(self, token: str, user: User, token_expires_at: Optional[float] = None):
+        """Remember a validated token; token_expires_at is its exp claim (epoch seconds)."""
+        if not self.enabled:
+            return
+        ttl = self.ttl
+        if token_expires_at is not None:
+            ttl = min(ttl, token_expires_at - time.time())
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[token] = (_detached_copy(user), time.monotonic() + ttl)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int):
+        """Drop every cached token of a user (after the user was changed or deleted)."""
+        with self._lock:
+            stale = [token for token, (user, _) in self._entries.items() if user.id == user_id]
+            for token in stale:
+                del self._entries[token]
+        if stale:
+            logger.info(f"Invalidated {len(stale)} cached tokens of user {user_id}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(hits=self.hits, misses=self.misses, entries=len(self._entries), max_entries=self.max_entries)
+
+
+# Global instance
+token_cache = TokenCache(ttl=settings.AUTH_CACHE_TTL, max_entries=settings.AUTH_CACHE_MAX_ENTRIES)
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_changed_user(mapper, connection, target: User):
+    token_cache.invalidate_user(target.id)
@@ -0,0 +1,137 @@
+"""
+Benchmark: columnar bucket aggregation vs. the previous per-object implementation.
+
+Run from the backend directory:
+    python benchmarks/bench_aggregate.py [--rows 1000000] [--hours 720]
+"""
+import argparse
+import os
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.database import MetricSnapshot, METRIC_FIELDS  # noqa: E402
+from app.routers.history import get_bucket_minutes, round_metric_value  # noqa: E402
+from app.services.aggregation import MetricRow, aggregate_columns, columns_from_rows, rows_from_columns  # noqa: E402
+
+
+def aggregate_metrics(snapshots, time_range_hours):
+    """Bucket averages of MetricSnapshot-like rows, going through the columnar engine."""
+    bucket_minutes = get_bucket_minutes(time_range_hours)
+    if bucket_minutes is None:
+        return snapshots
+    buckets = aggregate_columns(columns_from_rows(snapshots), bucket_minutes * 60)
+    return rows_from_columns(buckets, suffix="_avg")
+
+
+def legacy_aggregate_metrics(snapshots, time_range_hours):
+    """The dict-of-lists implementation the columnar engine replaced (kept for comparison)."""
+    if time_range_hours <= 1:
+        return snapshots
+    elif time_range_hours <= 24:
+        bucket_minutes = max(1, int(time_range_hours * 60 / 500))
+    elif time_range_hours <= 168:
+        bucket_minutes = 60
+    else:
+        bucket_minutes = 1440
+
+    buckets = defaultdict(list)
+    for snapshot in snapshots:
+        total_minutes = int(snapshot.timestamp.timestamp() / 60)
+        bucket_minutes_rounded = (total_minutes // bucket_minutes) * bucket_minutes
+        buckets[datetime.fromtimestamp(bucket_minutes_rounded * 60)].append(snapshot)
+
+    def avg(values):
+        return sum(values) / len(values) if values else None
+
+    aggregated = []
+    for bucket_time in sorted(buckets.keys()):
+        group = buckets[bucket_time]
+        first = group[0]
+        lists = {
+            field: [getattr(s, field) for s in group if getattr(s, field) is not None]
+            for field in ('cpu_percent', 'cpu_freq_current', 'memory_percent', 'memory_used',
+                          'memory_available', 'disk_percent', 'disk_used', 'network_bytes_sent',
+                          'network_bytes_recv', 'network_packets_sent', 'network_packets_recv')
+        }
+        aggregated.append(MetricSnapshot(
+            timestamp=bucket_time,
+            cpu_percent=round_metric_value(avg(lists['cpu_percent']), 2),
+            cpu_count=first.cpu_count,
+            cpu_freq_current=round_metric_value(avg(lists['cpu_freq_current']), 2),
+            memory_total=round_metric_value(first.memory_total, 0),
+            memory_available=round_metric_value(avg(lists['memory_available']), 0),
+            memory_percent=round_metric_value(avg(lists['memory_percent']), 2),
+            memory_used=round_metric_value(avg(lists['memory_used']), 0),
+            disk_total=round_metric_value(first.disk_total, 0),
+            disk_used=round_metric_value(avg(lists['disk_used']), 0),
+            disk_free=round_metric_value(first.disk_free, 0),
+            disk_percent=round_metric_value(avg(lists['disk_percent']), 2),
+            network_bytes_sent=round_metric_value(avg(lists['network_bytes_sent']), 0),
+            network_bytes_recv=round_metric_value(avg(lists['network_bytes_recv']), 0),
+            network_packets_sent=round_metric_value(avg(lists['network_packets_sent']), 0),
+            network_packets_recv=round_metric_value(avg(lists['network_packets_recv']), 0),
+            gpu_data=first.gpu_data
+        ))
+    return aggregated
+
+
+def synthetic_rows(count: int, hours: float):
+    """count evenly spaced samples over the given number of hours with random values."""
+    rng = np.random.default_rng(42)
+    start = datetime.now() - timedelta(hours=hours)
+    step = hours * 3600 / count
+    values = rng.random((len(METRIC_FIELDS), count)) * 100
+    values[rng.random(values.shape) < 0.01] = np.nan  # 1% missing values
+    columns = [[None if np.isnan(v) else v for v in row] for row in values.tolist()]
+    return [
+        MetricRow(start + timedelta(seconds=i * step), *(column[i] for column in columns), '[]')
+        for i in range(count)
+    ]
+
+
+def best_of(repeat: int, func, *args):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--hours', type=float, default=720, help='time span covered by the rows')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"Generating {args.rows:,} synthetic rows over {args.hours:g} hours...")
+    rows = synthetic_rows(args.rows, args.hours)
+
+    legacy_time, legacy = best_of(args.repeat, legacy_aggregate_metrics, rows, args.hours)
+    columnar_time, columnar = best_of(args.repeat, aggregate_metrics, rows, args.hours)
+    # Data that is already columnar (ring buffer, exports) skips the row conversion
+    columns = columns_from_rows(rows)
+    bucket_seconds = get_bucket_minutes(args.hours) * 60
+    engine_time, _ = best_of(args.repeat, aggregate_columns, columns, bucket_seconds)
+
+    # Both implementations must agree (up to the legacy rounding)
+    assert len(legacy) == len(columnar)
+    for old, new in zip(legacy, columnar):
+        assert old.timestamp.timestamp() == new.timestamp.timestamp()
+        assert old.cpu_percent == round_metric_value(new.cpu_percent, 2)
+
+    print(f"buckets:                    {len(columnar):,}")
+    print(f"legacy (rows):              {legacy_time * 1000:10.1f} ms")
+    print(f"aggregate_metrics (rows):   {columnar_time * 1000:10.1f} ms  ({legacy_time / columnar_time:.1f}x faster)")
+    print(f"aggregate_columns (arrays): {engine_time * 1000:10.1f} ms  ({legacy_time / engine_time:.1f}x faster)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark: cached, batched GPUCollector vs. the previous per-sample NVML calls.
+
+Runs against the fake NVML backend, so no GPU is needed; --call-cost models the
+driver latency of one NVML call. Run from the backend directory:
+    python benchmarks/bench_gpu_collector.py [--gpus 8] [--samples 1000] [--call-cost 20]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.metrics import GPUMetrics  # noqa: E402
+from tests.fake_nvml import FakeGpu, FakeNvmlBackend  # noqa: E402
+from app.services.gpu_collector import GPUCollector  # noqa: E402
+
+
+def legacy_gpu_metrics(backend):
+    """What SystemMonitor.get_gpu_metrics did on every sample (kept for comparison)."""
+    gpus = []
+    for i in range(backend.device_count()):
+        handle = backend.device_handle(i)
+        name = backend.device_name(handle)
+        try:
+            temp = backend.temperature(handle)
+        except Exception:
+            temp = None
+        try:
+            utilization = backend.utilization(handle)
+        except Exception:
+            utilization = None
+        try:
+            memory_used, memory_total = backend.memory(handle)
+            memory_percent = memory_used / memory_total * 100
+        except Exception:
+            memory_used = memory_total = memory_percent = None
+        try:
+            power = backend.power_usage(handle) / 1000.0
+        except Exception:
+            power = None
+        gpus.append(GPUMetrics(
+            index=i, name=name, temperature=temp, utilization=utilization, memory_used=memory_used,
+            memory_total=memory_total, memory_percent=memory_percent, power_draw=power
+        ))
+    return gpus
+
+
+def fake_gpus(count: int, unified_memory: bool):
+    return [
+        FakeGpu(name=f"Fake GPU {i}", memory=None if unified_memory else (2 << 30, 16 << 30))
+        for i in range(count)
+    ]
+
+
+def run(samples: int, sample):
+    started = time.perf_counter()
+    for _ in range(samples):
+        sample()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--gpus', type=int, default=8)
+    parser.add_argument('--samples', type=int, default=1000)
+    parser.add_argument('--call-cost', type=float, default=20, help='microseconds per NVML call')
+    parser.add_argument('--unified-memory', action='store_true',
+                        help='devices without memory info (e.g. GB10), where the old code failed a call per sample')
+    args = parser.parse_args()
+    call_cost = args.call_cost / 1e6
+
+    legacy_backend = FakeNvmlBackend(fake_gpus(args.gpus, args.unified_memory), call_cost=call_cost)
+    legacy_time = run(args.samples, lambda: legacy_gpu_metrics(legacy_backend))
+
+    backend = FakeNvmlBackend(fake_gpus(args.gpus, args.unified_memory), call_cost=call_cost)
+    collector = GPUCollector(backend, interval=2)
+    collector_time = run(args.samples, collector.sample)
+
+    legacy_calls = sum(legacy_backend.calls.values()) / args.samples
+    collector_calls = sum(backend.calls.values()) / args.samples
+    print(f"{args.gpus} GPUs, {args.samples:,} samples, {args.call_cost:g} us per NVML call")
+    print(f"legacy:       {legacy_time / args.samples * 1000:8.3f} ms/sample  {legacy_calls:6.1f} calls/sample")
+    print(f"GPUCollector: {collector_time / args.samples * 1000:8.3f} ms/sample  {collector_calls:6.1f} calls/sample"
+          f"  ({legacy_time / collector_time:.1f}x faster)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""In-memory NVML stand-in for driving GPUCollector in tests and benchmarks."""
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from app.services.gpu_collector import NVML_FI_DEV_POWER_INSTANT, NVML_FI_DEV_TOTAL_ENERGY_CONSUMPTION
+
+# nvmlReturn_t values (nvml.h) the collector distinguishes
+NVML_ERROR_NOT_SUPPORTED = 3
+NVML_ERROR_UNKNOWN = 999
+NVML_ERROR_GPU_IS_LOST = 15
+
+
+class FakeNvmlError(Exception):
+    """Like pynvml.NVMLError: the NVML return code is in value."""
+
+    def __init__(self, value: int):
+        super().__init__(f"NVML error {value}")
+        self.value = value
+
+
+class FakeGpu:
+    """
+    One simulated device. A reading set to None is reported as not supported
+    (e.g. memory=None for a unified-memory GPU, fields=False for a driver
+    without nvmlDeviceGetFieldValues support).
+    """
+
+    def __init__(self, name: str = 'Fake GPU', temperature: Optional[float] = 50,
+                 utilization: Optional[float] = 30, memory: Optional[Tuple[int, int]] = (2 << 30, 16 << 30),
+                 power_mw: Optional[float] = 100_000, fields: bool = True):
+        self.name = name
+        self.temperature = temperature
+        self.utilization = utilization
+        self.memory = memory
+        self.power_mw = power_mw
+        self.fields = fields
+        self.energy_mj = 0.0  # advanced by power_mw on every energy read, as if one second passed
+        self.lost = False
+
+
+class FakeNvmlBackend:
+    """
+    Implements the PynvmlBackend methods over a list of FakeGpu.
+
+    Every call is counted in calls (by method name). errors maps a method name
+    to an error code raised by every call of it until removed, and a lost GPU
+    raises NVML_ERROR_GPU_IS_LOST from every call on its handle. call_cost
+    busy-waits that many seconds per call to model driver latency.
+    """
+
+    def __init__(self, gpus: Sequence[FakeGpu] = (), call_cost: float = 0.0):
+        self.gpus: List[FakeGpu] = list(gpus)
+        self.call_cost = call_cost
+        self.calls: Counter = Counter()
+        self.errors: Dict[str, int] = {}
+
+    def is_not_supported(self, error: Exception) -> bool:
+        return getattr(error, 'value', None) == NVML_ERROR_NOT_SUPPORTED
+
+    def is_lost(self, error: Exception) -> bool:
+        return getattr(error, 'value', None) == NVML_ERROR_GPU_IS_LOST
+
+    def _call(self, method: str, handle: Optional[int] = None) -> Optional[FakeGpu]:
+        self.calls[method] += 1
+        if self.call_cost:
+            until = time.perf_counter() + self.call_cost
+            while time.perf_counter() < until:
+                pass
+        if method in self.errors:
+            raise FakeNvmlError(self.errors[method])
+        if handle is None:
+            return None
+        if handle >= len(self.gpus) or self.gpus[handle].lost:
+            raise FakeNvmlError(NVML_ERROR_GPU_IS_LOST)
+        return self.gpus[handle]
+
+    def device_count(self) -> int:
+        self._call('device_count')
+        return len(self.gpus)
+
+    def device_handle(self, index: int) -> Any:
+        self._call('device_handle', index)
+        return index
+
+    def device_name(self, handle: Any) -> str:
+        return self._call('device_name', handle).name
+
+    def field_values(self, handle: Any, field_ids: Sequence[int]) -> List[Optional[float]]:
+        gpu = self._call('field_values', handle)
+        if not gpu.fields:
+            raise FakeNvmlError(NVML_ERROR_NOT_SUPPORTED)
+        values = []
+        for field_id in field_ids:
+            if gpu.power_mw is None:
+                values.append(None)
+            elif field_id == NVML_FI_DEV_TOTAL_ENERGY_CONSUMPTION:
+                gpu.energy_mj += gpu.power_mw
+                values.append(gpu.energy_mj)
+            elif field_id == NVML_FI_DEV_POWER_INSTANT:
+                values.append(gpu.power_mw)
+            else:
+                values.append(None)
+        return values
+
+    def _reading(self, method: str, handle: Any, attribute: str):
+        value = getattr(self._call(method, handle), attribute)
+        if value is None:
+            raise FakeNvmlError(NVML_ERROR_NOT_SUPPORTED)
+        return value
+
+    def temperature(self, handle: Any) -> float:
+        return self._reading('temperature', handle, 'temperature')
+
+    def utilization(self, handle: Any) -> float:
+        return self._reading('utilization', handle, 'utilization')
+
+    def memory(self, handle: Any):
+        return self._reading('memory', handle, 'memory')
+
+    def power_usage(self, handle: Any) -> float:
+        return self._reading('power_usage', handle, 'power_mw')
@@ -0,0 +1,213 @@
+"""CgroupCollector against a fake cgroup v2 tree."""
+import shutil
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import cgroup_collector as module
+from app.services.cgroup_collector import CgroupCollector
+
+
+class FakeClock:
+    """Stands in for the time module so rates use a known elapsed time."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(module, 'time', SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+@pytest.fixture
+def root(tmp_path):
+    (tmp_path / 'cgroup.controllers').write_text('cpu io memory pids\n')
+    return tmp_path
+
+
+def write_cgroup(root, path, usage_usec=0, throttled_usec=0, memory_current=None, memory_max=None,
+                 io_devices=(), memory_some_usec=None, memory_full_usec=0):
+    """Create or update the accounting files of one cgroup."""
+    directory = root.joinpath(*path.strip('/').split('/')) if path != '/' else root
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / 'cpu.stat').write_text(
+        f"usage_usec {usage_usec}\nuser_usec 0\nsystem_usec 0\n"
+        f"nr_periods 0\nnr_throttled 0\nthrottled_usec {throttled_usec}\n"
+    )
+    if memory_current is not None:
+        (directory / 'memory.current').write_text(f"{memory_current}\n")
+    if memory_max is not None:
+        (directory / 'memory.max').write_text(f"{memory_max}\n")
+    if io_devices:
+        (directory / 'io.stat').write_text(''.join(
+            f"{device} rbytes={rbytes} wbytes={wbytes} rios={rios} wios={wios} dbytes=0 dios=0\n"
+            for device, rbytes, wbytes, rios, wios in io_devices
+        ))
+    if memory_some_usec is not None:
+        (directory / 'memory.pressure').write_text(
+            f"some avg10=0.00 avg60=0.00 avg300=0.00 total={memory_some_usec}\n"
+            f"full avg10=0.00 avg60=0.00 avg300=0.00 total={memory_full_usec}\n"
+        )
+    return directory
+
+
+def by_path(cgroups):
+    return {cgroup.path: cgroup for cgroup in cgroups}
+
+
+def test_available(root, tmp_path_factory):
+    assert CgroupCollector(str(root), store=False).available()
+    assert not CgroupCollector(str(tmp_path_factory.mktemp('v1')), store=False).available()
+
+
+def test_first_collect_has_no_rates(root, clock):
+    write_cgroup(root, '/system.slice', usage_usec=5_000_000, memory_current=1024)
+
+    cgroup = by_path(CgroupCollector(str(root), store=False).collect())['/system.slice']
+
+    assert cgroup.memory_current == 1024
+    assert cgroup.cpu_percent is None
+    assert cgroup.io_read_rate is None
+    assert cgroup.memory_pressure is None
+
+
+def test_cpu_stat_deltas(root, clock):
+    write_cgroup(root, '/system.slice', usage_usec=1_000_000, throttled_usec=0)
+    collector = CgroupCollector(str(root), store=False)
+    collector.collect()
+
+    # 1.5 s of CPU and 0.2 s throttled over 2 s of wall time
+    write_cgroup(root, '/system.slice', usage_usec=2_500_000, throttled_usec=200_000)
+    clock.now += 2
+    cgroup = by_path(collector.collect())['/system.slice']
+
+    assert cgroup.cpu_percent == 75.0
+    assert cgroup.cpu_throttled_percent == 10.0
+
+
+def test_counter_reset_gives_no_rate(root, clock):
+    write_cgroup(root, '/system.slice', usage_usec=5_000_000)
+    collector = CgroupCollector(str(root), store=False)
+    collector.collect()
+
+    write_cgroup(root, '/system.slice', usage_usec=1_000)
+    clock.now += 1
+    assert by_path(collector.collect())['/system.slice'].cpu_percent is None
+
+
+def test_memory_current_and_max(root, clock):
+    write_cgroup(root, '/limited', memory_current=4096, memory_max=1 << 30)
+    write_cgroup(root, '/unlimited', memory_current=8192, memory_max='max')
+
+    cgroups = by_path(CgroupCollector(str(root), store=False).collect())
+
+    assert cgroups['/limited'].memory_current == 4096
+    assert cgroups['/limited'].memory_max == 1 << 30
+    assert cgroups['/unlimited'].memory_current == 8192
+    assert cgroups['/unlimited'].memory_max is None
+
+
+def test_io_stat_summed_over_devices(root, clock):
+    write_cgroup(root, '/system.slice', io_devices=[('8:0', 1000, 0, 10, 0), ('259:0', 500, 100, 5, 1)])
+    collector = CgroupCollector(str(root), store=False)
+    collector.collect()
+
+    write_cgroup(root, '/system.slice', io_devices=[('8:0', 5000, 0, 30, 0), ('259:0', 2500, 900, 15, 9)])
+    clock.now += 2
+    cgroup = by_path(collector.collect())['/system.slice']
+
+    assert cgroup.io_read_rate == (7500 - 1500) / 2
+    assert cgroup.io_write_rate == (900 - 100) / 2
+    assert cgroup.io_read_ops_rate == (45 - 15) / 2
+    assert cgroup.io_write_ops_rate == (9 - 1) / 2
+
+
+def test_memory_pressure(root, clock):
+    write_cgroup(root, '/system.slice', memory_some_usec=0, memory_full_usec=0)
+    collector = CgroupCollector(str(root), store=False)
+    collector.collect()
+
+    write_cgroup(root, '/system.slice', memory_some_usec=500_000, memory_full_usec=100_000)
+    clock.now += 10
+    cgroup = by_path(collector.collect())['/system.slice']
+
+    assert cgroup.memory_pressure == 5.0
+    assert cgroup.memory_pressure_full == 1.0
+
+
+def test_depth_limit(root, clock):
+    write_cgroup(root, '/', usage_usec=1)
+    write_cgroup(root, '/system.slice', usage_usec=1)
+    write_cgroup(root, '/system.slice/docker-abc.scope', usage_usec=1)
+    write_cgroup(root, '/system.slice/docker-abc.scope/nested', usage_usec=1)
+
+    assert set(by_path(CgroupCollector(str(root), max_depth=2, store=False).collect())) == {
+        '/', '/system.slice', '/system.slice/docker-abc.scope'
+    }
+    assert set(by_path(CgroupCollector(str(root), max_depth=0, store=False).collect())) == {'/'}
+
+
+def test_directories_without_accounting_files_are_skipped(root, clock):
+    (root / 'empty.slice').mkdir()
+    write_cgroup(root, '/system.slice', usage_usec=1)
+
+    assert '/empty.slice' not in by_path(CgroupCollector(str(root), store=False).collect())
+
+
+def test_vanished_cgroup(root, clock):
+    write_cgroup(root, '/system.slice/docker-abc.scope', usage_usec=1_000_000)
+    collector = CgroupCollector(str(root), store=False)
+    collector.collect()
+
+    shutil.rmtree(root / 'system.slice' / 'docker-abc.scope')
+    clock.now += 1
+    cgroups = by_path(collector.collect())
+
+    assert '/system.slice/docker-abc.scope' not in cgroups
+    assert all(key[0] != '/system.slice/docker-abc.scope' for key in collector._counters)
+
+
+def test_recreated_cgroup_starts_over(root, clock):
+    directory = write_cgroup(root, '/system.slice/docker-abc.scope', usage_usec=5_000_000)
+    collector = CgroupCollector(str(root), store=False)
+    collector.collect()
+
+    # Same path, new directory (built before the old one is removed, so its inode differs)
+    replacement = write_cgroup(root, '/system.slice/replacement', usage_usec=9_000_000)
+    shutil.rmtree(directory)
+    replacement.rename(directory)
+    clock.now += 1
+    cgroup = by_path(collector.collect())['/system.slice/docker-abc.scope']
+
+    # Counters restarted with the new cgroup; they must not be diffed against the old ones
+    assert cgroup.cpu_percent is None
+
+
+def test_sorted_by_cpu(root, clock):
+    write_cgroup(root, '/idle.slice', usage_usec=0)
+    write_cgroup(root, '/busy.slice', usage_usec=0)
+    collector = CgroupCollector(str(root), store=False)
+    collector.collect()
+
+    write_cgroup(root, '/idle.slice', usage_usec=10_000)
+    write_cgroup(root, '/busy.slice', usage_usec=900_000)
+    clock.now += 1
+    paths = [cgroup.path for cgroup in collector.collect()]
+
+    assert paths.index('/busy.slice') < paths.index('/idle.slice')
+
+
+def test_sample_publishes_snapshot(root, clock):
+    write_cgroup(root, '/system.slice', usage_usec=0, memory_current=10)
+    collector = CgroupCollector(str(root), store=False)
+
+    collector.sample()
+
+    assert collector.sampled_at is not None
+    assert [cgroup.path for cgroup in collector.get_snapshot()] == ['/system.slice']
@@ -0,0 +1,155 @@
+"""GPUCollector driven by the fake NVML backend."""
+from types import SimpleNamespace
+
+from app.services import gpu_collector
+from tests.fake_nvml import (
+    FakeGpu, FakeNvmlBackend, NVML_ERROR_GPU_IS_LOST, NVML_ERROR_UNKNOWN
+)
+from app.services.gpu_collector import GPUCollector
+
+
+def make_collector(*gpus, **kwargs):
+    backend = FakeNvmlBackend(gpus or (FakeGpu(),))
+    return backend, GPUCollector(backend, interval=2, **kwargs)
+
+
+def test_no_backend():
+    collector = GPUCollector(None, interval=2)
+
+    assert not collector.available
+    assert collector.get_snapshot() == []
+
+
+def test_readings():
+    _, collector = make_collector(FakeGpu(name='GB10', temperature=61, utilization=87,
+                                          memory=(4 << 30, 16 << 30), power_mw=150_000))
+
+    [gpu] = collector.sample()
+
+    assert gpu.index == 0
+    assert gpu.name == 'GB10'
+    assert gpu.temperature == 61
+    assert gpu.utilization == 87
+    assert gpu.memory_used == 4 << 30
+    assert gpu.memory_total == 16 << 30
+    assert gpu.memory_percent == 25.0
+    # First sample: no energy delta yet, so the instantaneous reading
+    assert gpu.power_draw == 150.0
+
+
+def test_power_from_energy_counter(monkeypatch):
+    backend, collector = make_collector(FakeGpu(power_mw=100_000))
+    clock = iter([10.0, 12.0])
+    monkeypatch.setattr(gpu_collector, 'time', SimpleNamespace(monotonic=lambda: next(clock)))
+
+    collector.collect()
+    # The fake adds power_mw (100 J) per read; 100 J over 2 s
+    [gpu] = collector.collect()
+
+    assert gpu.power_draw == 50.0
+
+
+def test_static_info_cached():
+    backend, collector = make_collector(FakeGpu(), FakeGpu())
+
+    for _ in range(5):
+        collector.sample()
+
+    assert backend.calls['device_count'] == 5
+    assert backend.calls['device_handle'] == 2
+    assert backend.calls['device_name'] == 2
+    # One batched field query per GPU and sample
+    assert backend.calls['field_values'] == 10
+    assert backend.calls['power_usage'] == 0
+
+
+def test_device_count_change_reopens_devices():
+    backend, collector = make_collector(FakeGpu())
+    collector.sample()
+
+    backend.gpus.append(FakeGpu(name='second'))
+    gpus = collector.sample()
+
+    assert [gpu.name for gpu in gpus] == ['Fake GPU', 'second']
+    assert backend.calls['device_handle'] == 3
+
+
+def test_unsupported_queries_are_not_retried():
+    backend, collector = make_collector(FakeGpu(memory=None))
+
+    for _ in range(3):
+        [gpu] = collector.sample()
+
+    assert gpu.memory_used is None and gpu.memory_total is None and gpu.memory_percent is None
+    assert gpu.temperature is not None
+    assert backend.calls['memory'] == 1
+
+
+def test_power_fallback_without_field_values():
+    backend, collector = make_collector(FakeGpu(fields=False, power_mw=90_000))
+
+    for _ in range(3):
+        [gpu] = collector.sample()
+
+    assert gpu.power_draw == 90.0
+    assert backend.calls['field_values'] == 1
+    assert backend.calls['power_usage'] == 3
+
+
+def test_transient_error_is_retried():
+    backend, collector = make_collector(FakeGpu(temperature=55))
+    backend.errors['temperature'] = NVML_ERROR_UNKNOWN
+
+    [gpu] = collector.sample()
+    assert gpu.temperature is None
+    assert gpu.utilization is not None
+
+    del backend.errors['temperature']
+    [gpu] = collector.sample()
+    assert gpu.temperature == 55
+
+
+def test_device_count_error():
+    backend, collector = make_collector(FakeGpu())
+    backend.errors['device_count'] = NVML_ERROR_UNKNOWN
+
+    assert collector.sample() == []
+
+    del backend.errors['device_count']
+    assert len(collector.sample()) == 1
+
+
+def test_lost_device():
+    first, second = FakeGpu(name='first'), FakeGpu(name='second')
+    backend, collector = make_collector(first, second)
+    collector.sample()
+
+    second.lost = True
+    gpus = collector.sample()
+    # The lost GPU is left out and the devices are reopened next time
+    assert [gpu.name for gpu in gpus] == ['first']
+    handles = backend.calls['device_handle']
+    assert [gpu.name for gpu in collector.sample()] == ['first']
+    assert backend.calls['device_handle'] > handles
+
+    # Back after a reset
+    second.lost = False
+    assert [gpu.name for gpu in collector.sample()] == ['first', 'second']
+
+
+def test_device_lost_error_code():
+    backend, collector = make_collector(FakeGpu())
+    collector.sample()
+
+    backend.errors['utilization'] = NVML_ERROR_GPU_IS_LOST
+    assert collector.sample() == []
+    del backend.errors['utilization']
+    assert len(collector.sample()) == 1
+
+
+def test_get_snapshot_uses_cached_sample():
+    backend, collector = make_collector(FakeGpu(), max_age=60)
+
+    first = collector.get_snapshot()
+    assert collector.get_snapshot() is first
+    assert backend.calls['device_count'] == 1
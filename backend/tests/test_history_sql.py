@@ -0,0 +1,76 @@
+"""SQL history buckets against the NumPy aggregation, on SQLite with a non-UTC local time."""
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.database import GPUSample, MetricSnapshot, METRIC_FIELDS
+from app.routers.history import aggregate_metrics_sql, gpu_history
+from app.services.aggregation import aggregate_columns
+
+START = datetime(2026, 3, 2, 7, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def samples(db, new_york):
+    """Four hours of samples every 30 s, stored as the collector writes them (naive local time)."""
+    times = [START + timedelta(seconds=s) for s in range(0, 4 * 3600, 30)]
+    for i, time in enumerate(times):
+        local = time.astimezone().replace(tzinfo=None)
+        values = {field: 1.0 for field in METRIC_FIELDS}
+        values['cpu_percent'] = float(i % 13)
+        db.add(MetricSnapshot(timestamp=local, gpu_data='[]', **values))
+        db.add(GPUSample(timestamp=local, gpu_index=0, name='gpu', utilization=float(i % 5)))
+    db.commit()
+    return times
+
+
+def expected(times, start, end, bucket_seconds):
+    picked = [i for i, time in enumerate(times) if start <= time <= end]
+    columns = {'timestamp': np.array([times[i].timestamp() for i in picked])}
+    for field in METRIC_FIELDS:
+        columns[field] = np.full(len(picked), 1.0)
+    columns['cpu_percent'] = np.array([float(i % 13) for i in picked])
+    return aggregate_columns(columns, bucket_seconds)
+
+
+@pytest.mark.parametrize('bucket_minutes', [1, 60])
+def test_sql_buckets_match_numpy(db, samples, bucket_minutes):
+    start = START + timedelta(minutes=7, seconds=13)
+    end = START + timedelta(hours=3, minutes=31)
+
+    rows = aggregate_metrics_sql(db, start, end, bucket_minutes)
+    reference = expected(samples, start, end, bucket_minutes * 60)
+
+    assert [row.timestamp.timestamp() for row in rows] == reference['timestamp'].tolist()
+    assert [row.cpu_percent for row in rows] == pytest.approx(reference['cpu_percent_avg'].tolist())
+
+
+def test_gpu_buckets_line_up_with_snapshot_buckets(db, samples):
+    start = START + timedelta(minutes=7, seconds=13)
+    end = START + timedelta(hours=3, minutes=31)
+
+    buckets = gpu_history(db, start, end, bucket_minutes=60)
+
+    assert sorted(buckets) == expected(samples, start, end, 3600)['timestamp'].tolist()
+
+
+def test_raw_gpu_samples_keyed_by_snapshot_time(db, samples):
+    start = START + timedelta(minutes=7, seconds=13)
+    end = START + timedelta(minutes=9)
+
+    history = gpu_history(db, start, end)
+
+    assert sorted(history) == [time.timestamp() for time in samples if start <= time <= end]
@@ -0,0 +1,47 @@
+"""MetricsSampler coalescing and listeners over a fake monitor."""
+import threading
+import time
+
+from app.services.metrics_sampler import MetricsSampler
+
+
+class SlowMonitor:
+    """Stands in for SystemMonitor; every sample takes delay seconds and returns its number."""
+
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.samples = 0
+
+    def get_all_metrics(self):
+        time.sleep(self.delay)
+        self.samples += 1
+        return self.samples
+
+
+def test_scheduled_sample_merged_into_request_refresh_notifies():
+    monitor = SlowMonitor()
+    sampler = MetricsSampler(monitor, interval=1)
+    notified = []
+    sampler.add_listener(notified.append)
+
+    request = threading.Thread(target=sampler.get_snapshot)
+    request.start()
+    # The scheduler tick arrives while the request's refresh runs the collectors
+    time.sleep(0.05)
+    snapshot = sampler.sample()
+    request.join()
+
+    assert monitor.samples == 1
+    assert snapshot == 1 and notified == [1]
+
+
+def test_listeners_run_once_per_snapshot():
+    sampler = MetricsSampler(SlowMonitor(delay=0), interval=1)
+    notified = []
+    sampler.add_listener(notified.append)
+
+    sampler.get_snapshot()
+    sampler.sample()
+    sampler.sample()
+
+    assert notified == [2, 3]
@@ -0,0 +1,110 @@
+"""ProcessManager versions and deltas over a fake process table."""
+import pytest
+
+from app.services.process_manager import ProcessManager, ProcessRow
+
+
+class FakeReader:
+    """Stands in for ProcReader; scan() returns the rows set in processes."""
+
+    def __init__(self):
+        self.processes = {}
+
+    def set(self, pid, cpu_percent=0.0, memory_percent=1.0, name='worker', created=100.0):
+        self.processes[pid] = ProcessRow(pid, name, 'root', cpu_percent, memory_percent, 'running', created)
+
+    def scan(self):
+        return list(self.processes.values())
+
+
+@pytest.fixture
+def reader():
+    reader = FakeReader()
+    reader.set(1, name='init')
+    reader.set(2, cpu_percent=1.0)
+    return reader
+
+
+@pytest.fixture
+def manager(reader):
+    manager = ProcessManager(refresh_interval=3600, history_size=10, reader=reader)
+    manager.refresh()
+    return manager
+
+
+def apply(view, changes):
+    """Update a client's {pid: row} view with a delta; returns the new version."""
+    version, changed, removed, _, _ = changes
+    for pid in removed:
+        del view[pid]
+    view.update((row.pid, row) for row in changed)
+    return version
+
+
+def full_view(manager):
+    rows, _, _, version = manager.get_processes()
+    return version, {row.pid: row for row in rows}
+
+
+def test_delta_chain_follows_slow_drift(manager, reader):
+    version, view = full_view(manager)
+
+    for step in range(1, 11):
+        # Every step stays below the CPU threshold
+        reader.set(2, cpu_percent=1.0 + 0.3 * step)
+        manager.refresh()
+        version = apply(view, manager.get_changes(version))
+
+    assert reader.processes[2].cpu_percent == pytest.approx(4.0)
+    assert abs(view[2].cpu_percent - reader.processes[2].cpu_percent) < 0.5
+    assert view.keys() == reader.processes.keys()
+
+
+def test_small_changes_are_not_sent(manager, reader):
+    version = manager.version
+    reader.set(2, cpu_percent=1.2, memory_percent=1.05)
+    manager.refresh()
+
+    _, changed, removed, total, process_count = manager.get_changes(version)
+
+    assert changed == [] and removed == []
+    assert total == process_count == 2
+
+
+def test_added_removed_and_replaced_processes(manager, reader):
+    version, view = full_view(manager)
+    del reader.processes[1]
+    reader.set(3, name='new')
+    # Same PID, new process
+    reader.set(2, cpu_percent=1.0, created=200.0)
+    manager.refresh()
+
+    _, changed, removed, _, _ = manager.get_changes(version)
+
+    assert removed == [1]
+    assert sorted(row.pid for row in changed) == [2, 3]
+
+
+def test_filters_apply_to_both_versions(manager, reader):
+    version = manager.version
+    reader.set(2, cpu_percent=30.0)
+    manager.refresh()
+
+    _, changed, removed, total, _ = manager.get_changes(version, min_cpu=10)
+    assert [row.pid for row in changed] == [2] and removed == [] and total == 1
+
+    version = manager.version
+    reader.set(2, cpu_percent=2.0)
+    manager.refresh()
+    _, changed, removed, total, _ = manager.get_changes(version, min_cpu=10)
+    # Stopped matching: removed from the client's filtered view
+    assert changed == [] and removed == [2] and total == 0
+
+
+def test_expired_version(manager, reader):
+    version = manager.version
+    for _ in range(10):
+        manager.refresh()
+
+    assert manager.get_changes(version) is None
+    assert manager.get_changes(manager.version)[1] == []
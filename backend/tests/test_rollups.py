@@ -0,0 +1,129 @@
+"""RollupManager tiers against an in-memory SQLite database."""
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.database import METRIC_FIELDS
+from app.services.aggregation import aggregate_columns
+from app.services.data_collector import DataCollector
+from app.services.rollups import RollupManager
+
+DAY = datetime(2026, 3, 2, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def sample(timestamp: datetime, cpu: float):
+    row = {field: 1.0 for field in METRIC_FIELDS}
+    row.update(timestamp=timestamp, cpu_percent=cpu, gpu_data='[]')
+    return row
+
+
+def samples(start: datetime, minutes: int, cpu, step: int = 10):
+    return [sample(start + timedelta(seconds=s), cpu(s) if callable(cpu) else cpu)
+            for s in range(0, minutes * 60, step)]
+
+
+def store(db, manager: RollupManager, rows):
+    """Add rows and write every closed bucket, as the collector does."""
+    closed = []
+    for row in rows:
+        closed.extend(manager.add(row))
+    manager.write(db, closed)
+    db.commit()
+
+
+def cpu(snapshots):
+    return [round(snapshot.cpu_percent, 6) for snapshot in snapshots]
+
+
+def test_open_bucket_merged_with_stored_partial_bucket(db):
+    hour = DAY + timedelta(hours=7)
+    before = RollupManager()
+    store(db, before, samples(hour, 10, 10.0))
+    # Shutdown writes the partial buckets
+    before.write(db, before.drain())
+    db.commit()
+
+    after = RollupManager()
+    collector = DataCollector(batch_size=100, flush_interval=60, max_pending=1000, rollups=after, partitioner=None)
+    store(db, after, samples(hour + timedelta(minutes=10), 10, 90.0))
+
+    for resolution, start, end in ((3600, hour, hour + timedelta(hours=1)), (86400, DAY, DAY + timedelta(days=1))):
+        [bucket] = after.query(db, resolution, start, end, resolution,
+                               unwritten=collector.unwritten_rollups(resolution))
+        assert bucket.timestamp == start
+        assert bucket.cpu_percent == pytest.approx(50.0)
+
+
+def test_unwritten_rows_merged_once(db):
+    hour = DAY + timedelta(hours=7)
+    manager = RollupManager()
+    closed = []
+    for row in samples(hour, 90, 20.0):
+        closed.extend(manager.add(row))
+    # The first hour is closed but not written yet
+    unwritten = [row for row in closed if row['resolution'] == 3600] + manager.open_rows(3600)
+
+    snapshots = manager.query(db, 3600, hour, hour + timedelta(hours=2), 3600, unwritten=unwritten)
+
+    assert [snapshot.timestamp for snapshot in snapshots] == [hour, hour + timedelta(hours=1)]
+    assert cpu(snapshots) == [20.0, 20.0]
+
+
+def test_buckets_in_utc_with_local_time_zone(db, new_york):
+    hour = DAY + timedelta(hours=7)
+    manager = RollupManager()
+    store(db, manager, samples(hour, 180, 10.0))
+
+    snapshots = manager.query(db, 3600, hour, hour + timedelta(hours=2), 3600)
+
+    assert [snapshot.timestamp for snapshot in snapshots] == [hour, hour + timedelta(hours=1)]
+
+
+def test_partial_buckets_match_raw_aggregation(db, new_york):
+    start = DAY + timedelta(hours=7)
+    rows = samples(start, 300, lambda s: float(s // 10 % 7 * 10))
+    manager = RollupManager()
+    store(db, manager, rows)
+
+    def raw_columns(range_start, range_end):
+        picked = [row for row in rows if range_start <= row['timestamp'] <= range_end]
+        columns = {'timestamp': np.array([row['timestamp'].timestamp() for row in picked])}
+        for field in METRIC_FIELDS:
+            columns[field] = np.array([row[field] for row in picked], dtype=np.float64)
+        return columns
+
+    range_start = start + timedelta(minutes=25, seconds=5)
+    range_end = start + timedelta(hours=3, minutes=40, seconds=3)
+    expected = aggregate_columns(raw_columns(range_start, range_end), 3600)
+
+    for resolution in (60, 3600):
+        snapshots = manager.query(db, resolution, range_start, range_end, 3600,
+                                  unwritten=manager.open_rows(resolution), raw_columns=raw_columns)
+        assert [snapshot.timestamp.timestamp() for snapshot in snapshots] == expected['timestamp'].tolist()
+        assert cpu(snapshots) == [round(value, 6) for value in expected['cpu_percent_avg'].tolist()]
+
+
+def test_rollup_rows_dropped_when_buffer_full_are_counted(caplog):
+    collector = DataCollector(batch_size=2, flush_interval=60, max_pending=4, rollups=RollupManager(), partitioner=None)
+    rows = [dict(sample(DAY + timedelta(minutes=i), 1.0), resolution=60, bucket_start=DAY + timedelta(minutes=i))
+            for i in range(6)]
+
+    # A failed flush puts its rows back in front of the newer ones
+    collector._requeue([], rows)
+
+    assert collector.dropped_rollups == 2
+    assert collector.unwritten_rollups(60) == rows[2:] + collector.rollups.open_rows(60)
+    assert "dropped 2 oldest rollup rows" in caplog.text
@@ -1,52 +1,90 @@
 'use client';
 
-import { useState, useEffect, useMemo } from 'react';
+import { useState, useEffect, useMemo, useCallback } from 'react';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from '@/components/ui/table';
 import { Button } from '@/components/ui/button';
 import { InfoIcon } from '@/components/ui/info-icon';
-import { api, ProcessInfo } from '@/lib/api';
+import { api, ProcessInfo, ProcessQuery } from '@/lib/api';
 import { auth } from '@/lib/auth';
 import { useRouter } from 'next/navigation';
 
+const PAGE_SIZE = 100;
+// Wait this long after the last keystroke before searching
+const SEARCH_DEBOUNCE_MS = 300;
+
 export function ProcessList() {
   const [processes, setProcesses] = useState<ProcessInfo[]>([]);
+  const [matchCount, setMatchCount] = useState(0);
+  const [processCount, setProcessCount] = useState(0);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const [isPaused, setIsPaused] = useState(false);
   const [searchTerm, setSearchTerm] = useState('');
+  const [debouncedSearch, setDebouncedSearch] = useState('');
   const [filterType, setFilterType] = useState<string>('all');
   const router = useRouter();
 
+  useEffect(() => {
+    const timeout = setTimeout(() => setDebouncedSearch(searchTerm.trim()), SEARCH_DEBOUNCE_MS);
+    return () => clearTimeout(timeout);
+  }, [searchTerm]);
+
+  // Filtering, sorting and paging happen on the server
+  const query = useMemo<ProcessQuery>(() => {
+    const params: ProcessQuery = { sort: 'cpu_percent', order: 'desc', limit: PAGE_SIZE };
+    switch (filterType) {
+      case 'high-cpu':
+        params.min_cpu = 1.0;
+        break;
+      case 'high-memory':
+        params.min_memory = 1.0;
+        break;
+      case 'running':
+      case 'sleeping':
+        params.status = filterType;
+        break;
+      default:
+        // 'all' - no filter
+        break;
+    }
+    if (debouncedSearch) {
+      params.search = debouncedSearch;
+    }
+    return params;
+  }, [debouncedSearch, filterType]);
+
+  const fetchProcesses = useCallback(async () => {
+    try {
+      const response = await api.processes.getAll(query);
+      setProcesses(response.data.processes);
+      setMatchCount(response.data.total);
+      setProcessCount(response.data.process_count ?? response.data.total);
+      setError(null);
+    } catch (err: any) {
+      if (err.response?.status === 401) {
+        router.push('/login');
+      } else {
+        setError(err.response?.data?.detail || 'Failed to fetch processes');
+      }
+    } finally {
+      setLoading(false);
+    }
+  }, [query, router]);
+
   useEffect(() => {
     if (!auth.isAuthenticated()) {
       router.push('/login');
       return;
     }
 
-    const fetchProcesses = async () => {
-      try {
-        const response = await api.processes.getAll();
-        setProcesses(response.data.processes);
-        setError(null);
-      } catch (err: any) {
-        if (err.response?.status === 401) {
-          router.push('/login');
-        } else {
-          setError(err.response?.data?.detail || 'Failed to fetch processes');
-        }
-      } finally {
-        setLoading(false);
-      }
-    };
-
     fetchProcesses();
     
     if (!isPaused) {
       const interval = setInterval(fetchProcesses, 5000); // Refresh every 5 seconds
       return () => clearInterval(interval);
     }
-  }, [router, isPaused]);
+  }, [router, isPaused, fetchProcesses]);
 
   const handleKillProcess = async (pid: number) => {
     if (!confirm(`Are you sure you want to kill process ${pid}?`)) {
@@ -56,8 +94,7 @@ export function ProcessList() {
     try {
       await api.processes.kill(pid);
       // Refresh process list
-      const response = await api.processes.getAll();
-      setProcesses(response.data.processes);
+      await fetchProcesses();
     } catch (err: any) {
       alert(err.response?.data?.detail || 'Failed to kill process');
     }
@@ -67,50 +104,12 @@ export function ProcessList() {
     try {
       await api.processes.setPriority(pid, priority);
       // Refresh process list
-      const response = await api.processes.getAll();
-      setProcesses(response.data.processes);
+      await fetchProcesses();
     } catch (err: any) {
       alert(err.response?.data?.detail || 'Failed to set priority');
     }
   };
 
-  // Filter processes based on search term and filter type
-  const filteredProcesses = useMemo(() => {
-    let filtered = [...processes];
-
-    // Apply filter type
-    switch (filterType) {
-      case 'high-cpu':
-        filtered = filtered.filter(p => p.cpu_percent > 1.0);
-        break;
-      case 'high-memory':
-        filtered = filtered.filter(p => p.memory_percent > 1.0);
-        break;
-      case 'running':
-        filtered = filtered.filter(p => p.status === 'running');
-        break;
-      case 'sleeping':
-        filtered = filtered.filter(p => p.status === 'sleeping');
-        break;
-      default:
-        // 'all' - no filter
-        break;
-    }
-
-    // Apply search term
-    if (searchTerm.trim()) {
-      const search = searchTerm.toLowerCase().trim();
-      filtered = filtered.filter(proc => 
-        proc.name.toLowerCase().includes(search) ||
-        proc.username.toLowerCase().includes(search) ||
-        proc.pid.toString().includes(search) ||
-        proc.status.toLowerCase().includes(search)
-      );
-    }
-
-    return filtered;
-  }, [processes, searchTerm, filterType]);
-
   if (loading) {
     return <Card><CardContent className="p-6">Loading processes...</CardContent></Card>;
   }
@@ -126,7 +125,7 @@ export function ProcessList() {
           <div className="flex items-center justify-between">
             <div className="flex items-center gap-2">
               <CardTitle>
-                Running Processes ({filteredProcesses.length} / {processes.length})
+                Running Processes ({matchCount} / {processCount})
               </CardTitle>
               <InfoIcon content="This table shows all running processes on the system. CPU % represents the percentage of a single CPU core being used by this process (can exceed 100% on multi-core systems if using multiple cores). Memory % shows the percentage of total system RAM used by this process. Status indicates whether the process is actively running or sleeping/waiting. You can search, filter, and manage processes from this interface." />
             </div>
@@ -196,14 +195,14 @@ export function ProcessList() {
                 </TableRow>
               </TableHeader>
               <TableBody>
-                {filteredProcesses.length === 0 ? (
+                {processes.length === 0 ? (
                   <TableRow>
                     <TableCell colSpan={7} className="text-center text-muted-foreground py-8">
                       No processes found matching your criteria
                     </TableCell>
                   </TableRow>
                 ) : (
-                  filteredProcesses.slice(0, 100).map((proc) => (
+                  processes.map((proc) => (
                     <TableRow key={proc.pid}>
                       <TableCell>{proc.pid}</TableCell>
                       <TableCell className="font-medium">{proc.name}</TableCell>
@@ -9,7 +9,9 @@ export function useMetrics(interval: number = 2000) {
   const [error, setError] = useState<string | null>(null);
 
   useEffect(() => {
-    let intervalId: NodeJS.Timeout;
+    let intervalId: NodeJS.Timeout | undefined;
+    let socket: WebSocket | null = null;
+    let closed = false;
 
     const fetchMetrics = async () => {
       try {
@@ -23,13 +25,40 @@ export function useMetrics(interval: number = 2000) {
       }
     };
 
-    // Initial fetch
-    fetchMetrics();
+    const startPolling = () => {
+      if (closed || intervalId) {
+        return;
+      }
+      // Initial fetch
+      fetchMetrics();
+      // Set up polling
+      intervalId = setInterval(fetchMetrics, interval);
+    };
 
-    // Set up polling
-    intervalId = setInterval(fetchMetrics, interval);
+    // Prefer the live stream; fall back to polling if it is unavailable or drops
+    if (typeof window !== 'undefined' && 'WebSocket' in window) {
+      try {
+        socket = new WebSocket(api.metrics.getStreamUrl());
+        socket.onmessage = (event) => {
+          setMetrics(JSON.parse(event.data) as SystemMetrics);
+          setError(null);
+          setLoading(false);
+        };
+        socket.onerror = () => startPolling();
+        socket.onclose = () => startPolling();
+      } catch {
+        startPolling();
+      }
+    } else {
+      startPolling();
+    }
 
     return () => {
+      closed = true;
+      if (socket) {
+        socket.onclose = null;
+        socket.close();
+      }
       if (intervalId) {
         clearInterval(intervalId);
       }
@@ -38,4 +67,3 @@ export function useMetrics(interval: number = 2000) {
 
   return { metrics, loading, error };
 }
-
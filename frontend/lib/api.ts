@@ -43,6 +43,10 @@ export interface SystemMetrics {
     count: number;
     freq_current?: number;
     per_cpu?: number[];
+    iowait?: number;
+    irq?: number;
+    softirq?: number;
+    steal?: number;
   };
   memory: {
     total: number;
@@ -101,7 +105,9 @@ export interface SystemInfo {
   uptime: number;
   boot_time: string;
   network_interfaces?: NetworkInterface[];
+  network_interfaces_age?: number | null;
   public_ip?: string;
+  public_ip_age?: number | null;
 }
 
 export interface ProcessInfo {
@@ -114,6 +120,25 @@ export interface ProcessInfo {
   created?: number;
 }
 
+export interface ProcessQuery {
+  sort?: keyof ProcessInfo;
+  order?: 'asc' | 'desc';
+  limit?: number;
+  offset?: number;
+  user?: string;
+  status?: string;
+  name?: string;
+  min_cpu?: number;
+  min_memory?: number;
+  search?: string;
+}
+
+export interface ProcessListResponse {
+  processes: ProcessInfo[];
+  total: number;
+  process_count?: number;
+}
+
 export const api = {
   // Public endpoints (no auth required)
   metrics: {
@@ -126,6 +151,17 @@ export const api = {
     getNetwork: () => apiClient.get('/metrics/network'),
     getNetworkPerNic: () => apiClient.get('/metrics/network/pernic'),
     getGPU: () => apiClient.get('/metrics/gpu'),
+    getCgroups: (prefix?: string, limit?: number) =>
+      apiClient.get('/metrics/cgroups', { params: { prefix, limit } }),
+    // WebSocket URL for live snapshots; groups is a subset of cpu,memory,disk,network,gpus
+    getStreamUrl: (groups?: string[]) => {
+      const url = new URL(`${getBrowserBaseUrl()}/metrics/stream`);
+      url.protocol = url.protocol === 'https:' ? 'wss:' : 'ws:';
+      if (groups && groups.length > 0) {
+        url.searchParams.set('groups', groups.join(','));
+      }
+      return url.toString();
+    },
   },
   
   // Auth endpoints
@@ -141,16 +177,27 @@ export const api = {
   
   // Protected endpoints (auth required)
   processes: {
-    getAll: () => apiClient.get<{ processes: ProcessInfo[]; total: number }>('/processes/'),
+    getAll: (query?: ProcessQuery) => apiClient.get<ProcessListResponse>('/processes/', { params: query }),
     kill: (pid: number) => apiClient.post(`/processes/${pid}/kill`),
     setPriority: (pid: number, priority: number) =>
       apiClient.post(`/processes/${pid}/priority?priority=${priority}`),
   },
   
   history: {
-    getMetrics: (startTime: string, endTime: string, metricType?: string, limit?: number, aggregate?: boolean) =>
+    getMetrics: (startTime: string, endTime: string, metricType?: string, limit?: number, aggregate?: boolean, cursor?: string) =>
       apiClient.get('/history/metrics', {
-        params: { start_time: startTime, end_time: endTime, metric_type: metricType, limit, aggregate: aggregate !== false },
+        params: { start_time: startTime, end_time: endTime, metric_type: metricType, limit, aggregate: aggregate !== false, cursor },
+      }),
+    getMetricsColumnar: (startTime: string, endTime: string, fields?: string[], limit?: number, aggregate?: boolean) =>
+      apiClient.get('/history/metrics', {
+        params: {
+          start_time: startTime, end_time: endTime, fields: fields?.join(','), format: 'columnar',
+          limit, aggregate: aggregate !== false,
+        },
+      }),
+    getCgroups: (startTime: string, endTime: string, path?: string, aggregate?: boolean) =>
+      apiClient.get('/history/cgroups', {
+        params: { start_time: startTime, end_time: endTime, path, aggregate: aggregate !== false },
       }),
     getProcesses: (startTime: string, endTime: string, limit?: number) =>
       apiClient.get('/history/processes', {